@@ -14,6 +14,7 @@ from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobProcess,
     RoomInputOptions,
     RoomOutputOptions,
     WorkerOptions,
@@ -35,6 +36,8 @@ from tools import (
     close_session,
     display_speech,
 )
+from utils.backend_client import backend_client
+from utils.outbox import outbox
 
 
 
@@ -268,25 +271,25 @@ CRITICAL: Always call close_session() when the guest indicates they're done or l
 
     async def _reset_mirror_display(self):
         """Reset the mirror display to default text on activation"""
-        import aiohttp
-        try:
-            print("[MIRROR RESET] Resetting mirror display for new guest...")
-            url = "http://localhost:8000/api/reset"
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                    if response.status == 200:
-                        print("[MIRROR RESET] Mirror display reset successfully")
-                        logger.info("Mirror display reset successfully")
-                    else:
-                        print(f"[MIRROR RESET] Failed to reset mirror display (status: {response.status})")
-                        logger.warning(f"Failed to reset mirror display (status: {response.status})")
-        except Exception as e:
-            print(f"[MIRROR RESET] Error resetting mirror display: {e}")
-            logger.error(f"Error resetting mirror display: {e}")
+        print("[MIRROR RESET] Resetting mirror display for new guest...")
+        params = {"mirror": self.ctx.room.name} if self.ctx.room else {}
+        # Same outbox as the display tools, so the reset cannot overtake an earlier update
+        outbox.enqueue_display("/reset", params=params)
+
+
+def prewarm(proc: JobProcess):
+    """Runs once per worker process before it takes jobs"""
+    backend_client.prewarm()
+    # Load undelivered backend commands, including those left by crashed workers
+    outbox.prewarm()
 
 
 async def entrypoint(ctx: JobContext):
     logger.info(f"Wedding mirror agent starting, connecting to room: {ctx.room.name if ctx.room else 'None'}")
+    # Open the shared backend session before the first tool call needs it
+    await backend_client.open()
+    # Replay what the outbox loaded on prewarm
+    outbox.start()
     await ctx.connect()
     logger.info(f"Successfully connected to room: {ctx.room.name}")
     
@@ -300,6 +303,10 @@ async def entrypoint(ctx: JobContext):
     # Setup shutdown callback for cleanup
     async def on_shutdown():
         logger.info("Agent shutting down - performing cleanup...")
+        # Deliver queued backend commands before the session closes; the rest stay journaled
+        await outbox.stop()
+        logger.info(f"Outbox: {outbox.stats()}")
+        await backend_client.close()
         logger.info("Agent cleanup completed")
     
     ctx.add_shutdown_callback(on_shutdown)
@@ -325,4 +332,4 @@ async def entrypoint(ctx: JobContext):
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
\ No newline at end of file
@@ -8,9 +8,19 @@ This module contains all the function tools used by the wedding mirror agent.
 """
 
 import asyncio
-import aiohttp
+import os
 import subprocess
 from livekit.agents.llm import function_tool
+from utils.outbox import outbox
+
+
+def _mirror_params() -> dict:
+    """Query parameters targeting the mirror (LiveKit room) this agent is serving"""
+    import __main__
+    agent = getattr(__main__, 'current_agent', None)
+    room = getattr(getattr(agent, 'ctx', None), 'room', None)
+    room_name = getattr(room, 'name', None)
+    return {"mirror": room_name} if room_name else {}
 
 
 @function_tool
@@ -29,53 +39,23 @@ async def update_display(text: str) -> str:
             if hasattr(__main__.current_agent, 'recording_manager') and __main__.current_agent.recording_manager:
                 __main__.current_agent.recording_manager.guest_name = display_text
     
-    # Now update the mirror with the text
-    url = "http://localhost:8000/api/update-text"
-    
     # Check if this is a name (for welcome format) or general text
     if len(display_text.split()) <= 3 and not any(char in display_text.lower() for char in ['wow', 'pretty', 'beautiful', 'amazing', 'gorgeous']):
         # Format as welcome message for names
         clean_name = display_text.title()
-        formatted_text = (
-            f'<span class="line fancy">Welcome</span>'
-            f'<span class="line fancy">{clean_name}!</span>'
-            f'<span class="line fancy">To Moatasem & Hala</span>'
-            f'<span class="line script">Enjoy the celebration!</span>'
-        )
+        payload = {"layout": "guest", "slots": {"name": f"{clean_name}!"}}
         display_message = f"Welcome {clean_name}! To Moatasem & Hala - Enjoy the celebration!"
     else:
         # Format as general message for compliments or other text
-        formatted_text = (
-            f'<span class="line fancy">{display_text}</span>'
-            f'<span class="line fancy">To Moatasem & Hala</span>'
-            f'<span class="line script">Enjoy the celebration!</span>'
-        )
+        payload = {"layout": "message", "slots": {"message": display_text}}
         display_message = f"{display_text} - To Moatasem & Hala - Enjoy the celebration!"
 
+    # The backend owns the layout (greeting and footer lines) and sends only the changed slots
     print(f"[MIRROR DISPLAY] Updating mirror text to: {display_message}")
     
-    payload = {
-        "text": formatted_text
-    }
-    
-    try:
-        print(f"[DEBUG] Making POST request to {url} with payload: {payload}")
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                content = await response.text()
-                print(f"[DEBUG] Response status: {response.status}, content: {content}")
-                if response.status == 200:
-                    return f"Mirror successfully updated with: {display_message}"
-                elif response.status == 404:
-                    return f"Mirror API endpoint not found. Is the backend running on port 8000?"
-                else:
-                    return f"Failed to update mirror. Status: {response.status}, Response: {content}"
-    except aiohttp.ClientError as e:
-        print(f"[DEBUG] Client error - Mirror backend not reachable: {e}")
-        return f"Cannot connect to mirror backend at localhost:8000. Is it running?"
-    except Exception as e:
-        print(f"[DEBUG] Exception in update_display: {str(e)}")
-        return f"Error updating mirror: {str(e)}"
+    # Delivered in the background so the model keeps speaking; failures are logged by the outbox
+    outbox.enqueue_display("/display", payload, _mirror_params())
+    return f"Mirror updated with: {display_message}"
 
 
 
@@ -107,21 +87,9 @@ async def start_session() -> str:
     """Start a new mirror session when activated with 'mirror mirror' - plays activation audio and resets the mirror display."""
     print("[AUDIO] Playing mirror activation sound - Starting new guest session")
     
-    # Reset the mirror text to default before playing audio
-    try:
-        import aiohttp
-        url = "http://localhost:8000/api/reset"
-        print(f"[MIRROR RESET] Calling API to reset mirror text: {url}")
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                print(f"[MIRROR RESET] API response status: {response.status}")
-                if response.status == 200:
-                    print("[MIRROR RESET] Mirror text reset to default successfully")
-                else:
-                    content = await response.text()
-                    print(f"[MIRROR RESET] Failed to reset mirror text (status: {response.status}, content: {content})")
-    except Exception as e:
-        print(f"[MIRROR RESET] Error resetting mirror text: {e}")
+    # Reset the mirror text to default before playing audio (queued behind earlier display updates)
+    print("[MIRROR RESET] Queuing mirror text reset")
+    outbox.enqueue_display("/reset", params=_mirror_params())
     
     # Return the activation sound for the agent to speak immediately
     print("[AUDIO] Mirror activation completed - returning activation sound...")
@@ -133,19 +101,10 @@ async def close_session() -> str:
     """Close current guest session, reset mirror, and prepare for next guest."""
     print("[AGENT ACTION] Closing guest session - resetting mirror")
     
-    # Reset the mirror via backend API
-    import aiohttp
-    try:
-        url = "http://localhost:8000/api/reset"
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                if response.status == 200:
-                    print("[MIRROR DISPLAY] Mirror reset to default state - ready for next guest")
-                    return "✨ *Magical Farewell Chime* 🔮 Farewell, beautiful soul! Until we meet again! *The mirror sleeps...*"
-                else:
-                    return f"✨ *Magical Farewell Chime* 🔮 Farewell! *The mirror sleeps...* (Mirror reset had issues: {response.status})"
-    except Exception as e:
-        return f"✨ *Magical Farewell Chime* 🔮 Farewell, beautiful soul! Until we meet again! *The mirror sleeps...* (Reset error: {e})"
+    # Reset the mirror via backend API, after any display update still queued
+    outbox.enqueue_display("/reset", params=_mirror_params())
+    print("[MIRROR DISPLAY] Mirror reset queued - ready for next guest")
+    return "✨ *Magical Farewell Chime* 🔮 Farewell, beautiful soul! Until we meet again! *The mirror sleeps...*"
 
 
 @function_tool
@@ -0,0 +1,72 @@
+"""
+Shared HTTP client for the agent's calls to the mirror backend.
+
+Tools used to open a new aiohttp.ClientSession (and with it a new connector
+and TCP connection) for every call. The worker process now keeps a single
+session whose connector pools keep-alive connections to the backend, so a
+tool call on the conversation path reuses a warm connection.
+
+The LiveKit prewarm hook calls ``prewarm()``; aiohttp sessions are bound to
+the running event loop, so the session itself is opened by ``open()`` at the
+start of the job (or on first use) and closed by the job's shutdown callback.
+"""
+import logging
+import os
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Default timeout for backend calls made from tools, in seconds
+DEFAULT_TIMEOUT = 5
+
+
+class BackendClient:
+    """One pooled aiohttp session per agent worker process"""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.configure()
+
+    def configure(self):
+        """Read the backend URL and pool settings from the environment"""
+        self.base_url = os.getenv("BACKEND_URL", "http://localhost:8000/api").rstrip("/")
+        self.pool_size = int(os.getenv("BACKEND_POOL_SIZE", "10"))
+        self.keepalive_seconds = float(os.getenv("BACKEND_KEEPALIVE_SECONDS", "60"))
+
+    def prewarm(self):
+        """Configure the client once per worker process (LiveKit prewarm hook)"""
+        self.configure()
+        logger.info(f"Backend client configured for {self.base_url} (pool size {self.pool_size})")
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def open(self) -> aiohttp.ClientSession:
+        """Open the shared session if it is not open yet"""
+        return self.session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, opened on first use in the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_seconds,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Global backend client instance
+backend_client = BackendClient()
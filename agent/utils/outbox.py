@@ -0,0 +1,447 @@
+"""
+Durable outbox for the agent's commands to the backend.
+
+Tools called by the realtime model must not wait for the backend, and a
+backend restart must not lose what the agent asked for (e.g. a recording
+left in ``processing_status="recording"`` because its ``/complete`` call
+failed). Backend-bound commands (display updates, resets, recording
+completion) are therefore appended to an on-disk journal and the caller
+returns right away; a background sender delivers them in order over the
+shared backend client.
+
+Journal: ``AGENT_OUTBOX_DIR/outbox-<pid>.jsonl``, append-only JSON lines of
+``{"op": "add", ...command}`` and ``{"op": "done", "id": n}``. Each worker
+process writes its own file. On prewarm a process loads its file and claims
+the files of processes that are no longer running, so commands left by a
+crashed worker are replayed in their original order. A journal is claimed
+by renaming it to ``outbox-<pid>.jsonl.claimed-<claimer pid>`` and removed
+once its commands are in the claimer's own journal; a claimed file whose
+claimer died before that is claimed again. Lines are flushed to the OS on
+write (not fsynced), which survives a process crash.
+
+Delivery:
+
+- connection errors, timeouts and 5xx responses are retried with
+  exponential backoff (``retry_delay`` doubling up to ``max_retry_delay``)
+- after ``failure_threshold`` consecutive failures the circuit breaker
+  opens and nothing is sent for ``open_seconds`` (doubling while the
+  backend stays down); then the head command is sent alone as a probe and
+  the outbox drains in order once it succeeds
+- a 4xx response means the backend rejected the command; it is logged and
+  dropped, as sending it again will not help
+- display commands carry a time-to-live, so a display update is not
+  replayed long after the guest has left; recording completion never expires
+- a command identical to the one queued just before it is dropped while
+  that one is still pending or was queued less than ``dedupe_seconds`` ago
+
+Failures are reported through logs and ``stats()``, never through the tool
+result.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import aiohttp
+
+from .backend_client import backend_client
+
+logger = logging.getLogger(__name__)
+
+# Seconds a display command stays worth delivering
+DISPLAY_TTL_SECONDS = 300.0
+# Journal size above which a drained journal is truncated
+COMPACT_BYTES = 64 * 1024
+
+
+class OutboxCommand:
+    """One request to the backend, as stored in the journal"""
+
+    def __init__(
+        self,
+        command_id: int,
+        method: str,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, str]] = None,
+        created: Optional[float] = None,
+        expires: Optional[float] = None,
+    ):
+        self.id = command_id
+        self.method = method
+        self.path = path
+        self.payload = payload
+        self.params = params or {}
+        # Wall-clock times, so they stay meaningful after a restart
+        self.created = created if created is not None else time.time()
+        self.expires = expires
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "OutboxCommand":
+        return cls(
+            record["id"], record["method"], record["path"], record.get("payload"),
+            record.get("params"), record.get("created"), record.get("expires"),
+        )
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "op": "add",
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "payload": self.payload,
+            "params": self.params,
+            "created": self.created,
+            "expires": self.expires,
+        }
+
+    def same_as(self, other: "OutboxCommand") -> bool:
+        return (self.method, self.path, self.payload, self.params) == (other.method, other.path, other.payload, other.params)
+
+    def expired(self) -> bool:
+        return self.expires is not None and time.time() > self.expires
+
+    def __repr__(self):
+        return f"<OutboxCommand {self.id} {self.method} {self.path} {self.payload or ''}>"
+
+
+class CircuitBreaker:
+    """Stops sending to a backend that keeps failing"""
+
+    def __init__(self, failure_threshold: int = 5, open_seconds: float = 5.0, max_open_seconds: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.open_seconds = open_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.open_seconds:
+            return "open"
+        return "half-open"
+
+    def seconds_until_probe(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def record_success(self):
+        if self.opened_at is not None:
+            print("✅ Backend reachable again, delivering queued commands")
+        self.failures = 0
+        self.opened_at = None
+        self.open_seconds = self.base_open_seconds
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None:
+            # The half-open probe failed: stay away longer
+            self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+            self.opened_at = time.monotonic()
+        elif self.failures >= self.failure_threshold:
+            print(f"⚠️  Backend unreachable after {self.failures} attempts, pausing deliveries for {self.open_seconds:g}s")
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+
+
+class Outbox:
+    """Journaled, ordered background sender for backend commands"""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        retry_delay: float = 0.5,
+        max_retry_delay: float = 30.0,
+        dedupe_seconds: float = 5.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.directory = directory or os.getenv(
+            "AGENT_OUTBOX_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".outbox")
+        )
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.dedupe_seconds = dedupe_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self._pending: Deque[OutboxCommand] = deque()
+        self._last: Optional[OutboxCommand] = None
+        self._next_id = 1
+        self._journal = None
+        self._ready: Optional[asyncio.Event] = None
+        self._sender: Optional[asyncio.Task] = None
+        self._metrics = {
+            "enqueued": 0,
+            "replayed": 0,
+            "sent": 0,
+            "deduplicated": 0,
+            "expired": 0,
+            "retries": 0,
+            "rejected": 0,
+        }
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Journal
+    # ------------------------------------------------------------------
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.directory, f"outbox-{os.getpid()}.jsonl")
+
+    def prewarm(self):
+        """Load this process's journal and claim the journals of dead workers (LiveKit prewarm hook)"""
+        if self._journal is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        commands: List[OutboxCommand] = []
+        claimed_paths: List[str] = []
+        for name in sorted(os.listdir(self.directory)):
+            journal_name = self._claimable(name)
+            if journal_name is None:
+                continue
+            claimed = os.path.join(self.directory, f"{journal_name}.claimed-{os.getpid()}")
+            try:
+                # Atomic, so two processes never replay the same journal
+                os.rename(os.path.join(self.directory, name), claimed)
+            except OSError:
+                continue
+            commands.extend(self._read_journal(claimed))
+            claimed_paths.append(claimed)
+
+        commands.sort(key=lambda command: command.created)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        for command in commands:
+            command.id = self._next_id
+            self._next_id += 1
+            self._write(command.to_record())
+            self._pending.append(command)
+        # Only now are the commands safe in this process's journal
+        for claimed in claimed_paths:
+            os.remove(claimed)
+        self._metrics["replayed"] += len(commands)
+        if commands:
+            print(f"📬 Outbox replaying {len(commands)} undelivered backend commands")
+
+    def _claimable(self, name: str) -> Optional[str]:
+        """Journal name to claim ``name`` under, or None if it belongs to a running process
+
+        Claimable: this process's own journal, the journal of a dead worker,
+        and a journal claimed by a process that died before replaying it.
+        """
+        if not name.startswith("outbox-"):
+            return None
+        journal_name, _, claimer = name.partition(".claimed-")
+        if not journal_name.endswith(".jsonl"):
+            return None
+        if claimer:
+            try:
+                claimer_pid = int(claimer)
+            except ValueError:
+                return None
+            # A file left claimed by this pid comes from an earlier process that had the same pid
+            return journal_name if claimer_pid == os.getpid() or self._dead(claimer_pid) else None
+        if os.path.join(self.directory, name) == self.journal_path:
+            return journal_name
+        try:
+            pid = int(journal_name[len("outbox-"):-len(".jsonl")])
+        except ValueError:
+            return None
+        return journal_name if self._dead(pid) else None
+
+    @staticmethod
+    def _dead(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    @staticmethod
+    def _read_journal(path: str) -> List[OutboxCommand]:
+        added: Dict[int, OutboxCommand] = {}
+        with open(path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+                if record.get("op") == "add":
+                    added[record["id"]] = OutboxCommand.from_record(record)
+                elif record.get("op") == "done":
+                    added.pop(record.get("id"), None)
+        return list(added.values())
+
+    def _write(self, record: Dict[str, Any]):
+        self._journal.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._journal.flush()
+
+    def _complete(self, command: OutboxCommand):
+        """Remove a handled command from the queue and the journal"""
+        if self._pending and self._pending[0] is command:
+            self._pending.popleft()
+        self._write({"op": "done", "id": command.id})
+        if not self._pending and self._journal.tell() > COMPACT_BYTES:
+            self._journal.truncate(0)
+            self._journal.seek(0)
+
+    # ------------------------------------------------------------------
+    # Queueing and delivery
+    # ------------------------------------------------------------------
+
+    def enqueue(
+        self,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, str]] = None,
+        method: str = "POST",
+        ttl: Optional[float] = None,
+    ) -> bool:
+        """Journal a request to ``path`` for delivery; returns False if it duplicates the previous command
+
+        ``ttl`` is how long the command stays worth delivering (None: until delivered).
+        """
+        self.prewarm()
+        command = OutboxCommand(self._next_id, method, path, payload, params)
+        if ttl is not None:
+            command.expires = command.created + ttl
+        if self._is_duplicate(command):
+            self._metrics["deduplicated"] += 1
+            return False
+        self._next_id += 1
+        self._last = command
+        self._write(command.to_record())
+        self._pending.append(command)
+        self._metrics["enqueued"] += 1
+        self.start()
+        return True
+
+    def enqueue_display(self, path: str, payload: Optional[Dict[str, Any]] = None, params: Optional[Dict[str, str]] = None) -> bool:
+        """Journal a display command, which is dropped if not delivered within ``DISPLAY_TTL_SECONDS``"""
+        return self.enqueue(path, payload, params, ttl=DISPLAY_TTL_SECONDS)
+
+    def _is_duplicate(self, command: OutboxCommand) -> bool:
+        last = self._last
+        if last is None or not command.same_as(last):
+            return False
+        return last in self._pending or command.created - last.created < self.dedupe_seconds
+
+    def start(self):
+        """Start the sender if there is something to deliver (needs a running event loop)"""
+        if self._sender is None or self._sender.done():
+            self._ready = asyncio.Event()
+            self._sender = asyncio.get_running_loop().create_task(self._run())
+        self._ready.set()
+
+    async def _run(self):
+        attempt = 0
+        while True:
+            while not self._pending:
+                self._ready.clear()
+                await self._ready.wait()
+            wait = self.breaker.seconds_until_probe()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            command = self._pending[0]
+            if command.expired():
+                self._metrics["expired"] += 1
+                logger.info(f"Outbox dropping expired {command}")
+                self._complete(command)
+                continue
+            try:
+                delivered = await self._deliver(command)
+            except Exception as e:
+                # Unexpected errors are treated like a rejection so one bad command cannot block the outbox
+                self._reject(command, str(e))
+                delivered = True
+            if delivered:
+                attempt = 0
+                continue
+            attempt += 1
+            self._metrics["retries"] += 1
+            if self.breaker.state == "closed":
+                await asyncio.sleep(min(self.retry_delay * 2 ** (attempt - 1), self.max_retry_delay))
+
+    async def _deliver(self, command: OutboxCommand) -> bool:
+        """Send ``command``; returns False if it should be retried"""
+        url = backend_client.url(command.path)
+        try:
+            async with backend_client.session.request(
+                command.method, url, json=command.payload, params=command.params
+            ) as response:
+                if response.status >= 500:
+                    error = f"status {response.status}"
+                elif response.status >= 400:
+                    self.breaker.record_success()
+                    self._reject(command, f"status {response.status}: {await response.text()}")
+                    return True
+                else:
+                    self.breaker.record_success()
+                    self._record_sent(command)
+                    return True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = str(e) or type(e).__name__
+        self.last_error = error
+        self.breaker.record_failure()
+        logger.warning(f"Outbox delivery of {command.method} {command.path} failed, will retry: {error}")
+        return False
+
+    def _record_sent(self, command: OutboxCommand):
+        latency = time.time() - command.created
+        self._metrics["sent"] += 1
+        self._latency_total += latency
+        self._latency_max = max(self._latency_max, latency)
+        self._complete(command)
+
+    def _reject(self, command: OutboxCommand, error: str):
+        self._metrics["rejected"] += 1
+        self.last_error = error
+        print(f"[OUTBOX] Backend rejected {command}: {error}")
+        logger.warning(f"Outbox command {command.method} {command.path} rejected: {error}")
+        self._complete(command)
+
+    async def stop(self, timeout: float = 5.0):
+        """Give queued commands ``timeout`` seconds to be delivered; the rest stay journaled for the next worker"""
+        if self._sender is not None:
+            deadline = time.monotonic() + timeout
+            while self._pending and not self._sender.done() and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+            self._sender = None
+        if self._pending:
+            logger.warning(f"Outbox stopped with {len(self._pending)} undelivered commands kept in {self.journal_path}")
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            if not self._pending:
+                os.remove(self.journal_path)
+            self._pending.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        sent = self._metrics["sent"]
+        return {
+            **self._metrics,
+            "pending": len(self._pending),
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            "latency_ms_avg": round(self._latency_total * 1000 / sent, 1) if sent else None,
+            "latency_ms_max": round(self._latency_max * 1000, 1),
+            "last_error": self.last_error,
+        }
+
+
+# Global outbox instance
+outbox = Outbox()
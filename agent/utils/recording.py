@@ -1,13 +1,15 @@
 import os
 import json
 import logging
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any
 import boto3
 from botocore.exceptions import NoCredentialsError
 from livekit import api
 from livekit.agents import JobContext
-import aiohttp
+from .backend_client import backend_client
+from .outbox import outbox
 
 logger = logging.getLogger(__name__)
 
@@ -46,24 +48,22 @@ class RecordingManager:
         """
         try:
             # First create the video record in the backend to get the final URL
-            backend_url = os.getenv("BACKEND_URL", "http://localhost:8000/api")
-            create_endpoint = f"{backend_url}/videos/simple"
+            create_endpoint = backend_client.url("/videos/simple")
             
             logger.info("Creating video record in backend...")
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(create_endpoint) as response:
-                    if response.status in [200, 201]:
-                        record_data = await response.json()
-                        self.recording_id = record_data.get("recording_id")
-                        self.s3_direct_url = record_data.get("video_url")
-                        self.filename = record_data.get("filename")
-                        
-                        logger.info(f"Video record created - ID: {self.recording_id}, URL: {self.s3_direct_url}")
-                    else:
-                        response_text = await response.text()
-                        logger.error(f"Failed to create video record. Status: {response.status}, Response: {response_text}")
-                        return None
+            async with backend_client.session.post(create_endpoint, params={"room_id": self.ctx.room.name}) as response:
+                if response.status in [200, 201]:
+                    record_data = await response.json()
+                    self.recording_id = record_data.get("recording_id")
+                    self.s3_direct_url = record_data.get("video_url")
+                    self.filename = record_data.get("filename")
+                    
+                    logger.info(f"Video record created - ID: {self.recording_id}, URL: {self.s3_direct_url}")
+                else:
+                    response_text = await response.text()
+                    logger.error(f"Failed to create video record. Status: {response.status}, Response: {response_text}")
+                    return None
 
             logger.info(f"Starting recording for room: {self.ctx.room.name}")
             logger.info(f"Recording filename: {self.filename}")
@@ -129,18 +129,14 @@ class RecordingManager:
             
             logger.info(f"Recording stopped for egress ID: {self.egress_id}")
             
-            # Mark recording as completed in backend
+            # Mark recording as completed in backend; journaled, so a backend restart cannot leave it "recording"
             if self.recording_id:
-                backend_url = os.getenv("BACKEND_URL", "http://localhost:8000/api")
-                complete_endpoint = f"{backend_url}/videos/{self.recording_id}/complete"
-                
-                async with aiohttp.ClientSession() as session:
-                    async with session.put(complete_endpoint) as response:
-                        if response.status == 200:
-                            logger.info("Recording marked as completed in backend")
-                        else:
-                            response_text = await response.text()
-                            logger.warning(f"Failed to mark recording as completed. Status: {response.status}, Response: {response_text}")
+                outbox.enqueue(
+                    f"/videos/{self.recording_id}/complete",
+                    params={"ended_at": str(time.time())},
+                    method="PUT",
+                )
+                logger.info("Recording completion queued for the backend")
             
             return True
 
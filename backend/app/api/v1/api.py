@@ -1,10 +1,30 @@
-from fastapi import APIRouter, Form, Depends, Request
+from fastapi import APIRouter, Form, Depends, Request, UploadFile, File
 from fastapi.responses import JSONResponse, StreamingResponse
-from backend.app.core.auth import verify_password, require_auth
+from backend.app.core.auth import verify_password, require_auth, check_auth
 from backend.app.core.livekit_service import livekit_service
 from backend.app.core.config import settings
+from backend.app.core.database import get_db, get_async_db
+from backend.app.core.guest_changes import guests_changed
+from backend.app.core.guest_index import guest_index
+from backend.app.core.pagination import (
+    DEFAULT_PAGE_SIZE, PaginationError, clamp_limit, page_metadata, paginate, parse_datetime
+)
+from backend.app.core.response_cache import response_cache
+from backend.app.core.event_hub import encode_frame, event_hub
+from backend.app.core.jobs import job_runner
+from backend.app.core.mirror_bus import ORIGINAL_TEXT, mirror_bus, resolve_mirror
+import backend.app.core.job_handlers  # noqa: F401 (registers the job kinds)
+from backend.app.core.storage import generate_presigned_url, get_bucket_name, get_region, s3_key_from_url
+from backend.app.core.serializers import guest_to_dict, video_recording_to_dict
+from backend.app.core.streaming import get_stream_format, stream_rows
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+import anyio
 import asyncio
 import json
+from functools import partial
+from typing import Optional
 
 api_router = APIRouter()
 
@@ -43,14 +63,18 @@ def logout():
     return response
 
 @api_router.get("/mirror")
-def mirror_display(authenticated: bool = Depends(require_auth)):
-    """API endpoint to get mirror state - requires authentication"""
-    # Import here to avoid circular imports
-    from backend.app.main import current_text, original_text
+def mirror_display(mirror: Optional[str] = None, authenticated: bool = Depends(require_auth)):
+    """API endpoint to get mirror state (``?mirror=`` for one mirror) - requires authentication"""
+    try:
+        mirror = resolve_mirror(mirror)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
     return {
         "success": True,
-        "current_text": current_text,
-        "original_text": original_text
+        "mirror": mirror,
+        "current_text": mirror_bus.text_for(mirror),
+        "original_text": ORIGINAL_TEXT,
+        "mirrors": mirror_bus.mirrors
     }
 
 @api_router.post("/livekit/token")
@@ -121,41 +145,57 @@ def get_livekit_config():
     }
 
 @api_router.get("/events")
-async def stream_events(request: Request):
-    """Server-sent events for real-time mirror updates"""
-    # Import here to avoid circular imports
-    from backend.app.main import connected_clients, current_text
+async def stream_events(request: Request, last_event_id: Optional[str] = None, mirror: Optional[str] = None):
+    """Server-sent events for real-time mirror updates
+    
+    ``?mirror=`` (the kiosk's LiveKit room name) subscribes to that mirror's
+    events as well as the ones sent to every mirror. Clients sending the
+    admin cookie also get admin events (job progress). Reconnecting clients
+    send ``Last-Event-ID`` (or ``?last_event_id=`` when they open a new
+    EventSource) to have missed events replayed.
+    """
+    try:
+        mirror = resolve_mirror(mirror)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    
+    admin = check_auth(request.cookies.get("mirror_auth"))
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    try:
+        resume_from = int(resume_from) if resume_from else None
+    except ValueError:
+        resume_from = None
     
     async def event_generator():
-        client_queue = asyncio.Queue()
-        connected_clients.append(client_queue)
+        subscriber = event_hub.subscribe(last_event_id=resume_from, mirror=mirror, admin=admin)
+        display = mirror_bus.display_for(mirror)
         
         try:
             # Send initial connection confirmation
             initial_message = {
                 "type": "connected", 
                 "message": "Connected to mirror",
-                "current_text": current_text
+                "mirror": mirror,
+                "current_text": display.render(),
+                "version": display.version,
+                "lines": display.lines(),
+                "replayed": len(subscriber.queue)
             }
-            yield f"data: {json.dumps(initial_message)}\n\n"
+            yield encode_frame(initial_message)
             
-            # Listen for messages
+            # Relay pre-encoded event and heartbeat frames from the hub
             while True:
-                try:
-                    # Wait for message with timeout to send periodic pings
-                    message = await asyncio.wait_for(client_queue.get(), timeout=30.0)
-                    yield f"data: {json.dumps(message)}\n\n"
-                except asyncio.TimeoutError:
-                    # Send ping to keep connection alive
-                    ping_message = {"type": "ping", "timestamp": asyncio.get_event_loop().time()}
-                    yield f"data: {json.dumps(ping_message)}\n\n"
+                frame = await subscriber.get()
+                if frame is None:
+                    # Too far behind; closing lets EventSource reconnect with fresh state
+                    break
+                yield frame
                     
         except Exception as e:
             print(f"SSE client disconnected: {e}")
         finally:
-            # Remove client from connected list
-            if client_queue in connected_clients:
-                connected_clients.remove(client_queue)
+            # Remove client from the hub
+            event_hub.unsubscribe(subscriber)
     
     return StreamingResponse(
         event_generator(),
@@ -168,6 +208,32 @@ async def stream_events(request: Request):
         }
     )
 
+@api_router.get("/display")
+def display_snapshot(mirror: Optional[str] = None):
+    """Current layout, lines, version and HTML of a mirror's display
+    
+    Clients fetch this when a ``display_patch`` does not follow the version
+    they show.
+    """
+    try:
+        mirror = resolve_mirror(mirror)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    return {
+        "success": True,
+        "mirror": mirror,
+        **mirror_bus.display_for(mirror).snapshot()
+    }
+
+@api_router.get("/events/stats")
+def event_stream_stats(authenticated: bool = Depends(require_auth)):
+    """Per-client queue and lag counters for the /events stream"""
+    return {
+        "success": True,
+        "bus": mirror_bus.backend,
+        **event_hub.stats()
+    }
+
 @api_router.get("/rooms")
 def list_rooms(authenticated: bool = Depends(require_auth)):
     """List all active LiveKit rooms"""
@@ -191,16 +257,14 @@ def delete_all_rooms(authenticated: bool = Depends(require_auth)):
     return livekit_service.delete_all_rooms()
 
 @api_router.post("/guest/search")
-def search_guest(request: Request):
+async def search_guest(request: Request, session: AsyncSession = Depends(get_async_db)):
     """Search for a guest in the wedding database"""
     print("\n" + "="*50)
     print("🔍 GUEST SEARCH REQUEST RECEIVED")
     print("="*50)
     
     try:
-        import json
-        body = asyncio.run(request.body())
-        data = json.loads(body.decode())
+        data = await request.json()
         guest_name = data.get("name", "").strip().lower()
         
         print(f"📥 Raw request data: {data}")
@@ -213,182 +277,37 @@ def search_guest(request: Request):
                 "message": "No name provided"
             }, status_code=400)
         
-        # Try to connect to database and search for guest
+        # Exact, prefix and trigram similarity scored together, from memory when the index is loaded
         try:
-            from sqlalchemy import create_engine, text
-            from sqlalchemy.orm import sessionmaker
-            import os
+            from backend.app.core.guest_search import find_best_guest
             
-            database_url = os.getenv("DATABASE_URL")
-            if not database_url:
-                return JSONResponse({
-                    "found": False,
-                    "message": "Database not configured"
-                })
-            
-            # Convert async URL to sync URL for synchronous SQLAlchemy
-            sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-            
-            print(f"🗄️  Connecting to database...")
-            print(f"🔗 Original URL: {database_url[:50]}...")
-            print(f"🔄 Sync URL: {sync_database_url[:50]}...")
-            
-            # Create engine with specific settings for PostgreSQL
-            engine = create_engine(
-                sync_database_url, 
-                pool_pre_ping=True,
-                pool_recycle=300,
-                echo=False  # Set to True for SQL debugging
-            )
-            Session = sessionmaker(bind=engine)
-            session = Session()
-            
-            print(f"✅ Database connection established!")
-            print(f"🎯 Starting search for guest: '{guest_name}'")
-            
-            # Clean and prepare search terms
-            search_name = guest_name.strip()
-            search_words = [word.strip() for word in search_name.split() if word.strip()]
-            
-            print(f"🧹 Cleaned search name: '{search_name}'")
-            print(f"📝 Search words: {search_words}")
-            print(f"🔢 Number of words: {len(search_words)}")
-            
-            # Try multiple search strategies in order of preference
-            result = None
-            search_strategy_used = None
-            
-            print("\n🔍 SEARCH STRATEGY 1: Exact full name match")
-            # Strategy 1: Exact full name match (highest priority)
-            if len(search_words) >= 2:
-                full_name_queries = [
-                    f"{search_words[0]} {search_words[1]}",  # First Last
-                    f"{search_words[1]} {search_words[0]}",  # Last First
-                    " ".join(search_words)  # All words as provided
-                ]
-                print(f"📋 Trying full name combinations: {full_name_queries}")
-                
-                for i, full_name in enumerate(full_name_queries):
-                    print(f"   🔸 Attempt {i+1}: Searching for '{full_name}'")
-                    query = text("""
-                        SELECT first_name, last_name, phone, seat_number, relation, message, story, about
-                        FROM guests 
-                        WHERE LOWER(TRIM(first_name || ' ' || last_name)) = LOWER(:full_name)
-                           OR LOWER(TRIM(last_name || ' ' || first_name)) = LOWER(:full_name)
-                        LIMIT 1
-                    """)
-                    result = session.execute(query, {"full_name": full_name}).fetchone()
-                    if result:
-                        search_strategy_used = f"Strategy 1 - Full name match: '{full_name}'"
-                        print(f"   ✅ FOUND with Strategy 1!")
-                        break
-                    else:
-                        print(f"   ❌ No match for '{full_name}'")
+            if guest_index.ready:
+                print(f"🎯 Searching in-memory index for guest: '{guest_name}'")
+                match = guest_index.find_best(guest_name)
             else:
-                print("   ⚠️  Skipped (less than 2 words provided)")
-            
-            # Strategy 2: Individual name component exact match
-            if not result:
-                print("\n🔍 SEARCH STRATEGY 2: Individual name component exact match")
-                for i, word in enumerate(search_words):
-                    print(f"   🔸 Attempt {i+1}: Searching for exact match of '{word}'")
-                    query = text("""
-                        SELECT first_name, last_name, phone, seat_number, relation, message, story, about
-                        FROM guests 
-                        WHERE LOWER(TRIM(first_name)) = LOWER(:word)
-                           OR LOWER(TRIM(last_name)) = LOWER(:word)
-                        LIMIT 1
-                    """)
-                    result = session.execute(query, {"word": word}).fetchone()
-                    if result:
-                        search_strategy_used = f"Strategy 2 - Individual name match: '{word}'"
-                        print(f"   ✅ FOUND with Strategy 2!")
-                        break
-                    else:
-                        print(f"   ❌ No exact match for '{word}'")
-            
-            # Strategy 3: Partial name match (fuzzy search)
-            if not result:
-                print("\n🔍 SEARCH STRATEGY 3: Partial name match (fuzzy search)")
-                for i, word in enumerate(search_words):
-                    if len(word) >= 3:  # Only search words with 3+ characters
-                        print(f"   🔸 Attempt {i+1}: Fuzzy search for '{word}' (contains)")
-                        query = text("""
-                            SELECT first_name, last_name, phone, seat_number, relation, message, story, about
-                            FROM guests 
-                            WHERE LOWER(first_name) LIKE LOWER(:partial)
-                               OR LOWER(last_name) LIKE LOWER(:partial)
-                            ORDER BY 
-                                CASE 
-                                    WHEN LOWER(first_name) LIKE LOWER(:exact_start) THEN 1
-                                    WHEN LOWER(last_name) LIKE LOWER(:exact_start) THEN 2
-                                    ELSE 3
-                                END
-                            LIMIT 1
-                        """)
-                        result = session.execute(query, {
-                            "partial": f"%{word}%",
-                            "exact_start": f"{word}%"
-                        }).fetchone()
-                        if result:
-                            search_strategy_used = f"Strategy 3 - Partial match: '{word}'"
-                            print(f"   ✅ FOUND with Strategy 3!")
-                            break
-                        else:
-                            print(f"   ❌ No partial match for '{word}'")
-                    else:
-                        print(f"   ⚠️  Skipped '{word}' (less than 3 characters)")
-            
-            # Strategy 4: Very flexible search - any part of any name
-            if not result:
-                print("\n🔍 SEARCH STRATEGY 4: Very flexible search (any part of name)")
-                print(f"   🔸 Searching for '{search_name}' anywhere in full name")
-                query = text("""
-                    SELECT first_name, last_name, phone, seat_number, relation, message, story, about
-                    FROM guests 
-                    WHERE LOWER(first_name || ' ' || last_name) LIKE LOWER(:search_term)
-                       OR LOWER(last_name || ' ' || first_name) LIKE LOWER(:search_term)
-                    LIMIT 1
-                """)
-                result = session.execute(query, {"search_term": f"%{search_name}%"}).fetchone()
-                if result:
-                    search_strategy_used = f"Strategy 4 - Flexible search: '{search_name}'"
-                    print(f"   ✅ FOUND with Strategy 4!")
-                else:
-                    print(f"   ❌ No flexible match for '{search_name}'")
-            
-            session.close()
+                print(f"🎯 Starting ranked database search for guest: '{guest_name}'")
+                match = await find_best_guest(session, guest_name)
             
             print("\n" + "="*50)
-            if result:
-                guest_info = {
-                    "name": f"{result[0]} {result[1]}" if result[0] and result[1] else guest_name,
-                    "first_name": result[0],
-                    "last_name": result[1],
-                    "phone": result[2],
-                    "table_number": result[3],
-                    "relationship": result[4],
-                    "message": result[5],
-                    "story": result[6],
-                    "about": result[7]
-                }
+            if match:
+                guest_info, confidence = match
                 
                 print("🎉 GUEST FOUND!")
                 print(f"👤 Name: {guest_info['name']}")
                 print(f"📞 Phone: {guest_info['phone']}")
                 print(f"🪑 Seat: {guest_info['table_number']}")
                 print(f"👥 Relationship: {guest_info['relationship']}")
-                print(f"🎯 Found using: {search_strategy_used}")
+                print(f"🎯 Confidence: {confidence}")
                 print("="*50)
                 
                 return JSONResponse({
                     "found": True,
-                    "guest": guest_info
+                    "guest": guest_info,
+                    "confidence": confidence
                 })
             else:
                 print("❌ GUEST NOT FOUND!")
                 print(f"🔍 Searched for: '{guest_name}'")
-                print(f"📝 Search words: {search_words}")
                 print("💡 Try checking spelling or using different name variations")
                 print("="*50)
                 
@@ -418,66 +337,180 @@ def search_guest(request: Request):
         }, status_code=500)
 
 
+@api_router.post("/guest/search/batch")
+async def search_guests_batch(request: Request, session: AsyncSession = Depends(get_async_db)):
+    """Resolve several guest names in one call (e.g. a group walking up to the mirror)"""
+    print("\n" + "="*50)
+    print("🔍 BATCH GUEST SEARCH REQUEST RECEIVED")
+    print("="*50)
+    
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JSONResponse({
+            "success": False,
+            "message": "Request body must be a JSON object"
+        }, status_code=400)
+    
+    names = data.get("names") or []
+    if not isinstance(names, list) or not names:
+        return JSONResponse({
+            "success": False,
+            "message": "Provide a non-empty 'names' list"
+        }, status_code=400)
+    
+    if len(names) > settings.GUEST_SEARCH_BATCH_MAX_NAMES:
+        return JSONResponse({
+            "success": False,
+            "message": f"At most {settings.GUEST_SEARCH_BATCH_MAX_NAMES} names per request"
+        }, status_code=400)
+    
+    limit = data.get("limit", 1)
+    # bool is an int subclass, "limit": true is not a count
+    if isinstance(limit, bool) or not isinstance(limit, int) \
+            or not 1 <= limit <= settings.GUEST_SEARCH_BATCH_MAX_LIMIT:
+        return JSONResponse({
+            "success": False,
+            "message": f"'limit' must be a whole number from 1 to {settings.GUEST_SEARCH_BATCH_MAX_LIMIT}"
+        }, status_code=400)
+    
+    try:
+        names = [str(name or "").strip().lower() for name in names]
+        print(f"🏷️  Names: {names}")
+        
+        if guest_index.ready:
+            print("🎯 Searching in-memory index")
+            matches = guest_index.search_many(names, limit=limit)
+        else:
+            from backend.app.core.guest_search import search_guests_batch as search_batch
+            
+            print("🎯 Starting batched database search")
+            matches = await search_batch(session, names, limit=limit)
+        
+        results = []
+        for name, name_matches in zip(names, matches):
+            result = {"name": name, "found": bool(name_matches)}
+            if name_matches:
+                guest_info, confidence = name_matches[0]
+                result["guest"] = guest_info
+                result["confidence"] = confidence
+                print(f"🎉 '{name}' -> {guest_info['name']} ({confidence})")
+            else:
+                print(f"❌ '{name}' not found")
+            if limit > 1:
+                result["matches"] = [
+                    {"guest": guest_info, "confidence": confidence}
+                    for guest_info, confidence in name_matches
+                ]
+            results.append(result)
+        
+        found = sum(1 for result in results if result["found"])
+        print(f"✅ Resolved {found}/{len(results)} names")
+        print("="*50)
+        
+        return JSONResponse({
+            "success": True,
+            "results": results,
+            "found": found,
+            "total": len(results)
+        })
+        
+    except Exception as e:
+        print(f"❌ Error in batch guest search: {e}")
+        return JSONResponse({
+            "success": False,
+            "message": f"Error processing request: {str(e)}"
+        }, status_code=500)
+
+
+@api_router.post("/guest/index/rebuild")
+async def rebuild_guest_index(authenticated: bool = Depends(require_auth)):
+    """Rebuild the in-memory guest name index and drop cached guest responses on every worker (e.g. after running seed scripts)"""
+    try:
+        # Every worker reloads its own index and drops its cached responses
+        await guests_changed(reload_index=True)
+        count = len(guest_index)
+        return JSONResponse({
+            "success": True,
+            "message": f"Guest index rebuilt with {count} guests",
+            "total": count
+        })
+        
+    except Exception as e:
+        print(f"Error rebuilding guest index: {e}")
+        return JSONResponse({
+            "success": False,
+            "message": f"Error rebuilding guest index: {str(e)}"
+        }, status_code=500)
+
+
 # ========================================
 # GUEST MANAGEMENT ENDPOINTS
 # ========================================
 
 @api_router.get("/guests")
-def list_guests(authenticated: bool = Depends(require_auth)):
-    """Get all guests from the database"""
+async def list_guests(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    relation_type_id: Optional[int] = None,
+    relation: Optional[str] = None,
+    table: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    include_total: bool = True,
+    stream: Optional[str] = None,
+    authenticated: bool = Depends(require_auth),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Get one page of guests, newest first, with optional filters (or stream every match)"""
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
-        
-        database_url = os.getenv("DATABASE_URL")
-        if not database_url:
-            return JSONResponse({
-                "success": False,
-                "message": "Database not configured"
-            })
-        
-        # Convert async URL to sync URL
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        # Import models
-        import sys
-        import os
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-        from models import Guest, RelationType
-        
-        # Get all guests with their relation types
-        guests = session.query(Guest).join(RelationType, Guest.relation_type_id == RelationType.id, isouter=True).all()
-        
-        guests_list = []
-        for guest in guests:
-            guests_list.append({
-                "id": guest.id,
-                "first_name": guest.first_name,
-                "last_name": guest.last_name,
-                "full_name": f"{guest.first_name} {guest.last_name}",
-                "phone": guest.phone,
-                "seat_number": guest.seat_number,
-                "relation": guest.relation,
-                "relation_type": guest.relation_type.name if guest.relation_type else None,
-                "message": guest.message,
-                "story": guest.story,
-                "about": guest.about,
-                "created_at": guest.created_at.isoformat() if guest.created_at else None,
-                "updated_at": guest.updated_at.isoformat() if guest.updated_at else None
-            })
-        
-        session.close()
+        from models import Guest
         
-        return JSONResponse({
+        limit = clamp_limit(limit)
+        # Relation types are eager-loaded, lazy loads are not allowed on AsyncSession
+        statement = select(Guest).options(joinedload(Guest.relation_type))
+        if relation_type_id is not None:
+            statement = statement.where(Guest.relation_type_id == relation_type_id)
+        if relation:
+            statement = statement.where(Guest.relation.ilike(f"%{relation}%"))
+        if table:
+            statement = statement.where(Guest.seat_number == table)
+        created_from = parse_datetime(created_after, "created_after")
+        created_to = parse_datetime(created_before, "created_before")
+        if created_from:
+            statement = statement.where(Guest.created_at >= created_from)
+        if created_to:
+            statement = statement.where(Guest.created_at < created_to)
+        
+        stream_format = get_stream_format(request, stream)
+        if stream_format:
+            statement = statement.order_by(Guest.created_at.desc(), Guest.id.desc())
+            return stream_rows(statement, guest_to_dict, stream_format)
+        
+        # Unchanged polls are answered from the versioned cache without a query
+        cached = response_cache.lookup(request)
+        if cached:
+            return cached
+        data_version = response_cache.data_version
+        
+        guests, next_cursor, total = await paginate(session, statement, Guest, limit, cursor, include_total)
+        
+        guests_list = [guest_to_dict(guest) for guest in guests]
+        
+        return response_cache.store(request, {
             "success": True,
             "guests": guests_list,
-            "total": len(guests_list)
-        })
+            **page_metadata(limit, next_cursor, total)
+        }, data_version)
+        
+    except PaginationError as e:
+        return JSONResponse({
+            "success": False,
+            "message": str(e)
+        }, status_code=400)
         
     except Exception as e:
         print(f"Error fetching guests: {e}")
@@ -488,31 +521,14 @@ def list_guests(authenticated: bool = Depends(require_auth)):
 
 
 @api_router.post("/guests")
-def create_guest(request: Request, authenticated: bool = Depends(require_auth)):
+async def create_guest(request: Request, authenticated: bool = Depends(require_auth), session: AsyncSession = Depends(get_async_db)):
     """Create a new guest"""
     try:
-        import json
-        body = asyncio.run(request.body())
-        data = json.loads(body.decode())
+        data = await request.json()
         
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
         from datetime import datetime
         
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        from models import Guest, RelationType
-        
-        # Get relation type if provided
-        relation_type = None
-        if data.get("relation_type_id"):
-            relation_type = session.query(RelationType).filter_by(id=data["relation_type_id"]).first()
+        from models import Guest
         
         # Create new guest
         new_guest = Guest(
@@ -530,12 +546,11 @@ def create_guest(request: Request, authenticated: bool = Depends(require_auth)):
         )
         
         session.add(new_guest)
-        session.commit()
+        await session.commit()
+        await guests_changed([new_guest])
         
         # Get the created guest with ID
         guest_id = new_guest.id
-        session.refresh(new_guest)
-        session.close()
         
         return JSONResponse({
             "success": True,
@@ -552,31 +567,18 @@ def create_guest(request: Request, authenticated: bool = Depends(require_auth)):
 
 
 @api_router.put("/guests/{guest_id}")
-def update_guest(guest_id: int, request: Request, authenticated: bool = Depends(require_auth)):
+async def update_guest(guest_id: int, request: Request, authenticated: bool = Depends(require_auth), session: AsyncSession = Depends(get_async_db)):
     """Update an existing guest"""
     try:
-        import json
-        body = asyncio.run(request.body())
-        data = json.loads(body.decode())
+        data = await request.json()
         
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
         from datetime import datetime
         
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
         from models import Guest
         
         # Find the guest
-        guest = session.query(Guest).filter_by(id=guest_id).first()
+        guest = await session.get(Guest, guest_id)
         if not guest:
-            session.close()
             return JSONResponse({
                 "success": False,
                 "message": "Guest not found"
@@ -594,8 +596,8 @@ def update_guest(guest_id: int, request: Request, authenticated: bool = Depends(
         guest.about = data.get("about", guest.about)
         guest.updated_at = datetime.utcnow()
         
-        session.commit()
-        session.close()
+        await session.commit()
+        await guests_changed([guest])
         
         return JSONResponse({
             "success": True,
@@ -611,34 +613,22 @@ def update_guest(guest_id: int, request: Request, authenticated: bool = Depends(
 
 
 @api_router.delete("/guests/{guest_id}")
-def delete_guest(guest_id: int, authenticated: bool = Depends(require_auth)):
+async def delete_guest(guest_id: int, authenticated: bool = Depends(require_auth), session: AsyncSession = Depends(get_async_db)):
     """Delete a guest"""
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
-        
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
         from models import Guest
         
         # Find and delete the guest
-        guest = session.query(Guest).filter_by(id=guest_id).first()
+        guest = await session.get(Guest, guest_id)
         if not guest:
-            session.close()
             return JSONResponse({
                 "success": False,
                 "message": "Guest not found"
             }, status_code=404)
         
-        session.delete(guest)
-        session.commit()
-        session.close()
+        await session.delete(guest)
+        await session.commit()
+        await guests_changed(removed_ids=[guest_id])
         
         return JSONResponse({
             "success": True,
@@ -654,23 +644,17 @@ def delete_guest(guest_id: int, authenticated: bool = Depends(require_auth)):
 
 
 @api_router.get("/relation-types")
-def list_relation_types(authenticated: bool = Depends(require_auth)):
+async def list_relation_types(request: Request, authenticated: bool = Depends(require_auth), session: AsyncSession = Depends(get_async_db)):
     """Get all relation types"""
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
-        
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
         from models import RelationType
         
-        relation_types = session.query(RelationType).all()
+        cached = response_cache.lookup(request)
+        if cached:
+            return cached
+        data_version = response_cache.data_version
+        
+        relation_types = (await session.execute(select(RelationType))).scalars().all()
         
         types_list = []
         for rt in relation_types:
@@ -680,12 +664,10 @@ def list_relation_types(authenticated: bool = Depends(require_auth)):
                 "description": rt.description
             })
         
-        session.close()
-        
-        return JSONResponse({
+        return response_cache.store(request, {
             "success": True,
             "relation_types": types_list
-        })
+        }, data_version)
         
     except Exception as e:
         print(f"Error fetching relation types: {e}")
@@ -700,27 +682,19 @@ def list_relation_types(authenticated: bool = Depends(require_auth)):
 # ========================================
 
 @api_router.get("/videos/{video_id}")
-def get_video_recording(video_id: int, authenticated: bool = Depends(require_auth)):
+async def get_video_recording(video_id: int, authenticated: bool = Depends(require_auth), session: AsyncSession = Depends(get_async_db)):
     """Get a specific video recording by ID"""
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
-        
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        from models import VideoRecording, Guest
+        from models import VideoRecording
         
-        # Get video recording with guest info
-        recording = session.query(VideoRecording).filter_by(id=video_id, is_available=True).first()
+        # Get video recording with guest info in one query
+        recording = (await session.execute(
+            select(VideoRecording)
+            .options(joinedload(VideoRecording.guest))
+            .filter_by(id=video_id, is_available=True)
+        )).scalars().first()
         
         if not recording:
-            session.close()
             return JSONResponse({
                 "success": False,
                 "message": "Video recording not found"
@@ -729,7 +703,7 @@ def get_video_recording(video_id: int, authenticated: bool = Depends(require_aut
         # Get guest info if available
         guest_info = None
         if recording.guest_id:
-            guest = session.query(Guest).filter_by(id=recording.guest_id).first()
+            guest = recording.guest
             if guest:
                 guest_info = {
                     "id": guest.id,
@@ -739,8 +713,6 @@ def get_video_recording(video_id: int, authenticated: bool = Depends(require_aut
                     "relation": guest.relation
                 }
         
-        session.close()
-        
         result = recording.to_dict()
         if guest_info:
             result["guest_details"] = guest_info
@@ -759,25 +731,13 @@ def get_video_recording(video_id: int, authenticated: bool = Depends(require_aut
 
 
 @api_router.post("/videos")
-def create_video_recording(request: Request, authenticated: bool = Depends(require_auth)):
+async def create_video_recording(request: Request, authenticated: bool = Depends(require_auth), session: AsyncSession = Depends(get_async_db)):
     """Create a new video recording record"""
     try:
-        import json
-        body = asyncio.run(request.body())
-        data = json.loads(body.decode())
+        data = await request.json()
         
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
         from datetime import datetime
         
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
         from models import VideoRecording
         
         # Parse recording_started_at if provided
@@ -809,11 +769,9 @@ def create_video_recording(request: Request, authenticated: bool = Depends(requi
         )
         
         session.add(new_recording)
-        session.commit()
+        await session.commit()
         
         recording_id = new_recording.id
-        session.refresh(new_recording)
-        session.close()
         
         return JSONResponse({
             "success": True,
@@ -830,23 +788,14 @@ def create_video_recording(request: Request, authenticated: bool = Depends(requi
 
 
 @api_router.post("/videos/simple")
-def create_simple_video_record():
-    """Create a simple video record immediately when recording starts - no auth needed for agent"""
+async def create_simple_video_record(room_id: Optional[str] = None, session: AsyncSession = Depends(get_async_db)):
+    """Create a simple video record immediately when recording starts - no auth needed for agent
+    
+    ``?room_id=`` is the LiveKit room (mirror) being recorded.
+    """
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
         from datetime import datetime
         
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         from models import VideoRecording
         
         # Generate filename for video
@@ -854,38 +803,20 @@ def create_simple_video_record():
         filename = f"recordings/wedding_mirror_{timestamp}.mp4"
         
         # Generate S3 URL
-        bucket_name = os.getenv("AWS_BUCKET_NAME", "4wk-garage-media")
-        region = os.getenv("AWS_REGION", "me-central-1")
+        bucket_name = get_bucket_name()
+        region = get_region()
         s3_url = f"https://{bucket_name}.s3.{region}.amazonaws.com/{filename}"
         
         # Generate presigned URL for immediate access
         try:
-            import boto3
-            from botocore.exceptions import NoCredentialsError
-            
-            region = os.getenv("AWS_REGION", "me-central-1")
-            s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-                region_name=region,
-            )
-
-            presigned_url = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": bucket_name,
-                    "Key": filename,
-                },
-                ExpiresIn=86400 * 7,  # 7 days
-            )
+            presigned_url = generate_presigned_url(filename)
         except Exception as e:
             print(f"Could not generate presigned URL: {e}")
             presigned_url = None
 
         # Create simple video recording with just date and URL
         new_recording = VideoRecording(
-            room_id="mirror-room",
+            room_id=room_id or "mirror-room",
             video_url=s3_url,
             presigned_url=presigned_url,
             recording_started_at=datetime.utcnow(),
@@ -895,11 +826,9 @@ def create_simple_video_record():
         )
         
         session.add(new_recording)
-        session.commit()
+        await session.commit()
         
         recording_id = new_recording.id
-        session.refresh(new_recording)
-        session.close()
         
         return JSONResponse({
             "success": True,
@@ -917,56 +846,63 @@ def create_simple_video_record():
 
 
 @api_router.get("/videos")
-def list_video_recordings(authenticated: bool = Depends(require_auth)):
-    """Get all video recordings"""
+async def list_video_recordings(
+    request: Request,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    room_id: Optional[str] = None,
+    guest_id: Optional[int] = None,
+    table: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    include_total: bool = True,
+    stream: Optional[str] = None,
+    authenticated: bool = Depends(require_auth),
+    session: AsyncSession = Depends(get_async_db)
+):
+    """Get one page of video recordings, newest first, with optional filters (or stream every match)"""
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
-        
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         from models import VideoRecording
         
-        recordings = session.query(VideoRecording).order_by(VideoRecording.created_at.desc()).all()
-        
-        recordings_list = []
-        for recording in recordings:
-            recordings_list.append({
-                "id": recording.id,
-                "room_id": recording.room_id,
-                "video_url": recording.video_url,
-                "presigned_url": recording.presigned_url,
-                "egress_id": recording.egress_id,
-                "guest_name": recording.guest_name,
-                "guest_id": recording.guest_id,
-                "guest_phone": recording.guest_phone,
-                "guest_relation": recording.guest_relation,
-                "guest_table": recording.guest_table,
-                "recording_started_at": recording.recording_started_at.isoformat() if recording.recording_started_at else None,
-                "recording_ended_at": recording.recording_ended_at.isoformat() if recording.recording_ended_at else None,
-                "file_size_bytes": recording.file_size_bytes,
-                "duration_seconds": recording.duration_seconds,
-                "status": recording.processing_status,
-                "created_at": recording.created_at.isoformat() if recording.created_at else None,
-                "updated_at": recording.updated_at.isoformat() if recording.updated_at else None
-            })
-        
-        session.close()
+        limit = clamp_limit(limit)
+        statement = select(VideoRecording)
+        if status:
+            statement = statement.where(VideoRecording.processing_status == status)
+        if room_id:
+            statement = statement.where(VideoRecording.room_id == room_id)
+        if guest_id is not None:
+            statement = statement.where(VideoRecording.guest_id == guest_id)
+        if table:
+            statement = statement.where(VideoRecording.guest_table == table)
+        created_from = parse_datetime(created_after, "created_after")
+        created_to = parse_datetime(created_before, "created_before")
+        if created_from:
+            statement = statement.where(VideoRecording.created_at >= created_from)
+        if created_to:
+            statement = statement.where(VideoRecording.created_at < created_to)
+        
+        stream_format = get_stream_format(request, stream)
+        if stream_format:
+            statement = statement.order_by(VideoRecording.created_at.desc(), VideoRecording.id.desc())
+            return stream_rows(statement, video_recording_to_dict, stream_format)
+        
+        recordings, next_cursor, total = await paginate(session, statement, VideoRecording, limit, cursor, include_total)
+        
+        recordings_list = [video_recording_to_dict(recording) for recording in recordings]
         
         return JSONResponse({
             "success": True,
             "recordings": recordings_list,
-            "total": len(recordings_list)
+            **page_metadata(limit, next_cursor, total)
         })
         
+    except PaginationError as e:
+        return JSONResponse({
+            "success": False,
+            "message": str(e)
+        }, status_code=400)
+        
     except Exception as e:
         print(f"Error fetching video recordings: {e}")
         return JSONResponse({
@@ -976,49 +912,20 @@ def list_video_recordings(authenticated: bool = Depends(require_auth)):
 
 
 @api_router.get("/videos/room/{room_id}")
-def get_videos_by_room(room_id: str):
+async def get_videos_by_room(room_id: str, request: Request, stream: Optional[str] = None, session: AsyncSession = Depends(get_async_db)):
     """Get all video recordings for a specific room"""
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
+        from models import VideoRecording
         
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+        statement = select(VideoRecording).filter_by(room_id=room_id).order_by(VideoRecording.created_at.desc())
         
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
+        stream_format = get_stream_format(request, stream)
+        if stream_format:
+            return stream_rows(statement, video_recording_to_dict, stream_format)
         
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-        from models import VideoRecording
+        recordings = (await session.execute(statement)).scalars().all()
         
-        recordings = session.query(VideoRecording).filter_by(room_id=room_id).order_by(VideoRecording.created_at.desc()).all()
-        
-        recordings_list = []
-        for recording in recordings:
-            recordings_list.append({
-                "id": recording.id,
-                "room_id": recording.room_id,
-                "video_url": recording.video_url,
-                "presigned_url": recording.presigned_url,
-                "egress_id": recording.egress_id,
-                "guest_name": recording.guest_name,
-                "guest_id": recording.guest_id,
-                "guest_phone": recording.guest_phone,
-                "guest_relation": recording.guest_relation,
-                "guest_table": recording.guest_table,
-                "recording_started_at": recording.recording_started_at.isoformat() if recording.recording_started_at else None,
-                "recording_ended_at": recording.recording_ended_at.isoformat() if recording.recording_ended_at else None,
-                "file_size_bytes": recording.file_size_bytes,
-                "duration_seconds": recording.duration_seconds,
-                "status": recording.processing_status,
-                "created_at": recording.created_at.isoformat() if recording.created_at else None,
-                "updated_at": recording.updated_at.isoformat() if recording.updated_at else None
-            })
-        
-        session.close()
+        recordings_list = [video_recording_to_dict(recording) for recording in recordings]
         
         return JSONResponse({
             "success": True,
@@ -1036,52 +943,23 @@ def get_videos_by_room(room_id: str):
 
 
 @api_router.get("/videos/guest/{guest_name}")
-def get_videos_by_guest(guest_name: str):
+async def get_videos_by_guest(guest_name: str, request: Request, stream: Optional[str] = None, session: AsyncSession = Depends(get_async_db)):
     """Get all video recordings for a specific guest"""
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
-        
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         from models import VideoRecording
         
         # Search by guest name (case insensitive)
-        recordings = session.query(VideoRecording).filter(
+        statement = select(VideoRecording).filter(
             VideoRecording.guest_name.ilike(f"%{guest_name}%")
-        ).order_by(VideoRecording.created_at.desc()).all()
-        
-        recordings_list = []
-        for recording in recordings:
-            recordings_list.append({
-                "id": recording.id,
-                "room_id": recording.room_id,
-                "video_url": recording.video_url,
-                "presigned_url": recording.presigned_url,
-                "egress_id": recording.egress_id,
-                "guest_name": recording.guest_name,
-                "guest_id": recording.guest_id,
-                "guest_phone": recording.guest_phone,
-                "guest_relation": recording.guest_relation,
-                "guest_table": recording.guest_table,
-                "recording_started_at": recording.recording_started_at.isoformat() if recording.recording_started_at else None,
-                "recording_ended_at": recording.recording_ended_at.isoformat() if recording.recording_ended_at else None,
-                "file_size_bytes": recording.file_size_bytes,
-                "duration_seconds": recording.duration_seconds,
-                "status": recording.processing_status,
-                "created_at": recording.created_at.isoformat() if recording.created_at else None,
-                "updated_at": recording.updated_at.isoformat() if recording.updated_at else None
-            })
+        ).order_by(VideoRecording.created_at.desc())
+        
+        stream_format = get_stream_format(request, stream)
+        if stream_format:
+            return stream_rows(statement, video_recording_to_dict, stream_format)
         
-        session.close()
+        recordings = (await session.execute(statement)).scalars().all()
+        
+        recordings_list = [video_recording_to_dict(recording) for recording in recordings]
         
         return JSONResponse({
             "success": True,
@@ -1099,40 +977,36 @@ def get_videos_by_guest(guest_name: str):
 
 
 @api_router.put("/videos/{recording_id}/complete")
-def complete_video_recording(recording_id: int):
-    """Mark video recording as completed when reset is called - no auth needed for agent"""
+async def complete_video_recording(recording_id: int, ended_at: Optional[float] = None, session: AsyncSession = Depends(get_async_db)):
+    """Mark video recording as completed when reset is called - no auth needed for agent
+    
+    ``ended_at`` (Unix time) is when the agent stopped the recording; the
+    agent's outbox may deliver this call later, and more than once.
+    """
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
         from datetime import datetime
         
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         from models import VideoRecording
         
-        recording = session.query(VideoRecording).filter_by(id=recording_id).first()
+        recording = await session.get(VideoRecording, recording_id)
         if not recording:
-            session.close()
             return JSONResponse({
                 "success": False,
                 "message": "Video recording not found"
             }, status_code=404)
         
+        if recording.processing_status == "completed":
+            return JSONResponse({
+                "success": True,
+                "message": "Video recording already completed"
+            })
+        
         # Update recording as completed
-        recording.recording_ended_at = datetime.utcnow()
+        recording.recording_ended_at = datetime.utcfromtimestamp(ended_at) if ended_at else datetime.utcnow()
         recording.processing_status = "completed"
         recording.updated_at = datetime.utcnow()
         
-        session.commit()
-        session.close()
+        await session.commit()
         
         return JSONResponse({
             "success": True,
@@ -1148,32 +1022,17 @@ def complete_video_recording(recording_id: int):
 
 
 @api_router.put("/videos/{recording_id}")
-def update_video_recording(recording_id: int, request: Request, authenticated: bool = Depends(require_auth)):
+async def update_video_recording(recording_id: int, request: Request, authenticated: bool = Depends(require_auth), session: AsyncSession = Depends(get_async_db)):
     """Update an existing video recording"""
     try:
-        import json
-        body = asyncio.run(request.body())
-        data = json.loads(body.decode())
+        data = await request.json()
         
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
         from datetime import datetime
         
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         from models import VideoRecording
         
-        recording = session.query(VideoRecording).filter_by(id=recording_id).first()
+        recording = await session.get(VideoRecording, recording_id)
         if not recording:
-            session.close()
             return JSONResponse({
                 "success": False,
                 "message": "Video recording not found"
@@ -1193,8 +1052,7 @@ def update_video_recording(recording_id: int, request: Request, authenticated: b
         
         recording.updated_at = datetime.utcnow()
         
-        session.commit()
-        session.close()
+        await session.commit()
         
         return JSONResponse({
             "success": True,
@@ -1210,35 +1068,20 @@ def update_video_recording(recording_id: int, request: Request, authenticated: b
 
 
 @api_router.delete("/videos/{recording_id}")
-def delete_video_recording(recording_id: int, authenticated: bool = Depends(require_auth)):
+async def delete_video_recording(recording_id: int, authenticated: bool = Depends(require_auth), session: AsyncSession = Depends(get_async_db)):
     """Delete a video recording"""
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
-        
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         from models import VideoRecording
         
-        recording = session.query(VideoRecording).filter_by(id=recording_id).first()
+        recording = await session.get(VideoRecording, recording_id)
         if not recording:
-            session.close()
             return JSONResponse({
                 "success": False,
                 "message": "Video recording not found"
             }, status_code=404)
         
-        session.delete(recording)
-        session.commit()
-        session.close()
+        await session.delete(recording)
+        await session.commit()
         
         return JSONResponse({
             "success": True,
@@ -1254,28 +1097,15 @@ def delete_video_recording(recording_id: int, authenticated: bool = Depends(requ
 
 
 @api_router.post("/videos/{recording_id}/refresh")
-def refresh_presigned_url(recording_id: int):
+async def refresh_presigned_url(recording_id: int, session: AsyncSession = Depends(get_async_db)):
     """Refresh the presigned URL for a video recording"""
     try:
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
         from datetime import datetime
         
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        import sys
-        sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         from models import VideoRecording
         
-        recording = session.query(VideoRecording).filter_by(id=recording_id).first()
+        recording = await session.get(VideoRecording, recording_id)
         if not recording:
-            session.close()
             return JSONResponse({
                 "success": False,
                 "message": "Video recording not found"
@@ -1283,40 +1113,19 @@ def refresh_presigned_url(recording_id: int):
         
         # Generate new presigned URL
         try:
-            import boto3
-            from botocore.exceptions import NoCredentialsError
-            
             # Extract S3 key from video URL
-            if "amazonaws.com/" in recording.video_url:
-                s3_key = recording.video_url.split("amazonaws.com/")[-1]
-            else:
-                session.close()
+            s3_key = s3_key_from_url(recording.video_url)
+            if not s3_key:
                 return JSONResponse({
                     "success": False,
                     "message": "Invalid S3 URL format"
                 }, status_code=400)
             
-            region = os.getenv("AWS_REGION", "me-central-1")
-            s3_client = boto3.client(
-                "s3",
-                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-                region_name=region,
-            )
-
-            new_presigned_url = s3_client.generate_presigned_url(
-                "get_object",
-                Params={
-                    "Bucket": os.getenv("AWS_BUCKET_NAME", "4wk-garage-media"),
-                    "Key": s3_key,
-                },
-                ExpiresIn=86400 * 7,  # 7 days
-            )
+            new_presigned_url = generate_presigned_url(s3_key)
             
             recording.presigned_url = new_presigned_url
             recording.updated_at = datetime.utcnow()
-            session.commit()
-            session.close()
+            await session.commit()
             
             return JSONResponse({
                 "success": True,
@@ -1325,7 +1134,6 @@ def refresh_presigned_url(recording_id: int):
             })
             
         except Exception as e:
-            session.close()
             return JSONResponse({
                 "success": False,
                 "message": f"Failed to generate presigned URL: {str(e)}"
@@ -1344,83 +1152,25 @@ def refresh_presigned_url(recording_id: int):
 # ========================================
 
 @api_router.get("/guests/export")
-def export_guests_excel(authenticated: bool = Depends(require_auth)):
-    """Export all guests to Excel file"""
+def export_guests_excel(format: str = "xlsx", authenticated: bool = Depends(require_auth)):
+    """Export all guests to an Excel (default), CSV or TSV file"""
     try:
-        import pandas as pd
-        from io import BytesIO
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
-        
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
-        
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        from models import Guest, RelationType
-        
-        # Get all guests with relation types
-        guests = session.query(Guest).join(RelationType, Guest.relation_type_id == RelationType.id, isouter=True).all()
-        
-        # Prepare data for Excel
-        data = []
-        for guest in guests:
-            data.append({
-                "ID": guest.id,
-                "First Name": guest.first_name,
-                "Last Name": guest.last_name,
-                "Phone": guest.phone,
-                "Seat Number": guest.seat_number,
-                "Relation": guest.relation,
-                "Relation Type": guest.relation_type.name if guest.relation_type else "",
-                "Message": guest.message,
-                "Story": guest.story,
-                "About": guest.about,
-                "Created": guest.created_at.strftime("%Y-%m-%d %H:%M") if guest.created_at else "",
-                "Updated": guest.updated_at.strftime("%Y-%m-%d %H:%M") if guest.updated_at else ""
-            })
-        
-        session.close()
+        from datetime import datetime
+        from backend.app.core.guest_export import EXPORT_FORMATS, iter_export
         
-        # Create Excel file
-        df = pd.DataFrame(data)
+        fmt = format.lower()
+        if fmt not in EXPORT_FORMATS:
+            return JSONResponse({
+                "success": False,
+                "message": f"Unsupported export format '{format}', use one of: {', '.join(EXPORT_FORMATS)}"
+            }, status_code=400)
         
-        # Create BytesIO buffer
-        excel_buffer = BytesIO()
-        
-        # Write to Excel with formatting
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Wedding Guests', index=False)
-            
-            # Get the workbook and worksheet
-            workbook = writer.book
-            worksheet = writer.sheets['Wedding Guests']
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-        
-        excel_buffer.seek(0)
-        
-        # Return as downloadable file
-        from datetime import datetime
-        filename = f"wedding_guests_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        # Rows are streamed from a server-side cursor; nothing holds the whole guest list
+        filename = f"wedding_guests_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
         
         return StreamingResponse(
-            BytesIO(excel_buffer.getvalue()),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            iter_export(fmt),
+            media_type=EXPORT_FORMATS[fmt],
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
         
@@ -1433,95 +1183,210 @@ def export_guests_excel(authenticated: bool = Depends(require_auth)):
 
 
 @api_router.post("/guests/import")
-def import_guests_excel(request: Request, authenticated: bool = Depends(require_auth)):
-    """Import guests from Excel file"""
+def import_guests_excel(file: UploadFile = File(...), authenticated: bool = Depends(require_auth), session: Session = Depends(get_db)):
+    """Import guests from an uploaded Excel (.xlsx) or CSV file (multipart/form-data, field "file")"""
+    try:
+        from backend.app.core.guest_import import import_spreadsheet
+        
+        print(f"📥 Importing guests from {file.filename}")
+        
+        # The upload is spooled to a temp file; rows are parsed and upserted one chunk at a time
+        try:
+            result = import_spreadsheet(session, file.file, file.filename)
+        except ValueError as validation_error:
+            session.rollback()
+            return JSONResponse({
+                "success": False,
+                "message": str(validation_error)
+            }, status_code=400)
+        
+        if result.imported > 0:
+            session.commit()
+            # Sync route: the index update and the signal to the other workers run on the event loop
+            anyio.from_thread.run(partial(
+                guests_changed, changed_ids=result.guest_ids, reload_index=result.reload_index
+            ))
+        
+        print(f"✅ Imported guests: {result.inserted} new, {result.updated} updated, {len(result.errors)} skipped")
+        
+        return JSONResponse({
+            "success": True,
+            "message": f"Successfully imported {result.imported} guests ({result.inserted} new, {result.updated} updated)",
+            **result.to_dict()
+        })
+        
+    except Exception as e:
+        print(f"Error importing guests: {e}")
+        return JSONResponse({
+            "success": False,
+            "message": f"Error importing guests: {str(e)}"
+        }, status_code=500)
+
+
+# ========================================
+# BACKGROUND JOB ENDPOINTS
+# ========================================
+
+def _job_accepted(job: dict) -> JSONResponse:
+    return JSONResponse({
+        "success": True,
+        "message": f"Job {job['id']} queued",
+        "job": job,
+        "status_url": f"/api/jobs/{job['id']}"
+    }, status_code=202)
+
+
+@api_router.post("/jobs/guest-import")
+async def enqueue_guest_import(file: UploadFile = File(...), authenticated: bool = Depends(require_auth)):
+    """Queue a guest spreadsheet import (.xlsx or .csv) and return immediately"""
     try:
-        import pandas as pd
-        import base64
-        from io import BytesIO
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
         import os
-        from datetime import datetime
-        import json
+        import shutil
+        import uuid
         
-        body = asyncio.run(request.body())
-        data = json.loads(body.decode())
+        from backend.app.core.guest_import import CSV_EXTENSIONS, EXCEL_EXTENSIONS
         
-        # Get the base64 encoded file
-        file_content = data.get("file_content")
-        if not file_content:
+        filename = os.path.basename(file.filename or "")
+        if not filename.lower().endswith(EXCEL_EXTENSIONS + CSV_EXTENSIONS):
             return JSONResponse({
                 "success": False,
-                "message": "No file content provided"
+                "message": "Unsupported file type, upload an .xlsx or .csv file"
             }, status_code=400)
         
-        # Decode base64 file content
-        file_bytes = base64.b64decode(file_content.split(',')[1])  # Remove data:application/... prefix
-        excel_buffer = BytesIO(file_bytes)
+        # Keep the upload on disk for the worker
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(settings.JOB_FILES_DIR, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        path = os.path.join(job_dir, filename)
         
-        # Read Excel file
-        df = pd.read_excel(excel_buffer)
+        def save_upload():
+            with open(path, "wb") as output:
+                shutil.copyfileobj(file.file, output)
         
-        # Database connection
-        database_url = os.getenv("DATABASE_URL")
-        sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+        await asyncio.to_thread(save_upload)
         
-        engine = create_engine(sync_database_url)
-        Session = sessionmaker(bind=engine)
-        session = Session()
+        job = await job_runner.enqueue("guest-import", {"path": path, "filename": filename}, job_id=job_id)
+        return _job_accepted(job)
         
-        from models import Guest, RelationType
+    except Exception as e:
+        print(f"Error queuing guest import: {e}")
+        return JSONResponse({
+            "success": False,
+            "message": f"Error queuing guest import: {str(e)}"
+        }, status_code=500)
+
+
+@api_router.post("/jobs/guest-export")
+async def enqueue_guest_export(format: str = "xlsx", authenticated: bool = Depends(require_auth)):
+    """Queue a guest list export; the file is downloadable from the finished job"""
+    try:
+        from backend.app.core.guest_export import EXPORT_FORMATS
         
-        # Get existing relation types for mapping
-        relation_types = {rt.name: rt.id for rt in session.query(RelationType).all()}
+        fmt = format.lower()
+        if fmt not in EXPORT_FORMATS:
+            return JSONResponse({
+                "success": False,
+                "message": f"Unsupported export format '{format}', use one of: {', '.join(EXPORT_FORMATS)}"
+            }, status_code=400)
         
-        imported_count = 0
-        errors = []
+        job = await job_runner.enqueue("guest-export", {"format": fmt})
+        return _job_accepted(job)
         
-        for index, row in df.iterrows():
-            try:
-                # Map relation type name to ID
-                relation_type_id = None
-                if pd.notna(row.get("Relation Type", "")):
-                    relation_type_id = relation_types.get(str(row["Relation Type"]))
-                
-                # Create new guest
-                new_guest = Guest(
-                    first_name=str(row.get("First Name", "")).strip(),
-                    last_name=str(row.get("Last Name", "")).strip(),
-                    phone=str(row.get("Phone", "")).strip() if pd.notna(row.get("Phone")) else None,
-                    seat_number=str(row.get("Seat Number", "")).strip() if pd.notna(row.get("Seat Number")) else None,
-                    relation=str(row.get("Relation", "")).strip() if pd.notna(row.get("Relation")) else None,
-                    relation_type_id=relation_type_id,
-                    message=str(row.get("Message", "")).strip() if pd.notna(row.get("Message")) else None,
-                    story=str(row.get("Story", "")).strip() if pd.notna(row.get("Story")) else None,
-                    about=str(row.get("About", "")).strip() if pd.notna(row.get("About")) else None,
-                    created_at=datetime.utcnow(),
-                    updated_at=datetime.utcnow()
-                )
-                
-                session.add(new_guest)
-                imported_count += 1
-                
-            except Exception as row_error:
-                errors.append(f"Row {index + 2}: {str(row_error)}")
+    except Exception as e:
+        print(f"Error queuing guest export: {e}")
+        return JSONResponse({
+            "success": False,
+            "message": f"Error queuing guest export: {str(e)}"
+        }, status_code=500)
+
+
+@api_router.post("/jobs/refresh-presigned-urls")
+async def enqueue_refresh_presigned_urls(authenticated: bool = Depends(require_auth)):
+    """Queue a refresh of the presigned URLs of every available recording"""
+    try:
+        job = await job_runner.enqueue("refresh-presigned-urls")
+        return _job_accepted(job)
         
-        if imported_count > 0:
-            session.commit()
+    except Exception as e:
+        print(f"Error queuing presigned URL refresh: {e}")
+        return JSONResponse({
+            "success": False,
+            "message": f"Error queuing presigned URL refresh: {str(e)}"
+        }, status_code=500)
+
+
+@api_router.get("/jobs")
+async def list_jobs(limit: int = 20, authenticated: bool = Depends(require_auth)):
+    """Get the most recent background jobs"""
+    try:
+        jobs = await job_runner.list_recent(max(1, min(limit, 100)))
+        return JSONResponse({
+            "success": True,
+            "jobs": jobs,
+            "total": len(jobs)
+        })
         
-        session.close()
+    except Exception as e:
+        print(f"Error fetching jobs: {e}")
+        return JSONResponse({
+            "success": False,
+            "message": f"Error fetching jobs: {str(e)}"
+        }, status_code=500)
+
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, authenticated: bool = Depends(require_auth)):
+    """Get the status, progress and result of a background job"""
+    try:
+        job = await job_runner.get(job_id)
+        if not job:
+            return JSONResponse({
+                "success": False,
+                "message": "Job not found"
+            }, status_code=404)
         
         return JSONResponse({
             "success": True,
-            "message": f"Successfully imported {imported_count} guests",
-            "imported_count": imported_count,
-            "errors": errors
+            "job": job
         })
         
     except Exception as e:
-        print(f"Error importing guests: {e}")
+        print(f"Error fetching job: {e}")
         return JSONResponse({
             "success": False,
-            "message": f"Error importing guests: {str(e)}"
+            "message": f"Error fetching job: {str(e)}"
+        }, status_code=500)
+
+
+@api_router.get("/jobs/{job_id}/download")
+async def download_job_file(job_id: str, authenticated: bool = Depends(require_auth)):
+    """Download the file produced by a completed job (e.g. a guest export)"""
+    try:
+        import os
+        from fastapi.responses import FileResponse
+        from backend.app.core.guest_export import EXPORT_FORMATS
+        
+        job = await job_runner.get(job_id)
+        result = (job or {}).get("result") or {}
+        if not job or job["status"] != "completed" or not result.get("filename"):
+            return JSONResponse({
+                "success": False,
+                "message": "No file available for this job"
+            }, status_code=404)
+        
+        path = os.path.join(settings.JOB_FILES_DIR, job_id, os.path.basename(result["filename"]))
+        if not os.path.exists(path):
+            return JSONResponse({
+                "success": False,
+                "message": "Job file has been removed"
+            }, status_code=404)
+        
+        fmt = path.rsplit(".", 1)[-1]
+        return FileResponse(path, media_type=EXPORT_FORMATS.get(fmt), filename=result["filename"])
+        
+    except Exception as e:
+        print(f"Error downloading job file: {e}")
+        return JSONResponse({
+            "success": False,
+            "message": f"Error downloading job file: {str(e)}"
         }, status_code=500)
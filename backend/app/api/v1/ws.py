@@ -0,0 +1,127 @@
+"""
+WebSocket event channel for the mirror display.
+
+``/ws/mirror`` carries the same events as ``/api/events`` from the same hub,
+as binary frames of compact JSON (WebSocket already frames messages, so no
+length prefix is needed):
+
+- server -> client: ``{"id": <event id>, "event": {...}}``; the first frame
+  is the ``connected`` event (``"id": null``)
+- client -> server: ``{"type": "ack", "id": <event id>}`` once the event has
+  been rendered. Send-to-ack latency is tracked per client and reported by
+  ``GET /api/events/stats``.
+
+Query parameters:
+
+- ``mirror``: the kiosk's LiveKit room name; the client gets that mirror's
+  events and the ones sent to every mirror
+- ``last_event_id``: replay missed events, as with SSE ``Last-Event-ID``
+- ``display_id``: id of the display event the client already shows; if it is
+  still current the ``connected`` event omits ``current_text`` and ``lines``
+
+Display updates whose text matches what the client already shows are not
+sent again. As on ``/api/events``, admin events (job progress) are only sent
+to clients with the admin cookie.
+"""
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from backend.app.core.auth import check_auth
+from backend.app.core.event_hub import Subscriber, encode_packet, event_hub
+from backend.app.core.mirror_bus import mirror_bus, resolve_mirror
+
+ws_router = APIRouter()
+
+# Close code asking the client to reconnect later (it fell too far behind)
+CLOSE_TRY_AGAIN_LATER = 1013
+# Close code for an invalid mirror id
+CLOSE_POLICY_VIOLATION = 1008
+
+
+def _parse_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def _send_events(websocket: WebSocket, subscriber: Subscriber):
+    while True:
+        packet = await subscriber.get()
+        if packet is None:
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+            return
+        await websocket.send_bytes(packet)
+
+
+async def _receive_acks(websocket: WebSocket, subscriber: Subscriber):
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        data = message.get("text") or message.get("bytes")
+        try:
+            ack = json.loads(data)
+            if ack.get("type") == "ack" and ack.get("id") is not None:
+                subscriber.ack(int(ack["id"]))
+        except (TypeError, ValueError, AttributeError):
+            # Ignore anything that is not a well-formed ack
+            continue
+
+
+@ws_router.websocket("/ws/mirror")
+async def mirror_socket(
+    websocket: WebSocket,
+    mirror: Optional[str] = None,
+    last_event_id: Optional[str] = None,
+    display_id: Optional[str] = None,
+):
+    """Mirror events over WebSocket with client acks"""
+    try:
+        mirror = resolve_mirror(mirror)
+    except ValueError:
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscriber = event_hub.subscribe(
+        last_event_id=_parse_id(last_event_id), transport="ws", mirror=mirror,
+        admin=check_auth(websocket.cookies.get("mirror_auth"))
+    )
+
+    try:
+        initial_message = {
+            "type": "connected",
+            "message": "Connected to mirror",
+            "mirror": mirror,
+            "replayed": len(subscriber.queue)
+        }
+        display = mirror_bus.display_for(mirror)
+        current_text = display.render()
+        initial_message["version"] = display.version
+        client_display_id = _parse_id(display_id)
+        if client_display_id is None or client_display_id != event_hub.display_event_id(mirror):
+            initial_message["current_text"] = current_text
+            initial_message["lines"] = display.lines()
+        subscriber.display_text = current_text
+        await websocket.send_bytes(encode_packet(initial_message))
+
+        tasks = [
+            asyncio.create_task(_send_events(websocket, subscriber)),
+            asyncio.create_task(_receive_acks(websocket, subscriber)),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Also runs when the connection handler itself is cancelled
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                print(f"WebSocket client disconnected: {task.exception()}")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        event_hub.unsubscribe(subscriber)
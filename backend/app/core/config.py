@@ -1,3 +1,5 @@
+from typing import Dict
+
 from pydantic_settings import BaseSettings
 
 
@@ -14,11 +16,35 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "postgresql:///mirror?user=husain"
     DATABASE_SCHEMA: str = "mirror_app"
+    DB_POOL_SIZE: int = 10  # Persistent connections kept open per process
+    DB_MAX_OVERFLOW: int = 10  # Extra connections allowed during bursts
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    DB_POOL_TIMEOUT: int = 10  # Seconds to wait for a free connection
+    QUERY_BUDGET_ENFORCE: bool = False  # Fail requests that exceed their route's SQL statement budget
+
+    # Guest search
+    GUEST_SEARCH_BATCH_MAX_NAMES: int = 20  # Names accepted by one /guest/search/batch call
+    GUEST_SEARCH_BATCH_MAX_LIMIT: int = 5  # Matches returned per name by /guest/search/batch
+
+    # Server-sent events
+    SSE_QUEUE_SIZE: int = 100  # Events buffered per /api/events client before the oldest is dropped
+    SSE_MAX_LAG_SECONDS: float = 60.0  # Clients dropping events for longer than this are disconnected
+    SSE_HEARTBEAT_SECONDS: float = 30.0  # Keep-alive ping interval for idle /api/events clients
+    SSE_REPLAY_SIZE: int = 100  # Recent events kept for Last-Event-ID replay on reconnect
+    SSE_COALESCE_WINDOWS_MS: Dict[str, int] = {"text_update": 30, "reset": 30, "display_patch": 30}  # Superseded events of these types within the window collapse to the latest
+    MIRROR_BUS: str = "postgres"  # "postgres" shares mirror state/events across workers via LISTEN/NOTIFY, "memory" keeps them in-process
     
     # File uploads
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     
+    # Background jobs
+    JOB_WORKERS: int = 2  # Jobs (imports, exports, bulk refreshes) run concurrently
+    JOB_FILES_DIR: str = "uploads/jobs"  # Job uploads and generated files
+    JOB_FILES_RETENTION_HOURS: float = 24.0  # Files of finished jobs older than this are deleted
+    JOB_HEARTBEAT_SECONDS: float = 30.0  # How often a worker marks its queued/running jobs as alive
+    JOB_STALE_SECONDS: float = 120.0  # Unfinished jobs without a heartbeat for this long are failed (their worker is gone)
+    
     # LiveKit settings (will be loaded from environment)
     LIVEKIT_URL: str = ""  # Set via LIVEKIT_URL env var
     LIVEKIT_API_KEY: str = ""  # Set via LIVEKIT_API_KEY env var  
@@ -0,0 +1,130 @@
+"""
+Database engine and session management for the Wedding Mirror API.
+
+Pooled engines are created once per process at startup and shared by every
+request. Guest, video and search routes run on the asyncpg ``AsyncEngine``
+through ``get_async_db``; pandas-based Excel import/export keeps using the
+synchronous engine through ``get_db``.
+"""
+import os
+import sys
+import logging
+from typing import AsyncIterator, Iterator, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.app.core.config import settings
+from backend.app.core.query_counter import instrument_engine
+
+# models.py lives in backend/ and is imported as a top-level module everywhere
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+logger = logging.getLogger(__name__)
+
+engine: Optional[Engine] = None
+SessionLocal: Optional[sessionmaker] = None
+
+async_engine: Optional[AsyncEngine] = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+
+def get_sync_database_url() -> str:
+    """Return DATABASE_URL with the asyncpg driver swapped for psycopg2"""
+    return settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+
+def get_async_database_url() -> str:
+    """Return DATABASE_URL using the asyncpg driver"""
+    if settings.DATABASE_URL.startswith("postgresql://"):
+        return settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return settings.DATABASE_URL
+
+
+def init_engine() -> Engine:
+    """Create the process-wide engine and session factory (idempotent)"""
+    global engine, SessionLocal
+    if engine is None:
+        engine = create_engine(
+            get_sync_database_url(),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_pre_ping=True,
+            echo=False  # Set to True for SQL debugging
+        )
+        instrument_engine(engine)
+        SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+        logger.info(
+            f"Database engine created (pool_size={settings.DB_POOL_SIZE}, "
+            f"max_overflow={settings.DB_MAX_OVERFLOW}, recycle={settings.DB_POOL_RECYCLE}s)"
+        )
+    return engine
+
+
+def init_async_engine() -> AsyncEngine:
+    """Create the process-wide async engine and session factory (idempotent)"""
+    global async_engine, AsyncSessionLocal
+    if async_engine is None:
+        async_engine = create_async_engine(
+            get_async_database_url(),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_pre_ping=True,
+            echo=False
+        )
+        instrument_engine(async_engine.sync_engine)
+        AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+        logger.info("Async database engine created")
+    return async_engine
+
+
+def dispose_engine() -> None:
+    """Close all pooled connections on shutdown"""
+    global engine, SessionLocal
+    if engine is not None:
+        engine.dispose()
+        logger.info("Database engine disposed")
+    engine = None
+    SessionLocal = None
+
+
+async def dispose_async_engine() -> None:
+    """Close all pooled asyncpg connections on shutdown"""
+    global async_engine, AsyncSessionLocal
+    if async_engine is not None:
+        await async_engine.dispose()
+        logger.info("Async database engine disposed")
+    async_engine = None
+    AsyncSessionLocal = None
+
+
+def get_db() -> Iterator[Session]:
+    """FastAPI dependency yielding a session that is closed after the request"""
+    if SessionLocal is None:
+        init_engine()
+    session = SessionLocal()
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI dependency yielding an AsyncSession that is closed after the request"""
+    if AsyncSessionLocal is None:
+        init_async_engine()
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
@@ -0,0 +1,159 @@
+"""
+Structured mirror display: named layouts made of slots, with a version.
+
+The server keeps the authoritative display state per mirror. Updates are
+sent as ``display_patch`` events that carry only the slots that changed:
+
+    {"type": "display_patch", "base": 7, "version": 8, "slots": {"name": "Sara!"}}
+
+A client applies a patch when its version equals ``base``; otherwise it
+fetches a snapshot from ``GET /api/display``. A patch that changes the
+layout (or is sent to every mirror) carries the full ``lines`` and applies
+whatever the client's version is. HTML is only rendered for snapshots, the
+connect message and the legacy ``text_update``/``reset`` events.
+
+Raw HTML set through ``/api/update-text`` is kept as an ``html`` layout
+without slots.
+"""
+import html
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+HTML_LAYOUT = "html"
+
+# Layout name -> ordered (slot, CSS classes, default text)
+LAYOUTS: Dict[str, List[Tuple[str, str, str]]] = {
+    "welcome": [
+        ("welcome", "line welcome fancy", "Welcome to"),
+        ("names", "line names fancy", "Moatasem & Hala Wedding"),
+        ("prompt", "line script", "Say Mirror Mirror to begin"),
+    ],
+    "guest": [
+        ("greeting", "line fancy", "Welcome"),
+        ("name", "line fancy", ""),
+        ("couple", "line fancy", "To Moatasem & Hala"),
+        ("footer", "line script", "Enjoy the celebration!"),
+    ],
+    "message": [
+        ("message", "line fancy", ""),
+        ("couple", "line fancy", "To Moatasem & Hala"),
+        ("footer", "line script", "Enjoy the celebration!"),
+    ],
+}
+DEFAULT_LAYOUT = "welcome"
+
+DISPLAY_PATCH = "display_patch"
+
+
+class DisplayState:
+    """Display shown on one mirror"""
+
+    def __init__(
+        self,
+        layout: str = DEFAULT_LAYOUT,
+        slots: Optional[Dict[str, str]] = None,
+        version: int = 0,
+        raw_html: Optional[str] = None,
+    ):
+        self.layout = layout
+        self.slots = dict(slots or {})
+        self.version = version
+        self.raw_html = raw_html
+
+    @classmethod
+    def from_html(cls, text: str, version: int = 0) -> "DisplayState":
+        return cls(HTML_LAYOUT, version=version, raw_html=text)
+
+    def lines(self) -> Optional[List[Dict[str, str]]]:
+        """Ordered lines of a slot layout (None for raw HTML)"""
+        if self.layout == HTML_LAYOUT:
+            return None
+        return [
+            {"slot": slot, "class": css_class, "text": self.slots.get(slot, default)}
+            for slot, css_class, default in LAYOUTS[self.layout]
+        ]
+
+    def render(self) -> str:
+        if self.layout == HTML_LAYOUT:
+            return self.raw_html or ""
+        return "".join(
+            f'<span class="{line["class"]}">{html.escape(line["text"], quote=False)}</span>'
+            for line in self.lines()
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "layout": self.layout,
+            "lines": self.lines(),
+            "html": self.render(),
+        }
+
+    def patch(self, layout: str, slots: Dict[str, str], full: bool = False) -> Optional[Dict[str, Any]]:
+        """``display_patch`` event turning this state into ``layout``/``slots``; None if nothing changes"""
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout '{layout}'. Available: {', '.join(sorted(LAYOUTS))}")
+        known = {slot for slot, _, _ in LAYOUTS[layout]}
+        unknown = set(slots) - known
+        if unknown:
+            raise ValueError(f"Unknown slots for layout '{layout}': {', '.join(sorted(unknown))}")
+
+        target = DisplayState(layout, slots, self.version + 1)
+        message = {"type": DISPLAY_PATCH, "base": self.version, "version": target.version}
+        if full or layout != self.layout:
+            message.update({"layout": layout, "lines": target.lines()})
+            return message
+        current = {line["slot"]: line["text"] for line in self.lines()}
+        changed = {line["slot"]: line["text"] for line in target.lines() if current[line["slot"]] != line["text"]}
+        if not changed:
+            return None
+        message["slots"] = changed
+        return message
+
+    def apply(self, message: Dict[str, Any]) -> "DisplayState":
+        """State after a display event (``text_update``, ``reset`` or ``display_patch``)"""
+        version = message.get("version", self.version + 1)
+        event_type = message.get("type")
+        if event_type == "reset":
+            return DisplayState(version=version)
+        if event_type == "text_update":
+            return DisplayState.from_html(message.get("text", ""), version)
+        if "lines" in message:
+            return DisplayState(
+                message["layout"], {line["slot"]: line["text"] for line in message["lines"]}, version
+            )
+        slots = dict(self.slots)
+        slots.update(message.get("slots", {}))
+        return DisplayState(self.layout, slots, version, self.raw_html)
+
+    def to_json(self) -> str:
+        return json.dumps({"layout": self.layout, "slots": self.slots, "version": self.version})
+
+    @classmethod
+    def from_json(cls, data: str, text: str) -> "DisplayState":
+        """State saved by ``to_json``; raw HTML layouts are restored from the rendered ``text``"""
+        values = json.loads(data)
+        if values["layout"] == HTML_LAYOUT or values["layout"] not in LAYOUTS:
+            return cls.from_html(text, values.get("version", 0))
+        return cls(values["layout"], values.get("slots"), values.get("version", 0))
+
+
+def is_partial_patch(message: Dict[str, Any]) -> bool:
+    """A patch that only applies on top of the version before it"""
+    return message.get("type") == DISPLAY_PATCH and "lines" not in message
+
+
+def merge_display_events(held: Dict[str, Any], newer: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """One event equivalent to ``held`` followed by ``newer``; None if ``held`` must be sent first"""
+    if not is_partial_patch(newer):
+        # Full states replace whatever came before
+        return newer
+    if held.get("type") != DISPLAY_PATCH or held.get("version") != newer.get("base"):
+        return None
+    if "lines" in held:
+        lines = [
+            {**line, "text": newer["slots"].get(line["slot"], line["text"])}
+            for line in held["lines"]
+        ]
+        return {**held, "version": newer["version"], "lines": lines}
+    return {**held, "version": newer["version"], "slots": {**held["slots"], **newer["slots"]}}
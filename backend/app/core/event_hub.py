@@ -0,0 +1,490 @@
+"""
+Fan-out hub for the /api/events server-sent event stream and the /ws/mirror
+WebSocket.
+
+Every connection subscribes to the hub and gets a small bounded queue.
+Publishing never awaits a subscriber:
+
+- state events that supersede each other (display text, a job's progress)
+  are coalesced, so a subscriber only keeps the latest one pending
+- when a queue is still full the oldest event is dropped and counted
+- a subscriber that keeps dropping events for longer than
+  ``SSE_MAX_LAG_SECONDS`` is evicted and its stream is closed; the browser's
+  EventSource reconnects and starts from the current state
+
+Subscribers live in a dict keyed by id, so subscribe/unsubscribe are O(1)
+and a tab left open all night costs at most one full queue.
+
+Each event is serialized once, at publish time, and wrapped into an
+immutable SSE frame (``id: <n>\ndata: <json>\n\n``) and WebSocket packet
+(``{"id":<n>,"event":<json>}``); every subscriber queues a reference to the
+same ``Event``. Keep-alives come from a single ticker task that wakes the
+idle subscribers with one pre-encoded ping frame per tick, instead of a
+``wait_for`` timer and a fresh ping per connection.
+
+The last ``SSE_REPLAY_SIZE`` events stay in a ring buffer. A reconnecting
+client that sends ``Last-Event-ID`` gets the events it missed replayed from
+memory. Event ids are microsecond timestamps (the local count starts at the
+boot time; ``mirror_bus`` supplies database-clock ids shared by all
+workers). The hub remembers the highest id that has left the ring (starting
+at its boot time) and refuses replay to a client whose Last-Event-ID is
+older, since part of its gap is gone; an id from a previous process is
+refused the same way. Ids from other workers can arrive slightly out of
+order, so replayed events are picked by id rather than by position.
+
+Superseding events can be held for a short per-type window
+(``SSE_COALESCE_WINDOWS_MS``): a burst such as reset, reset, text_update,
+text_update for one mirror within the window goes out as the last event
+only, so the display renders once. Held ``display_patch`` events are merged
+rather than replaced, so the one sent still carries every changed slot. Any
+other event for that mirror (e.g. ``audio_play``) flushes what is held first
+and is sent right away, so order is preserved.
+
+Subscribers belong to a mirror (the kiosk's LiveKit room name). Events
+published for a mirror reach only that mirror's subscribers; events
+published without one (admin updates) reach everyone. Admin events (job
+progress) reach only subscribers that connected with the admin cookie, never
+the kiosks.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from backend.app.core.config import settings
+from backend.app.core.display_model import DISPLAY_PATCH, is_partial_patch, merge_display_events
+
+# Events that only matter in their latest version, and the key that groups them
+DISPLAY_EVENT_TYPES = ("text_update", "reset", DISPLAY_PATCH)
+# Events only delivered to authenticated admin subscribers
+ADMIN_EVENT_TYPES = ("job_progress",)
+
+
+def is_admin_event(message: Dict[str, Any]) -> bool:
+    return message.get("type") in ADMIN_EVENT_TYPES
+
+
+def coalesce_key(message: Dict[str, Any]) -> Optional[str]:
+    """Key shared by events that replace each other, or None if every event must be delivered"""
+    event_type = message.get("type")
+    if event_type in DISPLAY_EVENT_TYPES:
+        return "display"
+    if event_type == "job_progress":
+        return f"job:{message.get('job', {}).get('id')}"
+    return None
+
+
+def display_text(message: Dict[str, Any]) -> Optional[str]:
+    """Mirror text set by a display event, or None for other events"""
+    if message.get("type") == "text_update":
+        return message.get("text")
+    if message.get("type") == "reset":
+        return message.get("new_text")
+    return None
+
+
+def encode_payload(message: Dict[str, Any]) -> bytes:
+    """Compact UTF-8 JSON shared by the SSE frame and the WebSocket packet"""
+    return json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+
+def encode_frame(message: Dict[str, Any], event_id: Optional[int] = None, payload: Optional[bytes] = None) -> bytes:
+    """SSE wire frame for ``message`` (with an ``id:`` line when ``event_id`` is given)"""
+    data = payload if payload is not None else encode_payload(message)
+    if event_id is None:
+        return b"data: " + data + b"\n\n"
+    return b"id: %d\ndata: " % event_id + data + b"\n\n"
+
+
+def encode_packet(message: Dict[str, Any], event_id: Optional[int] = None, payload: Optional[bytes] = None) -> bytes:
+    """WebSocket binary packet for ``message``: ``{"id":<n>,"event":<message>}``"""
+    data = payload if payload is not None else encode_payload(message)
+    if event_id is None:
+        return b'{"id":null,"event":' + data + b"}"
+    return b'{"id":%d,"event":' % event_id + data + b"}"
+
+
+class Event(NamedTuple):
+    """A published event, encoded once and shared by every subscriber's queue"""
+    id: int
+    mirror: Optional[str]
+    key: Optional[str]
+    message: Dict[str, Any]
+    frame: bytes
+    packet: bytes
+
+
+class Subscriber:
+    """One connection's bounded queue, lag counters and (WebSocket) acks"""
+
+    def __init__(self, subscriber_id: int, max_queue: int, transport: str = "sse",
+                 mirror: Optional[str] = None, admin: bool = False):
+        self.id = subscriber_id
+        self.transport = transport
+        self.mirror = mirror
+        self.admin = admin
+        self.queue: Deque[Event] = deque()
+        self.max_queue = max_queue
+        self.ready = asyncio.Event()
+        self.connected_at = time.time()
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.behind_since: Optional[float] = None
+        self.evicted = False
+        self.heartbeat: Optional[bytes] = None
+        # Mirror text last sent to a WebSocket client, to skip identical display updates
+        self.display_text: Optional[str] = None
+        self.skipped = 0
+        # Send times of events awaiting a WebSocket ack
+        self._unacked: Dict[int, float] = {}
+        self.acked = 0
+        self.ack_latency_total = 0.0
+        self.ack_latency_max = 0.0
+
+    def push(self, event: Event):
+        # A partial display patch builds on the pending event instead of replacing it
+        if event.key is not None and not is_partial_patch(event.message):
+            for pending in list(self.queue):
+                if pending.key == event.key:
+                    # The newer state replaces the pending one and moves to the back
+                    self.queue.remove(pending)
+                    self.coalesced += 1
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.dropped += 1
+            if self.behind_since is None:
+                self.behind_since = time.monotonic()
+        self.queue.append(event)
+        self.ready.set()
+
+    def ping(self, frame: bytes):
+        """Wake an idle subscriber with the shared heartbeat frame"""
+        self.heartbeat = frame
+        self.ready.set()
+
+    def lag_seconds(self) -> float:
+        return time.monotonic() - self.behind_since if self.behind_since is not None else 0.0
+
+    async def get(self) -> Optional[bytes]:
+        """Next frame to send (an event or a heartbeat), or None once the subscriber has been evicted"""
+        while True:
+            while not self.queue and self.heartbeat is None and not self.evicted:
+                self.ready.clear()
+                await self.ready.wait()
+            if self.evicted:
+                return None
+            if not self.queue:
+                frame, self.heartbeat = self.heartbeat, None
+                return frame
+            event = self.queue.popleft()
+            # A pending heartbeat is redundant when real data is flowing
+            self.heartbeat = None
+            if not self.queue:
+                # Caught up again
+                self.behind_since = None
+            if self.transport == "ws":
+                if self._already_displayed(event):
+                    self.skipped += 1
+                    continue
+                self._track(event.id)
+                self.delivered += 1
+                return event.packet
+            self.delivered += 1
+            return event.frame
+
+    def _already_displayed(self, event: Event) -> bool:
+        text = display_text(event.message)
+        if text is None:
+            if event.key == "display":
+                # A patch changed the display; the last full text no longer applies
+                self.display_text = None
+            return False
+        if text == self.display_text:
+            return True
+        self.display_text = text
+        return False
+
+    def _track(self, event_id: int):
+        self._unacked[event_id] = time.monotonic()
+        if len(self._unacked) > self.max_queue:
+            # The client is not acking; forget the oldest send
+            self._unacked.pop(next(iter(self._unacked)))
+
+    def ack(self, event_id: int) -> Optional[float]:
+        """Record the client's ack for ``event_id``; returns the send-to-ack latency in seconds"""
+        sent_at = self._unacked.pop(event_id, None)
+        if sent_at is None:
+            return None
+        latency = time.monotonic() - sent_at
+        self.acked += 1
+        self.ack_latency_total += latency
+        self.ack_latency_max = max(self.ack_latency_max, latency)
+        return latency
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "id": self.id,
+            "transport": self.transport,
+            "mirror": self.mirror,
+            "admin": self.admin,
+            "connected_seconds": round(time.time() - self.connected_at),
+            "queued": len(self.queue),
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "lag_seconds": round(self.lag_seconds(), 1),
+        }
+        if self.transport == "ws":
+            stats.update({
+                "skipped": self.skipped,
+                "acked": self.acked,
+                "unacked": len(self._unacked),
+                "ack_latency_ms_avg": round(self.ack_latency_total * 1000 / self.acked, 1) if self.acked else None,
+                "ack_latency_ms_max": round(self.ack_latency_max * 1000, 1),
+            })
+        return stats
+
+
+class EventHub:
+    """Registry of SSE subscribers with non-blocking, bounded fan-out"""
+
+    def __init__(
+        self,
+        max_queue: Optional[int] = None,
+        max_lag_seconds: Optional[float] = None,
+        heartbeat_seconds: Optional[float] = None,
+        replay_size: Optional[int] = None,
+        coalesce_windows_ms: Optional[Dict[str, int]] = None,
+    ):
+        self._subscribers: Dict[int, Subscriber] = {}
+        self._by_mirror: Dict[str, Dict[int, Subscriber]] = {}
+        self._admins: Dict[int, Subscriber] = {}
+        self._ids = itertools.count(1)
+        self._last_event_id = int(time.time() * 1_000_000)
+        self._history: Deque[Event] = deque(maxlen=replay_size or settings.SSE_REPLAY_SIZE)
+        # Highest id no longer buffered; older Last-Event-IDs cannot be replayed in full
+        self._replay_floor = self._last_event_id
+        self.max_queue = max_queue or settings.SSE_QUEUE_SIZE
+        self.max_lag_seconds = max_lag_seconds or settings.SSE_MAX_LAG_SECONDS
+        self.heartbeat_seconds = heartbeat_seconds or settings.SSE_HEARTBEAT_SECONDS
+        self.evicted = 0
+        self.published = 0
+        # Id of the latest display event per mirror (None: sent to every mirror)
+        self._display_ids: Dict[Optional[str], int] = {}
+        self._ticker: Optional[asyncio.Task] = None
+        # Seconds superseding events are held per type, and the events held per (mirror, key)
+        self.coalesce_windows = {
+            event_type: window_ms / 1000
+            for event_type, window_ms in (coalesce_windows_ms if coalesce_windows_ms is not None else settings.SSE_COALESCE_WINDOWS_MS).items()
+        }
+        self._held: Dict[Tuple[Optional[str], str], Tuple[Dict[str, Any], Optional[int]]] = {}
+        self._flush_timers: Dict[Tuple[Optional[str], str], asyncio.TimerHandle] = {}
+        self.superseded = 0
+
+    # ------------------------------------------------------------------
+    # Heartbeat
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Start the shared heartbeat ticker"""
+        if self._ticker is None:
+            self._ticker = asyncio.create_task(self._tick())
+
+    async def stop(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            await asyncio.gather(self._ticker, return_exceptions=True)
+            self._ticker = None
+        self.flush()
+
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            if not self._subscribers:
+                continue
+            # One frame per tick, shared by every idle subscriber
+            frame = encode_frame({"type": "ping", "timestamp": loop.time()})
+            for subscriber in self._subscribers.values():
+                # WebSocket connections are kept alive by protocol-level pings
+                if subscriber.transport == "sse" and not subscriber.queue:
+                    subscriber.ping(frame)
+
+    # ------------------------------------------------------------------
+    # Subscribers and publishing
+    # ------------------------------------------------------------------
+
+    def subscribe(
+        self,
+        last_event_id: Optional[int] = None,
+        transport: str = "sse",
+        mirror: Optional[str] = None,
+        admin: bool = False,
+    ) -> Subscriber:
+        """Register a subscriber, pre-queuing the events after ``last_event_id`` if they are still buffered
+
+        ``admin`` subscribers (authenticated admin pages) also get admin events.
+        """
+        subscriber = Subscriber(next(self._ids), self.max_queue, transport, mirror, admin)
+        if last_event_id is not None:
+            for event in self.replay(last_event_id, mirror, admin)[-self.max_queue:]:
+                subscriber.push(event)
+        self._subscribers[subscriber.id] = subscriber
+        if mirror is not None:
+            self._by_mirror.setdefault(mirror, {})[subscriber.id] = subscriber
+        if admin:
+            self._admins[subscriber.id] = subscriber
+        return subscriber
+
+    def replay(self, last_event_id: int, mirror: Optional[str] = None, admin: bool = False) -> List[Event]:
+        """Buffered events for ``mirror`` newer than ``last_event_id``; empty if the gap is no longer fully buffered"""
+        if last_event_id < self._replay_floor:
+            # Part of the gap has been overwritten; the connected message carries the current state
+            return []
+        missed = [
+            event for event in self._history
+            if event.id > last_event_id and event.mirror in (None, mirror)
+            and (admin or not is_admin_event(event.message))
+        ]
+        return sorted(missed, key=lambda event: event.id)
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.pop(subscriber.id, None)
+        self._admins.pop(subscriber.id, None)
+        if subscriber.mirror is not None:
+            mirror_subscribers = self._by_mirror.get(subscriber.mirror)
+            if mirror_subscribers is not None:
+                mirror_subscribers.pop(subscriber.id, None)
+                if not mirror_subscribers:
+                    del self._by_mirror[subscriber.mirror]
+
+    def display_event_id(self, mirror: Optional[str] = None) -> Optional[int]:
+        """Id of the event that set the text currently shown on ``mirror``"""
+        return self._display_ids.get(mirror, self._display_ids.get(None))
+
+    def publish(self, message: Dict[str, Any], event_id: Optional[int] = None, mirror: Optional[str] = None) -> int:
+        """Queue ``message`` for the subscribers of ``mirror`` (everyone if None); returns the number reached
+
+        Superseding events with a coalescing window are held and sent when
+        the window closes, unless a newer one replaces them first.
+        """
+        key = coalesce_key(message)
+        window = self.coalesce_windows.get(message.get("type"), 0) if key is not None else 0
+        if window > 0:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                held_key = (mirror, key)
+                if held_key in self._held:
+                    merged = merge_display_events(self._held[held_key][0], message) if key == "display" else message
+                    if merged is None:
+                        # A patch against a held full state: send that state first
+                        self._flush_held(held_key)
+                    else:
+                        message = merged
+                        self.superseded += 1
+                if held_key not in self._held:
+                    # The window starts with the first event of a burst, so the delay is bounded
+                    self._flush_timers[held_key] = loop.call_later(window, self._flush_held, held_key)
+                self._held[held_key] = (message, event_id)
+                return self.count(mirror)
+
+        self._flush_before(mirror)
+        return self._send(message, event_id, mirror)
+
+    def _flush_held(self, held_key: Tuple[Optional[str], str]):
+        timer = self._flush_timers.pop(held_key, None)
+        if timer is not None:
+            timer.cancel()
+        held = self._held.pop(held_key, None)
+        if held is not None:
+            message, event_id = held
+            self._send(message, event_id, held_key[0])
+
+    def _flush_before(self, mirror: Optional[str]):
+        """Send held events that an event for ``mirror`` must not overtake"""
+        for held_key in list(self._held):
+            if mirror is None or held_key[0] in (None, mirror):
+                self._flush_held(held_key)
+
+    def flush(self):
+        """Send every held event now"""
+        for held_key in list(self._held):
+            self._flush_held(held_key)
+
+    def _send(self, message: Dict[str, Any], event_id: Optional[int], mirror: Optional[str]) -> int:
+        if event_id is None:
+            event_id = self._last_event_id + 1
+        self._last_event_id = max(self._last_event_id, event_id)
+        payload = encode_payload(message)
+        event = Event(
+            event_id,
+            mirror,
+            coalesce_key(message),
+            message,
+            encode_frame(message, event_id, payload),
+            encode_packet(message, event_id, payload),
+        )
+        self.published += 1
+        if len(self._history) == self._history.maxlen:
+            self._replay_floor = max(self._replay_floor, self._history[0].id)
+        self._history.append(event)
+        if event.key == "display":
+            if mirror is None:
+                # Shown on every mirror, replacing their own texts
+                self._display_ids.clear()
+            self._display_ids[mirror] = event_id
+        if is_admin_event(message):
+            subscribers = self._admins
+        elif mirror is None:
+            subscribers = self._subscribers
+        else:
+            subscribers = self._by_mirror.get(mirror, {})
+        stragglers: List[Subscriber] = []
+        for subscriber in subscribers.values():
+            subscriber.push(event)
+            if subscriber.lag_seconds() > self.max_lag_seconds:
+                stragglers.append(subscriber)
+        for subscriber in stragglers:
+            self._evict(subscriber)
+        return len(subscribers)
+
+    def _evict(self, subscriber: Subscriber):
+        print(f"⚠️  Evicting slow {subscriber.transport.upper()} client {subscriber.id} ({subscriber.dropped} events dropped)")
+        subscriber.evicted = True
+        subscriber.queue.clear()
+        subscriber.ready.set()
+        self.unsubscribe(subscriber)
+        self.evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "mirrors": {mirror: len(subscribers) for mirror, subscribers in self._by_mirror.items()},
+            "admins": len(self._admins),
+            "published": self.published,
+            "superseded": self.superseded,
+            "held": len(self._held),
+            "last_event_id": self._history[-1].id if self._history else None,
+            "buffered": len(self._history),
+            "evicted": self.evicted,
+            "clients": [subscriber.stats() for subscriber in self._subscribers.values()],
+        }
+
+    def count(self, mirror: Optional[str] = None) -> int:
+        """Subscribers reached by an event for ``mirror`` (everyone if None)"""
+        if mirror is None:
+            return len(self._subscribers)
+        return len(self._by_mirror.get(mirror, {}))
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+
+# Global hub instance
+event_hub = EventHub()
@@ -0,0 +1,97 @@
+"""
+Guest data changes shared by every API worker.
+
+Each worker keeps two copies of guest data in memory: the ``guest_index``
+used by /guest/search and the ``response_cache`` of /guests and
+/relation-types. A write on one worker calls ``guests_changed()``, which
+updates that worker's copies and sends a ``guests_changed`` signal over the
+mirror bus (``LISTEN/NOTIFY``, the worker's own echo is skipped). The other
+workers then:
+
+- bump their response cache to the writer's data version, so an ETag from
+  before the change gets a fresh response instead of a 304
+- reload the changed guests from the database into their index (the whole
+  index when the change is too large to list, e.g. after an import, or when
+  their LISTEN connection was lost for a while)
+
+Signals carry guest ids only, never guest data, so they stay far below the
+NOTIFY payload limit.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from backend.app.core import database
+from backend.app.core.guest_index import guest_index
+from backend.app.core.mirror_bus import MAX_NOTIFY_MESSAGE_BYTES, mirror_bus
+from backend.app.core.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+GUESTS_CHANGED = "guests_changed"
+
+# Changes listing more guests than this make the other workers reload their whole index
+MAX_SIGNALLED_IDS = 500
+
+# Index refreshes started by signals, kept referenced until they finish
+_refreshes: set = set()
+
+
+async def guests_changed(
+    guests: Iterable[Any] = (),
+    removed_ids: Iterable[int] = (),
+    changed_ids: Optional[List[int]] = None,
+    reload_index: bool = False,
+):
+    """Apply a guest write to this worker's copies and tell the other workers
+
+    ``guests`` are written rows already loaded here (ORM objects or rows);
+    ``changed_ids`` are guests that changed but were not loaded (they are
+    reloaded from the database); ``removed_ids`` were deleted. With
+    ``reload_index`` the index is rebuilt from scratch instead.
+    """
+    guests = list(guests)
+    removed_ids = list(removed_ids)
+    changed_ids = list(changed_ids or [])
+
+    if reload_index:
+        async with database.AsyncSessionLocal() as session:
+            await guest_index.load(session)
+    else:
+        guest_index.upsert_many(guests)
+        for guest_id in removed_ids:
+            guest_index.remove(guest_id)
+        if changed_ids:
+            async with database.AsyncSessionLocal() as session:
+                await guest_index.refresh(session, changed_ids)
+    version = response_cache.bump()
+
+    upserted = [guest.id for guest in guests] + changed_ids
+    payload: Dict[str, Any] = {"version": version, "upserted": upserted, "removed": removed_ids}
+    if reload_index or len(upserted) + len(removed_ids) > MAX_SIGNALLED_IDS \
+            or len(json.dumps(payload)) > MAX_NOTIFY_MESSAGE_BYTES:
+        payload = {"version": version, "reload": True}
+    await mirror_bus.signal(GUESTS_CHANGED, payload)
+
+
+def _on_guests_changed(payload: Dict[str, Any]):
+    """Signal handler: another worker changed guest data"""
+    response_cache.bump(payload.get("version"))
+    task = asyncio.get_running_loop().create_task(_refresh_index(payload))
+    _refreshes.add(task)
+    task.add_done_callback(_refreshes.discard)
+
+
+async def _refresh_index(payload: Dict[str, Any]):
+    try:
+        async with database.AsyncSessionLocal() as session:
+            if payload.get("reload") or payload.get("resync"):
+                await guest_index.load(session)
+            else:
+                await guest_index.refresh(session, list(payload.get("upserted", [])) + list(payload.get("removed", [])))
+    except Exception as e:
+        logger.error(f"Could not refresh the guest index after a change on another worker: {e}")
+
+
+mirror_bus.on_signal(GUESTS_CHANGED, _on_guests_changed)
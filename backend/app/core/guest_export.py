@@ -0,0 +1,150 @@
+"""
+Streaming guest list export.
+
+Guests are read with a column-only query from a server-side cursor in
+batches of ``EXPORT_BATCH_SIZE`` and written straight to the response:
+
+- CSV/TSV: every batch is encoded and sent as soon as it is fetched, so the
+  download starts before the query finishes
+- Excel: rows go into an openpyxl ``write_only`` workbook that is spooled to
+  a temporary file and then streamed in blocks. Column widths must be set
+  before the first row in write-only mode, so they are computed from the
+  header and the first batch.
+
+Headers match the import columns so an export can be edited and re-imported.
+"""
+import csv
+import io
+import tempfile
+from typing import Any, Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from backend.app.core import database
+
+EXPORT_BATCH_SIZE = 1000
+# Bytes per chunk when streaming the finished workbook
+FILE_CHUNK_SIZE = 64 * 1024
+# Workbooks up to this size stay in memory, larger ones spill to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+MAX_COLUMN_WIDTH = 50
+
+EXPORT_HEADERS = [
+    "ID", "First Name", "Last Name", "Phone", "Seat Number", "Relation",
+    "Relation Type", "Message", "Story", "About", "Created", "Updated",
+]
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "tsv": "text/tab-separated-values; charset=utf-8",
+}
+
+
+def _format_datetime(value) -> str:
+    return value.strftime("%Y-%m-%d %H:%M") if value else ""
+
+
+def _export_row(row: Any) -> List[Any]:
+    return [
+        row.id,
+        row.first_name,
+        row.last_name,
+        row.phone,
+        row.seat_number,
+        row.relation,
+        row.relation_type or "",
+        row.message,
+        row.story,
+        row.about,
+        _format_datetime(row.created_at),
+        _format_datetime(row.updated_at),
+    ]
+
+
+def _iter_batches() -> Iterator[Sequence[Any]]:
+    """Guest rows (with the relation type name) in batches from a server-side cursor"""
+    from models import Guest, RelationType
+
+    statement = (
+        select(
+            Guest.id, Guest.first_name, Guest.last_name, Guest.phone, Guest.seat_number,
+            Guest.relation, RelationType.name.label("relation_type"), Guest.message,
+            Guest.story, Guest.about, Guest.created_at, Guest.updated_at
+        )
+        .outerjoin(RelationType, Guest.relation_type_id == RelationType.id)
+        .order_by(Guest.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    # The stream outlives the request's session, so it opens its own
+    if database.SessionLocal is None:
+        database.init_engine()
+    with database.SessionLocal() as session:
+        result = session.execute(statement)
+        for batch in result.partitions():
+            yield [_export_row(row) for row in batch]
+
+
+def iter_delimited(delimiter: str = ",") -> Iterator[bytes]:
+    """CSV/TSV export, one encoded block per database batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter)
+    # BOM so Excel opens UTF-8 (Arabic names) correctly
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_HEADERS)
+    for batch in _iter_batches():
+        writer.writerows(["" if value is None else value for value in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    remaining = buffer.getvalue()
+    if remaining:
+        yield remaining.encode("utf-8")
+
+
+def _column_widths(rows: List[List[Any]]) -> List[int]:
+    widths = [len(header) for header in EXPORT_HEADERS]
+    for row in rows:
+        for i, value in enumerate(row):
+            if value is not None:
+                widths[i] = max(widths[i], len(str(value)))
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+
+def iter_xlsx(sheet_title: str = "Wedding Guests") -> Iterator[bytes]:
+    """Excel export written with a write-only workbook and streamed from a spooled file"""
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_title)
+
+    batches = _iter_batches()
+    first_batch: Optional[List[List[Any]]] = next(batches, [])
+    for i, width in enumerate(_column_widths(first_batch), start=1):
+        worksheet.column_dimensions[get_column_letter(i)].width = width
+
+    worksheet.append(EXPORT_HEADERS)
+    for row in first_batch:
+        worksheet.append(row)
+    for batch in batches:
+        for row in batch:
+            worksheet.append(row)
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_export(fmt: str) -> Iterator[bytes]:
+    """Byte stream for an export format ("xlsx", "csv" or "tsv")"""
+    if fmt == "csv":
+        return iter_delimited(",")
+    if fmt == "tsv":
+        return iter_delimited("\t")
+    return iter_xlsx()
@@ -0,0 +1,350 @@
+"""
+Bulk guest import from spreadsheets.
+
+Rows are validated column-wise with pandas (no per-row Python objects) and
+written set-based:
+
+- on PostgreSQL each chunk is loaded with ``COPY`` into a temporary staging
+  table, then merged with one ``INSERT ... SELECT ... ON CONFLICT (phone) DO
+  UPDATE``
+- other databases (local SQLite runs) fall back to a per-row upsert with the
+  same SQL
+
+Spreadsheets are read in chunks of ``IMPORT_CHUNK_SIZE`` rows (openpyxl
+read-only mode for .xlsx, pandas chunked reader for .csv/.tsv), so memory
+follows the chunk size rather than the file size.
+
+Guests are matched on ``phone``: an existing phone updates that guest, a
+new or missing phone inserts one. Rows that fail validation are skipped and
+reported as ``Row N: reason`` using spreadsheet row numbers.
+"""
+import csv
+import io
+from datetime import datetime
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+from sqlalchemy import DateTime, text
+
+from backend.app.core.name_phonetics import guest_name_key
+
+# Spreadsheet header -> guests column
+IMPORT_COLUMNS = {
+    "First Name": "first_name",
+    "Last Name": "last_name",
+    "Phone": "phone",
+    "Seat Number": "seat_number",
+    "Relation": "relation",
+    "Message": "message",
+    "Story": "story",
+    "About": "about",
+}
+REQUIRED_COLUMNS = ["First Name", "Last Name"]
+RELATION_TYPE_COLUMN = "Relation Type"
+
+# Column sizes from models.Guest; longer values are reported instead of failing the whole batch
+MAX_LENGTHS = {
+    "first_name": 100,
+    "last_name": 100,
+    "phone": 20,
+    "seat_number": 10,
+    "relation": 100,
+}
+
+# Imports writing more guests than this reload the whole guest index afterwards
+MAX_TRACKED_IDS = 500
+
+# Spreadsheet rows validated and written per batch
+IMPORT_CHUNK_SIZE = 5000
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+CSV_EXTENSIONS = (".csv", ".tsv", ".txt")
+
+STAGING_COLUMNS = list(IMPORT_COLUMNS.values()) + ["relation_type_id", "name_key"]
+# Only what is needed to count the write; the index reloads guests by id after commit
+RETURNING_COLUMNS = "id, created_at"
+
+# Optional columns keep their current value when the spreadsheet cell is empty
+_UPDATE_SET = ",\n            ".join(
+    [f"{column} = EXCLUDED.{column}" for column in ("first_name", "last_name", "name_key")]
+    + [f"{column} = COALESCE(EXCLUDED.{column}, guests.{column})"
+       for column in ("seat_number", "relation", "relation_type_id", "message", "story", "about")]
+    + ["updated_at = EXCLUDED.updated_at"]
+)
+_INSERT_COLUMNS = ", ".join(STAGING_COLUMNS + ["created_at", "updated_at"])
+
+MERGE_FROM_STAGING_SQL = f"""
+        INSERT INTO guests ({_INSERT_COLUMNS})
+        SELECT {", ".join(STAGING_COLUMNS)}, :now, :now
+        FROM guest_import_staging
+        ON CONFLICT (phone) DO UPDATE SET
+            {_UPDATE_SET}
+        RETURNING {RETURNING_COLUMNS}, (xmax = 0) AS inserted
+"""
+
+UPSERT_ROW_SQL = f"""
+        INSERT INTO guests ({_INSERT_COLUMNS})
+        VALUES ({", ".join(f":{column}" for column in STAGING_COLUMNS)}, :now, :now)
+        ON CONFLICT (phone) DO UPDATE SET
+            {_UPDATE_SET}
+        RETURNING {RETURNING_COLUMNS}
+"""
+
+CREATE_STAGING_SQL = """
+        CREATE TEMP TABLE IF NOT EXISTS guest_import_staging (
+            first_name VARCHAR(100),
+            last_name VARCHAR(100),
+            phone VARCHAR(20),
+            seat_number VARCHAR(10),
+            relation VARCHAR(100),
+            message TEXT,
+            story TEXT,
+            about TEXT,
+            relation_type_id INTEGER,
+            name_key VARCHAR(200)
+        ) ON COMMIT DROP
+"""
+
+
+class GuestImportResult:
+    """Running totals for an import (one or many chunks)"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.errors: List[str] = []
+        # Ids of the written guests, only kept while there are few of them so
+        # memory does not grow with the file; larger imports reload the whole index
+        self.guest_ids: List[int] = []
+        self.reload_index = False
+        # Guests created by this import (SQLite only, Postgres reports inserts
+        # itself), so a phone repeated in a later chunk counts as an update
+        self.inserted_ids: Set[int] = set()
+
+    @property
+    def imported(self) -> int:
+        return self.inserted + self.updated
+
+    def track(self, guest_id: int) -> None:
+        if self.reload_index:
+            return
+        self.guest_ids.append(guest_id)
+        if len(self.guest_ids) > MAX_TRACKED_IDS:
+            self.guest_ids = []
+            self.reload_index = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "imported_count": self.imported,
+            "inserted_count": self.inserted,
+            "updated_count": self.updated,
+            "errors": self.errors,
+        }
+
+
+def _iter_excel_chunks(fileobj: IO[bytes], chunk_size: int) -> Iterator[Tuple[int, pd.DataFrame]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(value).strip() if value is not None else "" for value in header]
+        validate_columns(header)
+
+        first_row = 2
+        chunk: List[tuple] = []
+        for row in rows:
+            chunk.append(row[:len(header)])
+            if len(chunk) >= chunk_size:
+                yield first_row, pd.DataFrame.from_records(chunk, columns=header).infer_objects()
+                first_row += len(chunk)
+                chunk = []
+        if chunk:
+            yield first_row, pd.DataFrame.from_records(chunk, columns=header).infer_objects()
+    finally:
+        workbook.close()
+
+
+def _iter_csv_chunks(fileobj: IO[bytes], chunk_size: int, separator: str) -> Iterator[Tuple[int, pd.DataFrame]]:
+    # Everything is read as text so phone numbers keep their leading zeros
+    reader = pd.read_csv(fileobj, sep=separator, dtype=str, keep_default_na=False,
+                         chunksize=chunk_size, encoding="utf-8-sig")
+    first_row = 2
+    for df in reader:
+        df.columns = [str(column).strip() for column in df.columns]
+        if first_row == 2:
+            validate_columns(df.columns)
+        yield first_row, df
+        first_row += len(df)
+
+
+def iter_spreadsheet_chunks(fileobj: IO[bytes], filename: str,
+                            chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """
+    Yield ``(first_row, DataFrame)`` chunks from an uploaded .xlsx/.csv/.tsv file.
+
+    Raises ValueError for unsupported file types or missing required columns.
+    """
+    name = (filename or "").lower()
+    if name.endswith(EXCEL_EXTENSIONS):
+        return _iter_excel_chunks(fileobj, chunk_size)
+    if name.endswith(CSV_EXTENSIONS):
+        return _iter_csv_chunks(fileobj, chunk_size, "\t" if name.endswith(".tsv") else ",")
+    raise ValueError("Unsupported file type, upload an .xlsx or .csv file")
+
+
+def load_relation_types(connection) -> Dict[str, int]:
+    """Relation type name -> id, read once per import"""
+    rows = connection.execute(text("SELECT id, name FROM relation_types")).fetchall()
+    return {row.name: row.id for row in rows}
+
+
+def _text_column(values: pd.Series) -> pd.Series:
+    """Stripped strings with blanks as NA; whole-number floats ("5.0") lose the decimal"""
+    if pd.api.types.is_float_dtype(values):
+        whole = values.dropna()
+        if (whole == whole.round()).all():
+            values = values.astype("Int64")
+    column = values.astype("string").str.strip()
+    return column.mask(column == "")
+
+
+def validate_columns(columns) -> None:
+    """Raise ValueError when a required spreadsheet column is missing"""
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+
+def prepare_guest_frame(df: pd.DataFrame, relation_types: Dict[str, int], first_row: int = 2) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Turn a spreadsheet chunk into rows ready for the guests table.
+
+    ``first_row`` is the spreadsheet row number of the chunk's first row
+    (2 = the row right after the header). Returns the valid rows (one column
+    per staging column) and the error messages for skipped rows.
+    """
+    validate_columns(df.columns)
+    frame = pd.DataFrame(index=df.index)
+    for header, column in IMPORT_COLUMNS.items():
+        if header in df.columns:
+            frame[column] = _text_column(df[header])
+        else:
+            frame[column] = pd.Series(pd.NA, index=df.index, dtype="string")
+
+    if RELATION_TYPE_COLUMN in df.columns:
+        frame["relation_type_id"] = _text_column(df[RELATION_TYPE_COLUMN]).map(relation_types).astype("Int64")
+    else:
+        frame["relation_type_id"] = pd.Series(pd.NA, index=df.index, dtype="Int64")
+
+    row_numbers = pd.Series(range(first_row, first_row + len(df)), index=df.index)
+    problems = pd.Series("", index=df.index)
+
+    def flag(mask: pd.Series, message: str):
+        nonlocal problems
+        mask = mask.fillna(False) & (problems == "")
+        problems = problems.mask(mask, message)
+
+    flag(frame["first_name"].isna(), "First Name is required")
+    flag(frame["last_name"].isna(), "Last Name is required")
+    for column, max_length in MAX_LENGTHS.items():
+        flag(frame[column].str.len() > max_length, f"{column} is longer than {max_length} characters")
+    # One statement cannot upsert the same phone twice; the last occurrence wins
+    flag(frame["phone"].notna() & frame["phone"].duplicated(keep="last"), "duplicate phone, a later row was kept")
+
+    bad = problems != ""
+    errors = [f"Row {row}: {problem}" for row, problem in zip(row_numbers[bad], problems[bad])]
+
+    valid = frame[~bad].copy()
+    valid["name_key"] = [
+        guest_name_key(first, last) for first, last in zip(valid["first_name"], valid["last_name"])
+    ]
+    return valid[STAGING_COLUMNS], errors
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+    for record in records:
+        if record["relation_type_id"] is not None:
+            record["relation_type_id"] = int(record["relation_type_id"])
+    return records
+
+
+def _returning(sql: str):
+    # Typed so created_at comes back as a datetime on every driver
+    return text(sql).columns(created_at=DateTime)
+
+
+def _copy_to_staging(connection, frame: pd.DataFrame) -> None:
+    connection.execute(text(CREATE_STAGING_SQL))
+    connection.execute(text("TRUNCATE guest_import_staging"))
+    buffer = io.StringIO()
+    frame.to_csv(buffer, header=False, index=False, quoting=csv.QUOTE_MINIMAL)
+    buffer.seek(0)
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY guest_import_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def upsert_guest_frame(connection, frame: pd.DataFrame, result: GuestImportResult, now: Optional[datetime] = None) -> None:
+    """Insert or update (matched on phone) every row of a prepared frame"""
+    if frame.empty:
+        return
+    now = now or datetime.utcnow()
+    if connection.dialect.name == "postgresql":
+        _copy_to_staging(connection, frame)
+        rows = connection.execute(_returning(MERGE_FROM_STAGING_SQL), {"now": now}).fetchall()
+    else:
+        rows = []
+        for record in _records(frame):
+            rows.extend(connection.execute(_returning(UPSERT_ROW_SQL), {**record, "now": now}).fetchall())
+
+    for row in rows:
+        if connection.dialect.name == "postgresql":
+            # xmax is 0 only for rows this statement inserted
+            inserted = row.inserted
+        else:
+            # Updated rows keep their original created_at
+            inserted = row.created_at == now and row.id not in result.inserted_ids
+            if inserted:
+                result.inserted_ids.add(row.id)
+        if inserted:
+            result.inserted += 1
+        else:
+            result.updated += 1
+        result.track(row.id)
+
+
+def import_guest_frame(connection, df: pd.DataFrame, relation_types: Dict[str, int],
+                       result: GuestImportResult, first_row: int = 2) -> None:
+    """Validate and upsert one spreadsheet chunk, accumulating into ``result``"""
+    frame, errors = prepare_guest_frame(df, relation_types, first_row)
+    result.errors.extend(errors)
+    upsert_guest_frame(connection, frame, result)
+
+
+def import_spreadsheet(session, fileobj: IO[bytes], filename: str,
+                       progress: Optional[Callable[[GuestImportResult, int], None]] = None) -> GuestImportResult:
+    """
+    Import a whole uploaded spreadsheet inside ``session``'s transaction.
+
+    ``progress(result, rows_read)`` is called after every chunk. The caller
+    commits (or rolls back on ValueError, raised for unreadable files).
+    """
+    connection = session.connection()
+    relation_types = load_relation_types(connection)
+    result = GuestImportResult()
+    rows_read = 0
+    for first_row, chunk in iter_spreadsheet_chunks(fileobj, filename):
+        import_guest_frame(connection, chunk, relation_types, result, first_row)
+        rows_read += len(chunk)
+        if progress:
+            progress(result, rows_read)
+    return result
@@ -0,0 +1,324 @@
+"""
+In-memory guest name index.
+
+For a single event the guest list is small and read-mostly, so the API keeps a
+process-local index of every guest's name and answers /guest/search from
+memory. The database stays the source of truth: the index is built from the
+``guests`` table at startup and updated write-through by the guest create,
+update, delete and import routes.
+
+The index holds four structures over the lowercased first/last name tokens:
+
+- a token map (exact word -> guest ids)
+- a prefix trie (partial word -> guest ids)
+- trigram postings (pg_trgm-style trigram -> guest ids) for fuzzy matches
+- phonetic key postings (``name_phonetics`` skeleton -> guest ids) so
+  transliteration variants ("Muhammad" / "Mohamed") still find the guest
+
+Scores use the same weights as the ranked SQL query in ``guest_search`` so
+both paths rank candidates the same way.
+"""
+import re
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from backend.app.core.guest_search import (
+    EXACT_FULL_NAME_SCORE,
+    EXACT_WORD_SCORE,
+    PHONETIC_THRESHOLD,
+    PHONETIC_WEIGHT,
+    PREFIX_SCORE,
+    SIMILARITY_WEIGHT,
+    normalize_name,
+    row_to_guest_info,
+)
+from backend.app.core.name_phonetics import key_similarity, phonetic_key
+
+logger = logging.getLogger(__name__)
+
+# Same default as pg_trgm.similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+# Shortest partial word that is looked up in the prefix trie
+MIN_PREFIX_LENGTH = 2
+
+
+def tokenize(value: str) -> List[str]:
+    """Split a name into lowercase tokens, keeping hyphenated names and their parts"""
+    tokens = []
+    for word in normalize_name(value).split(" "):
+        if not word:
+            continue
+        tokens.append(word)
+        parts = [part for part in word.split("-") if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def trigrams(value: str) -> Set[str]:
+    """Trigrams of each word padded like pg_trgm ('  w', ' wo', ... 'd ')"""
+    result = set()
+    for word in re.split(r"[^\w]+", normalize_name(value)):
+        if not word:
+            continue
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """Trigram similarity (shared / union), matching pg_trgm.similarity()"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.ids: Set[int] = set()
+
+
+class GuestNameIndex:
+    """Process-local name index answering guest lookups without a DB round trip"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self._clear()
+
+    def _clear(self):
+        self._guests: Dict[int, Dict[str, Any]] = {}
+        self._guest_tokens: Dict[int, List[str]] = {}
+        self._full_names: Dict[int, Tuple[str, str]] = {}
+        self._name_trigrams: Dict[int, Set[str]] = {}
+        self._tokens: Dict[str, Set[int]] = {}
+        self._token_trigrams: Dict[str, Set[str]] = {}
+        self._trie = _TrieNode()
+        self._ngrams: Dict[str, Set[int]] = {}
+        self._name_keys: Dict[int, Tuple[str, str, List[str]]] = {}
+        self._key_ngrams: Dict[str, Set[int]] = {}
+
+    # ------------------------------------------------------------------
+    # Building and write-through maintenance
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _select(guest_ids: Optional[List[int]] = None):
+        from sqlalchemy import select
+        from models import Guest
+
+        statement = select(
+            Guest.id, Guest.first_name, Guest.last_name, Guest.phone, Guest.seat_number,
+            Guest.relation, Guest.message, Guest.story, Guest.about
+        )
+        if guest_ids is not None:
+            statement = statement.where(Guest.id.in_(guest_ids))
+        return statement
+
+    async def load(self, session) -> int:
+        """Rebuild the whole index from the guests table"""
+        rows = (await session.execute(self._select())).fetchall()
+        self.rebuild(row_to_guest_info(row) for row in rows)
+        return len(rows)
+
+    async def refresh(self, session, guest_ids: List[int]):
+        """Reload the given guests from the database; ids no longer there are removed"""
+        rows = (await session.execute(self._select(guest_ids))).fetchall()
+        self._replace(guest_ids, rows)
+
+    def _replace(self, guest_ids: List[int], rows: List[Any]):
+        found = {row.id for row in rows}
+        with self._lock:
+            for guest_id in guest_ids:
+                if guest_id not in found:
+                    self._remove(guest_id)
+            for row in rows:
+                self.upsert(row)
+
+    def rebuild(self, guests: Iterable[Dict[str, Any]]):
+        """Replace the index contents with the given guest payloads"""
+        with self._lock:
+            self._clear()
+            for guest_info in guests:
+                self._add(guest_info)
+            self.ready = True
+        logger.info(f"Guest name index built with {len(self._guests)} guests")
+
+    def upsert(self, guest: Any):
+        """Add or refresh one guest (ORM object, row or guest_info dict)"""
+        guest_info = guest if isinstance(guest, dict) else row_to_guest_info(guest)
+        with self._lock:
+            self._remove(guest_info["id"])
+            self._add(guest_info)
+
+    def upsert_many(self, guests: Iterable[Any]):
+        """Add or refresh several guests at once (e.g. after an import)"""
+        with self._lock:
+            for guest in guests:
+                self.upsert(guest)
+
+    def remove(self, guest_id: int):
+        """Drop a guest from the index"""
+        with self._lock:
+            self._remove(guest_id)
+
+    def _add(self, guest_info: Dict[str, Any]):
+        guest_id = guest_info["id"]
+        first = normalize_name(guest_info.get("first_name") or "")
+        last = normalize_name(guest_info.get("last_name") or "")
+        full_name = f"{first} {last}".strip()
+        tokens = sorted(set(tokenize(first) + tokenize(last)))
+
+        self._guests[guest_id] = guest_info
+        self._guest_tokens[guest_id] = tokens
+        self._full_names[guest_id] = (full_name, f"{last} {first}".strip())
+        self._name_trigrams[guest_id] = trigrams(full_name)
+
+        for token in tokens:
+            self._tokens.setdefault(token, set()).add(guest_id)
+            if token not in self._token_trigrams:
+                self._token_trigrams[token] = trigrams(token)
+            node = self._trie
+            for char in token:
+                node = node.children.setdefault(char, _TrieNode())
+                node.ids.add(guest_id)
+        for gram in self._name_trigrams[guest_id]:
+            self._ngrams.setdefault(gram, set()).add(guest_id)
+
+        first_key, last_key = phonetic_key(first), phonetic_key(last)
+        full_key = f"{first_key} {last_key}".strip()
+        self._name_keys[guest_id] = (full_key, f"{last_key} {first_key}".strip(), full_key.split())
+        for gram in trigrams(full_key):
+            self._key_ngrams.setdefault(gram, set()).add(guest_id)
+
+    def _remove(self, guest_id: int):
+        if guest_id not in self._guests:
+            return
+        for token in self._guest_tokens.pop(guest_id):
+            ids = self._tokens.get(token)
+            if ids is not None:
+                ids.discard(guest_id)
+                if not ids:
+                    del self._tokens[token]
+                    self._token_trigrams.pop(token, None)
+            node = self._trie
+            for char in token:
+                node = node.children.get(char)
+                if node is None:
+                    break
+                node.ids.discard(guest_id)
+        for gram in self._name_trigrams.pop(guest_id):
+            ids = self._ngrams.get(gram)
+            if ids is not None:
+                ids.discard(guest_id)
+                if not ids:
+                    del self._ngrams[gram]
+        full_key = self._name_keys.pop(guest_id)[0]
+        for gram in trigrams(full_key):
+            ids = self._key_ngrams.get(gram)
+            if ids is not None:
+                ids.discard(guest_id)
+                if not ids:
+                    del self._key_ngrams[gram]
+        del self._guests[guest_id]
+        del self._full_names[guest_id]
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _prefix_ids(self, prefix: str) -> Set[int]:
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.ids
+
+    def _phonetic_similarity(self, guest_id: int, key: str, word_keys: List[str]) -> float:
+        full_key, reversed_key, guest_word_keys = self._name_keys[guest_id]
+        best = max(key_similarity(key, full_key), key_similarity(key, reversed_key))
+        if word_keys and guest_word_keys:
+            # Every spoken word has to sound like one of the guest's names
+            per_word = [max(key_similarity(word_key, guest_key) for guest_key in guest_word_keys)
+                        for word_key in word_keys]
+            best = max(best, sum(per_word) / len(per_word))
+        return best
+
+    def search(self, name: str, limit: int = 1) -> List[Tuple[Dict[str, Any], float]]:
+        """Return up to ``limit`` (guest_info, confidence) pairs, best first"""
+        term = normalize_name(name)
+        if not term:
+            return []
+        words = term.split(" ")
+        term_grams = trigrams(term)
+        word_grams = [trigrams(word) for word in words]
+        key = phonetic_key(term)
+        word_keys = key.split()
+
+        with self._lock:
+            word_hits: Dict[int, int] = {}
+            prefix_ids: Set[int] = set()
+            for word in words:
+                for guest_id in self._tokens.get(word, ()):
+                    word_hits[guest_id] = word_hits.get(guest_id, 0) + 1
+                if len(word) >= MIN_PREFIX_LENGTH:
+                    prefix_ids |= self._prefix_ids(word)
+
+            candidates = set(word_hits) | prefix_ids
+            for gram in term_grams:
+                candidates |= self._ngrams.get(gram, set())
+            for gram in trigrams(key):
+                candidates |= self._key_ngrams.get(gram, set())
+
+            scored = []
+            for guest_id in candidates:
+                full_name, reversed_name = self._full_names[guest_id]
+                name_similarity = similarity(term_grams, self._name_trigrams[guest_id])
+                if term == full_name or term == reversed_name:
+                    score = EXACT_FULL_NAME_SCORE
+                elif guest_id in word_hits:
+                    score = EXACT_WORD_SCORE
+                else:
+                    # Best of the phonetic, prefix and trigram matches, like GREATEST() in SQL
+                    score = 0.0
+                    phonetic = self._phonetic_similarity(guest_id, key, word_keys)
+                    if phonetic >= PHONETIC_THRESHOLD:
+                        score = PHONETIC_WEIGHT * phonetic
+                    if full_name.startswith(term) or guest_id in prefix_ids:
+                        score = max(score, PREFIX_SCORE)
+                    best = name_similarity
+                    for grams in word_grams:
+                        for token in self._guest_tokens[guest_id]:
+                            best = max(best, similarity(grams, self._token_trigrams[token]))
+                    if best >= SIMILARITY_THRESHOLD:
+                        score = max(score, SIMILARITY_WEIGHT * best)
+                    if not score:
+                        continue
+                # Ties go to the guest matching more spoken words, then the closest full name
+                scored.append((score, word_hits.get(guest_id, 0), name_similarity, guest_id))
+
+            scored.sort(key=lambda item: (-item[0], -item[1], -item[2], item[3]))
+            return [(dict(self._guests[guest_id]), round(score, 3)) for score, _, _, guest_id in scored[:limit]]
+
+    def search_many(self, names: List[str], limit: int = 1) -> List[List[Tuple[Dict[str, Any], float]]]:
+        """Resolve several names against one consistent snapshot of the index"""
+        with self._lock:
+            return [self.search(name, limit=limit) for name in names]
+
+    def find_best(self, name: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return the single best (guest_info, confidence) match, or None"""
+        matches = self.search(name, limit=1)
+        return matches[0] if matches else None
+
+    def __len__(self) -> int:
+        return len(self._guests)
+
+
+# Global index instance
+guest_index = GuestNameIndex()
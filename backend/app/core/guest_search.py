@@ -0,0 +1,184 @@
+"""
+Ranked guest name search backed by pg_trgm.
+
+A single query scores exact, prefix, phonetic and trigram-similarity matches
+together against the normalized ``guests.search_name`` and ``guests.name_key``
+columns, so a lookup costs one round trip served by the GIN trigram indexes
+instead of several sequential ``LIKE`` scans. Phonetic keys are scored by
+edit distance (fuzzystrmatch ``levenshtein``) with the same normalization and
+threshold as ``guest_index``, so both paths accept the same spellings.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.core.name_phonetics import phonetic_key
+
+# Score weights for each kind of match (the best one wins)
+EXACT_FULL_NAME_SCORE = 1.0
+EXACT_WORD_SCORE = 0.9
+PHONETIC_WEIGHT = 0.85
+PREFIX_SCORE = 0.8
+SIMILARITY_WEIGHT = 0.75
+# Phonetic keys must be at least this close to count as a match
+PHONETIC_THRESHOLD = 0.75
+
+GUEST_COLUMNS = "id, first_name, last_name, phone, seat_number, relation, message, story, about"
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a spoken name and collapse whitespace"""
+    return re.sub(r"\s+", " ", name or "").strip().lower()
+
+
+def _key_similarity_sql(a: str, b: str) -> str:
+    """SQL for name_phonetics.key_similarity(a, b)"""
+    return f"(1 - CAST(levenshtein({a}, {b}) AS float) / GREATEST(length({a}), length({b}), 1))"
+
+
+def _ranked_select(name: str, limit: int, prefix: str = "") -> Tuple[str, Dict[str, Any]]:
+    """SQL and bind parameters for one ranked lookup, with every parameter name prefixed"""
+    term = normalize_name(name)
+    words = term.split(" ") if term else []
+
+    def param(key: str) -> str:
+        return f":{prefix}{key}"
+
+    params: Dict[str, Any] = {
+        f"{prefix}term": term,
+        f"{prefix}prefix": f"{term}%",
+        f"{prefix}limit": limit,
+    }
+    word_params = []
+    for i, word in enumerate(words):
+        params[f"{prefix}w{i}"] = word
+        word_params.append(param(f"w{i}"))
+
+    # Transliteration-tolerant keys ("Muhammad" and "Mohamed" both become "mhmd")
+    key = phonetic_key(term)
+    word_keys = key.split(" ") if key else []
+    params[f"{prefix}key"] = key
+    params[f"{prefix}rkey"] = " ".join(reversed(word_keys))
+    key_params = []
+    for i, word_key in enumerate(word_keys):
+        params[f"{prefix}k{i}"] = word_key
+        key_params.append(param(f"k{i}"))
+
+    word_list = ", ".join(word_params)
+    word_filters = "".join(f"\n           OR {p} <% search_name" for p in word_params)
+    word_similarity = ", ".join(f"word_similarity({p}, search_name)" for p in word_params)
+    key_filters = "".join(f"\n           OR {p} <% name_key" for p in key_params)
+
+    # Whole key in either name order, or every spoken word close to one of the guest's words (as in guest_index)
+    key_scores = [_key_similarity_sql("name_key", param("key")), _key_similarity_sql("name_key", param("rkey"))]
+    if key_params:
+        per_word = " + ".join(
+            f"(SELECT MAX({_key_similarity_sql('w', p)}) FROM unnest(string_to_array(name_key, ' ')) AS w)"
+            for p in key_params
+        )
+        key_scores.append(f"({per_word}) / {len(key_params)}")
+    phonetic = f"COALESCE(GREATEST({', '.join(key_scores)}), 0)"
+
+    sql = f"""
+        SELECT {GUEST_COLUMNS},
+               GREATEST(
+                   CASE WHEN search_name = {param("term")}
+                          OR LOWER(last_name || ' ' || first_name) = {param("term")}
+                        THEN {EXACT_FULL_NAME_SCORE} ELSE 0 END,
+                   CASE WHEN LOWER(first_name) IN ({word_list})
+                          OR LOWER(last_name) IN ({word_list})
+                        THEN {EXACT_WORD_SCORE} ELSE 0 END,
+                   CASE WHEN key_match.phonetic >= {PHONETIC_THRESHOLD} THEN {PHONETIC_WEIGHT} * key_match.phonetic ELSE 0 END,
+                   CASE WHEN search_name LIKE {param("prefix")} THEN {PREFIX_SCORE} ELSE 0 END,
+                   {SIMILARITY_WEIGHT} * GREATEST(word_similarity({param("term")}, search_name), {word_similarity})
+               ) AS score,
+               similarity({param("term")}, search_name) AS name_similarity
+        FROM guests
+        CROSS JOIN LATERAL (SELECT {phonetic} AS phonetic) AS key_match
+        WHERE search_name % {param("term")}
+           OR search_name LIKE {param("prefix")}{word_filters}
+           OR name_key % {param("key")}{key_filters}
+        ORDER BY score DESC, name_similarity DESC, id
+        LIMIT {param("limit")}
+    """
+    return sql, params
+
+
+def build_ranked_search_query(name: str, limit: int = 1) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Build one ranked query for a guest name.
+
+    Every word of the search gets its own ``<%`` (word similarity) predicate so
+    the planner can combine index scans with a BitmapOr. Returns the statement
+    and its bind parameters.
+    """
+    sql, params = _ranked_select(name, limit)
+    return text(sql), params
+
+
+def build_batch_search_query(names: List[str], limit: int = 1) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Build one statement resolving several names at once.
+
+    Each name keeps its own ranked, index-backed sub-select (tagged with its
+    position in ``names``) and the sub-selects are combined with UNION ALL, so
+    a whole group costs a single round trip.
+    """
+    parts = []
+    params: Dict[str, Any] = {}
+    for i, name in enumerate(names):
+        sql, name_params = _ranked_select(name, limit, prefix=f"n{i}_")
+        parts.append(f"SELECT {i} AS name_index, ranked.* FROM ({sql}) AS ranked")
+        params.update(name_params)
+    query = text(
+        "SELECT * FROM (\n" + "\n    UNION ALL\n".join(parts) + "\n) AS batch\n"
+        "ORDER BY name_index, score DESC, name_similarity DESC, id"
+    )
+    return query, params
+
+
+def row_to_guest_info(row: Any) -> Dict[str, Any]:
+    """Convert a search result row into the guest payload used by the agent"""
+    return {
+        "id": row.id,
+        "name": f"{row.first_name} {row.last_name}".strip(),
+        "first_name": row.first_name,
+        "last_name": row.last_name,
+        "phone": row.phone,
+        "table_number": row.seat_number,
+        "relationship": row.relation,
+        "message": row.message,
+        "story": row.story,
+        "about": row.about,
+    }
+
+
+async def search_guests_ranked(session: AsyncSession, name: str, limit: int = 1) -> List[Tuple[Dict[str, Any], float]]:
+    """Return up to ``limit`` (guest_info, confidence) pairs, best first"""
+    if not normalize_name(name):
+        return []
+    query, params = build_ranked_search_query(name, limit=limit)
+    rows = (await session.execute(query, params)).fetchall()
+    return [(row_to_guest_info(row), round(float(row.score), 3)) for row in rows]
+
+
+async def find_best_guest(session: AsyncSession, name: str) -> Optional[Tuple[Dict[str, Any], float]]:
+    """Return the single best (guest_info, confidence) match, or None"""
+    matches = await search_guests_ranked(session, name, limit=1)
+    return matches[0] if matches else None
+
+
+async def search_guests_batch(session: AsyncSession, names: List[str], limit: int = 1) -> List[List[Tuple[Dict[str, Any], float]]]:
+    """Return the (guest_info, confidence) matches for each name, in the order given"""
+    results: List[List[Tuple[Dict[str, Any], float]]] = [[] for _ in names]
+    lookups = [(i, name) for i, name in enumerate(names) if normalize_name(name)]
+    if not lookups:
+        return results
+    query, params = build_batch_search_query([name for _, name in lookups], limit=limit)
+    rows = (await session.execute(query, params)).fetchall()
+    for row in rows:
+        position = lookups[row.name_index][0]
+        results[position].append((row_to_guest_info(row), round(float(row.score), 3)))
+    return results
@@ -0,0 +1,117 @@
+"""
+Background job handlers for heavy admin operations.
+
+Each handler runs in a worker thread with its own database session, reports
+progress through the JobContext and returns a JSON-serializable result that
+is stored on the job row.
+"""
+import os
+from typing import Any, Dict
+
+from backend.app.core import database
+from backend.app.core.jobs import JobContext, job_runner
+
+# Recordings updated per transaction by the presigned URL refresh
+REFRESH_BATCH_SIZE = 100
+
+
+def _session():
+    if database.SessionLocal is None:
+        database.init_engine()
+    return database.SessionLocal()
+
+
+@job_runner.register("guest-import")
+def run_guest_import(context: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Import the spreadsheet saved by POST /jobs/guest-import"""
+    from backend.app.core.guest_changes import guests_changed
+    from backend.app.core.guest_import import import_spreadsheet
+
+    path = params["path"]
+
+    def progress(result, rows_read: int):
+        context.report(message=f"{rows_read} rows read, {result.imported} imported, {len(result.errors)} skipped")
+
+    try:
+        with _session() as session, open(path, "rb") as fileobj:
+            result = import_spreadsheet(session, fileobj, params["filename"], progress)
+            if result.imported > 0:
+                session.commit()
+                context.run(guests_changed(changed_ids=result.guest_ids, reload_index=result.reload_index))
+    finally:
+        # The upload is only needed while the job runs
+        if os.path.exists(path):
+            os.remove(path)
+
+    print(f"✅ Imported guests: {result.inserted} new, {result.updated} updated, {len(result.errors)} skipped")
+    return result.to_dict()
+
+
+@job_runner.register("guest-export")
+def run_guest_export(context: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Write the guest list to a file that can be downloaded from /jobs/{id}/download"""
+    from backend.app.core.guest_export import iter_export
+
+    fmt = params.get("format", "xlsx")
+    filename = f"wedding_guests.{fmt}"
+    path = os.path.join(context.files_dir, filename)
+
+    written = 0
+    with open(path, "wb") as output:
+        for chunk in iter_export(fmt):
+            output.write(chunk)
+            written += len(chunk)
+            context.report(message=f"{written // 1024} KB written")
+
+    return {
+        "filename": filename,
+        "size_bytes": written,
+        "download_url": f"/api/jobs/{context.job_id}/download"
+    }
+
+
+@job_runner.register("refresh-presigned-urls")
+def run_refresh_presigned_urls(context: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Regenerate presigned URLs for every available recording stored on S3"""
+    from datetime import datetime
+    from sqlalchemy import func, select
+    from models import VideoRecording
+    from backend.app.core.storage import generate_presigned_url, s3_key_from_url
+
+    refreshed = 0
+    skipped = 0
+    errors = []
+    with _session() as session:
+        condition = VideoRecording.is_available.is_(True)
+        total = session.execute(select(func.count(VideoRecording.id)).where(condition)).scalar_one()
+        last_id = 0
+        while True:
+            # Keyset batches so each transaction stays small
+            batch = session.execute(
+                select(VideoRecording)
+                .where(condition, VideoRecording.id > last_id)
+                .order_by(VideoRecording.id)
+                .limit(REFRESH_BATCH_SIZE)
+            ).scalars().all()
+            if not batch:
+                break
+            for recording in batch:
+                s3_key = s3_key_from_url(recording.video_url)
+                if not s3_key:
+                    skipped += 1
+                    continue
+                try:
+                    recording.presigned_url = generate_presigned_url(s3_key)
+                    recording.updated_at = datetime.utcnow()
+                    refreshed += 1
+                except Exception as e:
+                    errors.append(f"Recording {recording.id}: {e}")
+            session.commit()
+            last_id = batch[-1].id
+            done = refreshed + skipped + len(errors)
+            context.report(
+                progress=int(done * 100 / total) if total else 100,
+                message=f"{done}/{total} recordings processed"
+            )
+
+    return {"refreshed": refreshed, "skipped": skipped, "errors": errors}
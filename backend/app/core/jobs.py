@@ -0,0 +1,386 @@
+"""
+In-process background job runner.
+
+Heavy admin operations (spreadsheet imports, exports, presigned URL refreshes)
+are enqueued instead of running inside the HTTP request:
+
+- ``job_runner.enqueue()`` stores a ``background_jobs`` row and puts the job
+  id on an asyncio queue
+- ``JOB_WORKERS`` worker tasks take jobs off the queue and run the handler
+  registered for the job kind; blocking handlers run in a thread
+- handlers report progress through ``JobContext.report()``, which is saved
+  to the job row and broadcast as a ``job_progress`` event to the admin
+  subscribers of /api/events, without the job params (at most once per ``PROGRESS_INTERVAL``; progress still in flight is
+  awaited before the final state is written)
+
+Every job row records the worker process that owns it (``owner``, the
+process origin id) and a ``heartbeat_at`` the owner refreshes every
+``JOB_HEARTBEAT_SECONDS``. Jobs whose heartbeat is older than
+``JOB_STALE_SECONDS`` belonged to a worker that died; any live worker fails
+them, while jobs of other live workers are left alone.
+
+Clients poll ``GET /api/jobs/{id}`` (or listen for the SSE events) and
+download results from the link in the job's ``result``. Job files are
+deleted ``JOB_FILES_RETENTION_HOURS`` after they were written, unless the
+job is still queued or running.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.app.core import database
+from backend.app.core.config import settings
+from backend.app.core.mirror_bus import PROCESS_ORIGIN
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# Progress is saved and broadcast at most this often, in seconds (the final state is always sent)
+PROGRESS_INTERVAL = 1.0
+# Seconds between sweeps of expired job files
+FILES_SWEEP_INTERVAL = 3600
+
+JobHandler = Callable[["JobContext", Dict[str, Any]], Any]
+
+
+class JobContext:
+    """Handle given to a running job for progress reporting"""
+
+    def __init__(self, runner: "JobRunner", job_id: str, kind: str, loop: asyncio.AbstractEventLoop):
+        self.runner = runner
+        self.job_id = job_id
+        self.kind = kind
+        self._loop = loop
+        self._last_sent = 0.0
+        # Progress updates not yet written (tasks, or concurrent futures from a worker thread)
+        self._pending: List[Any] = []
+        self.finished = False
+
+    @property
+    def files_dir(self) -> str:
+        """Directory for this job's input and output files"""
+        path = os.path.join(settings.JOB_FILES_DIR, self.job_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def report(self, progress: Optional[int] = None, message: Optional[str] = None):
+        """Record progress (throttled); safe to call from the handler's worker thread"""
+        now = time.monotonic()
+        if now - self._last_sent < PROGRESS_INTERVAL:
+            return
+        self._last_sent = now
+        coroutine = self._send({"progress": progress, "message": message})
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._pending.append(self._loop.create_task(coroutine))
+        else:
+            self._pending.append(asyncio.run_coroutine_threadsafe(coroutine, self._loop))
+        self._pending = [future for future in self._pending if not future.done()]
+
+    def run(self, coroutine) -> Any:
+        """Run ``coroutine`` on the runner's event loop from the handler's worker thread and return its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _send(self, values: Dict[str, Any]):
+        if not self.finished:
+            await self.runner._publish(self.job_id, self.kind, JOB_RUNNING, values)
+
+    async def finish(self):
+        """Stop progress reporting and wait for updates still in flight, so they cannot overwrite the final state"""
+        self.finished = True
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in self._pending), return_exceptions=True)
+        self._pending = []
+
+
+class JobRunner:
+    """asyncio queue + worker pool executing registered job handlers"""
+
+    def __init__(self):
+        self._handlers: Dict[str, JobHandler] = {}
+        self._blocking: Dict[str, bool] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def register(self, kind: str, blocking: bool = True):
+        """Decorator registering the handler for a job kind (blocking handlers run in a thread)"""
+        def decorator(handler: JobHandler) -> JobHandler:
+            self._handlers[kind] = handler
+            self._blocking[kind] = blocking
+            return handler
+        return decorator
+
+    @property
+    def kinds(self) -> List[str]:
+        return sorted(self._handlers)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self, workers: Optional[int] = None):
+        """Start the worker tasks and fail jobs left unfinished by workers that are gone"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        await self._fail_interrupted_jobs()
+        for i in range(workers or settings.JOB_WORKERS):
+            self._workers.append(asyncio.create_task(self._worker(i)))
+        self._sweeper = asyncio.create_task(self._sweep_files_periodically())
+        self._heartbeat = asyncio.create_task(self._heartbeat_periodically())
+        logger.info(f"Job runner started with {len(self._workers)} workers")
+
+    async def stop(self):
+        """Cancel the workers; their unfinished jobs are failed once their heartbeat goes stale"""
+        tasks = self._workers + [task for task in (self._sweeper, self._heartbeat) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._sweeper = None
+        self._heartbeat = None
+        self._queue = None
+
+    async def _heartbeat_periodically(self):
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            try:
+                await self._beat()
+            except Exception as e:
+                logger.error(f"Could not refresh job heartbeats: {e}")
+            await self._fail_interrupted_jobs()
+
+    async def _beat(self):
+        """Mark this process's unfinished jobs as alive"""
+        from sqlalchemy import update
+        from models import BackgroundJob
+
+        async with database.AsyncSessionLocal() as session:
+            await session.execute(
+                update(BackgroundJob)
+                .where(BackgroundJob.owner == PROCESS_ORIGIN, BackgroundJob.status.in_([JOB_QUEUED, JOB_RUNNING]))
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    async def _fail_interrupted_jobs(self):
+        """Fail unfinished jobs whose owner stopped sending heartbeats (restarted or crashed worker)"""
+        from sqlalchemy import or_, update
+        from models import BackgroundJob
+
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.JOB_STALE_SECONDS)
+        try:
+            async with database.AsyncSessionLocal() as session:
+                result = await session.execute(
+                    update(BackgroundJob)
+                    .where(
+                        BackgroundJob.status.in_([JOB_QUEUED, JOB_RUNNING]),
+                        or_(BackgroundJob.owner.is_(None), BackgroundJob.owner != PROCESS_ORIGIN),
+                        or_(BackgroundJob.heartbeat_at.is_(None), BackgroundJob.heartbeat_at < stale_before)
+                    )
+                    .values(status=JOB_FAILED, error="Interrupted by a server restart", finished_at=datetime.utcnow())
+                )
+                await session.commit()
+            if result.rowcount:
+                print(f"⚠️  Failed {result.rowcount} jobs left unfinished by a stopped worker")
+        except Exception as e:
+            print(f"Warning: Could not clean up interrupted jobs: {e}")
+
+    async def _sweep_files_periodically(self):
+        while True:
+            try:
+                await self.sweep_files()
+            except Exception as e:
+                logger.error(f"Could not sweep job files: {e}")
+            await asyncio.sleep(FILES_SWEEP_INTERVAL)
+
+    async def sweep_files(self) -> int:
+        """Delete the files of jobs older than ``JOB_FILES_RETENTION_HOURS``; returns the number of job directories removed"""
+        from sqlalchemy import select
+        from models import BackgroundJob
+
+        if not os.path.isdir(settings.JOB_FILES_DIR):
+            return 0
+        cutoff = time.time() - settings.JOB_FILES_RETENTION_HOURS * 3600
+        expired = [
+            entry for entry in os.scandir(settings.JOB_FILES_DIR)
+            if entry.is_dir() and entry.stat().st_mtime < cutoff
+        ]
+        if not expired:
+            return 0
+
+        # Another worker process may still be running one of these jobs
+        async with database.AsyncSessionLocal() as session:
+            active = set((await session.execute(
+                select(BackgroundJob.id).where(
+                    BackgroundJob.id.in_([entry.name for entry in expired]),
+                    BackgroundJob.status.in_([JOB_QUEUED, JOB_RUNNING])
+                )
+            )).scalars().all())
+
+        removed = 0
+        for entry in expired:
+            if entry.name in active:
+                continue
+            await asyncio.to_thread(shutil.rmtree, entry.path, True)
+            removed += 1
+        if removed:
+            print(f"🧹 Removed files of {removed} expired jobs")
+        return removed
+
+    # ------------------------------------------------------------------
+    # Enqueue and lookup
+    # ------------------------------------------------------------------
+
+    async def enqueue(self, kind: str, params: Optional[Dict[str, Any]] = None, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """Persist a queued job and hand it to the workers; returns the job payload"""
+        from models import BackgroundJob
+
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        if self._queue is None:
+            raise RuntimeError("Job runner is not running")
+
+        job = BackgroundJob(
+            id=job_id or uuid.uuid4().hex,
+            kind=kind,
+            status=JOB_QUEUED,
+            params=json.dumps(params or {}),
+            message="Waiting for a worker",
+            # Queued jobs live in this process's queue, so they are owned from the start
+            owner=PROCESS_ORIGIN,
+            heartbeat_at=datetime.utcnow(),
+            created_at=datetime.utcnow()
+        )
+        async with database.AsyncSessionLocal() as session:
+            session.add(job)
+            await session.commit()
+            payload = job.to_dict()
+
+        self._queue.put_nowait(job.id)
+        await self._broadcast(payload)
+        return payload
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        from models import BackgroundJob
+
+        async with database.AsyncSessionLocal() as session:
+            job = await session.get(BackgroundJob, job_id)
+            return job.to_dict() if job else None
+
+    async def list_recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        from sqlalchemy import select
+        from models import BackgroundJob
+
+        async with database.AsyncSessionLocal() as session:
+            jobs = (await session.execute(
+                select(BackgroundJob).order_by(BackgroundJob.created_at.desc()).limit(limit)
+            )).scalars().all()
+            return [job.to_dict() for job in jobs]
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    async def _worker(self, number: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Job worker {number} crashed on {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        from models import BackgroundJob
+
+        async with database.AsyncSessionLocal() as session:
+            job = await session.get(BackgroundJob, job_id)
+            if job is None:
+                return
+            kind = job.kind
+            params = json.loads(job.params) if job.params else {}
+
+        handler = self._handlers[kind]
+        context = JobContext(self, job_id, kind, asyncio.get_running_loop())
+        await self._publish(job_id, kind, JOB_RUNNING, {"progress": 0, "message": "Started", "started_at": datetime.utcnow()})
+        print(f"⚙️  Job {job_id} ({kind}) started")
+
+        try:
+            if self._blocking[kind]:
+                result = await asyncio.to_thread(handler, context, params)
+            else:
+                result = await handler(context, params)
+        except Exception as e:
+            await context.finish()
+            print(f"❌ Job {job_id} ({kind}) failed: {e}")
+            await self._publish(job_id, kind, JOB_FAILED, {
+                "error": str(e),
+                "message": "Failed",
+                "finished_at": datetime.utcnow()
+            })
+            return
+
+        await context.finish()
+        print(f"✅ Job {job_id} ({kind}) completed")
+        await self._publish(job_id, kind, JOB_COMPLETED, {
+            "progress": 100,
+            "message": "Completed",
+            "result": json.dumps(result) if result is not None else None,
+            "finished_at": datetime.utcnow()
+        })
+
+    async def _publish(self, job_id: str, kind: str, status: str, values: Dict[str, Any]):
+        """Save job state and broadcast it to SSE clients"""
+        from sqlalchemy import update
+        from models import BackgroundJob
+
+        values = {key: value for key, value in values.items() if value is not None}
+        try:
+            async with database.AsyncSessionLocal() as session:
+                await session.execute(
+                    update(BackgroundJob).where(BackgroundJob.id == job_id).values(status=status, **values)
+                )
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Could not save progress for job {job_id}: {e}")
+
+        event = {"id": job_id, "kind": kind, "status": status}
+        for key, value in values.items():
+            if key == "result":
+                event[key] = json.loads(value)
+            elif isinstance(value, datetime):
+                event[key] = value.isoformat()
+            else:
+                event[key] = value
+        await self._broadcast(event)
+
+    async def _broadcast(self, job: Dict[str, Any]):
+        # Import here to avoid circular imports
+        from backend.app.main import broadcast_message
+
+        # Params hold server file paths; admins read them from GET /jobs/{id}
+        job = {key: value for key, value in job.items() if key != "params"}
+        try:
+            await broadcast_message({"type": "job_progress", "job": job})
+        except Exception as e:
+            logger.error(f"Could not broadcast job progress: {e}")
+
+
+# Global job runner instance
+job_runner = JobRunner()
@@ -0,0 +1,401 @@
+"""
+Shared mirror display state and cross-process event broadcast.
+
+The mirror text and the SSE events used to live in module globals of
+``backend.app.main``, so every uvicorn worker had its own copy. All writes
+now go through ``mirror_bus.publish()``:
+
+- ``MemoryMirrorBus`` keeps the state in the process and delivers events to
+  the local event hub directly (single worker, tests, SQLite)
+- ``PostgresMirrorBus`` saves display changes to the ``mirror_state`` table
+  and sends every event with ``pg_notify`` in the same transaction. Each
+  worker holds one ``LISTEN`` connection and feeds what other workers
+  publish into its own event hub, so an update handled by any worker reaches
+  the SSE clients of all of them. The publishing worker applies and delivers
+  its own event as soon as the transaction commits and ignores the echo
+  (events carry a per-process origin id). Event ids are the database clock in
+  microseconds at publish time, so Last-Event-ID replay works whichever
+  worker a client reconnects to.
+
+State is namespaced by mirror (the kiosk's LiveKit room name). An update
+for one mirror only changes and reaches that mirror; an update without a
+mirror sets the default text and replaces every mirror's own text. Mirrors
+showing the default text have no row of their own, so the per-session rooms
+used by the display cost nothing once their session ends with a reset.
+
+Every worker derives the texts from the display events it receives, so
+reading the state never touches the database. The state of each mirror is a
+versioned ``DisplayState`` (see ``display_model``); ``text_update`` and
+``reset`` events are stamped with the version they create, and
+``display_patch`` events arrive with theirs. Publishing is serialized
+within a worker, and ``publish_patch()`` builds a patch from the current
+state under the same lock, so back-to-back updates never share a version.
+
+If the transaction fails, a display change is neither applied nor sent, so
+memory never disagrees with the table; other events are still delivered to
+this worker's clients. Postgres limits a NOTIFY payload to 8000 bytes; a
+larger event is saved and delivered to the publishing worker only, with a
+warning.
+
+The same channel carries signals between workers that never reach the SSE
+clients (``signal()`` / ``on_signal()``), e.g. ``guest_changes`` telling the
+other workers to refresh their guest index and response cache. Signals sent
+while a worker's LISTEN connection was down are lost, so after reconnecting
+every handler is called with ``{"resync": true}``.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from backend.app.core import database
+from backend.app.core.config import settings
+from backend.app.core.display_model import DisplayState
+from backend.app.core.event_hub import coalesce_key
+
+logger = logging.getLogger(__name__)
+
+ORIGINAL_TEXT = DisplayState().render()
+
+MIRROR_CHANNEL = "mirror_events"
+# mirror_state row holding the text shown on mirrors without their own
+DEFAULT_MIRROR_KEY = ""
+MAX_MIRROR_ID_LENGTH = 100
+# Seconds between attempts to re-open a lost LISTEN connection
+RECONNECT_DELAY = 5.0
+# Postgres rejects NOTIFY payloads from 8000 bytes; room is left for the envelope
+MAX_NOTIFY_MESSAGE_BYTES = 7800
+# Tags this process's events, so it can skip their NOTIFY echo
+PROCESS_ORIGIN = uuid.uuid4().hex
+
+Deliver = Callable[[Dict[str, Any], Optional[int], Optional[str]], Any]
+SignalHandler = Callable[[Dict[str, Any]], Any]
+
+
+def resolve_mirror(mirror: Optional[str]) -> Optional[str]:
+    """Normalize a mirror id from a request; None addresses every mirror"""
+    if mirror is None:
+        return None
+    mirror = mirror.strip()
+    if not mirror:
+        return None
+    if len(mirror) > MAX_MIRROR_ID_LENGTH:
+        raise ValueError(f"Mirror id must be at most {MAX_MIRROR_ID_LENGTH} characters")
+    return mirror
+
+
+class MemoryMirrorBus:
+    """Mirror state and event delivery within a single process"""
+
+    backend = "memory"
+
+    def __init__(self):
+        self.default_state = DisplayState()
+        self._states: Dict[str, DisplayState] = {}
+        self._deliver: Optional[Deliver] = None
+        # Serializes publishing, so each display event is built on the state left by the previous one
+        self._lock = asyncio.Lock()
+        # Signal name -> handler called with the payload sent by another worker
+        self._signal_handlers: Dict[str, SignalHandler] = {}
+
+    def display_for(self, mirror: Optional[str] = None) -> DisplayState:
+        """Display currently shown on ``mirror``"""
+        if mirror is None:
+            return self.default_state
+        return self._states.get(mirror, self.default_state)
+
+    def text_for(self, mirror: Optional[str] = None) -> str:
+        """HTML currently shown on ``mirror``"""
+        return self.display_for(mirror).render()
+
+    @property
+    def mirrors(self) -> Dict[str, str]:
+        """Mirrors showing their own text"""
+        return {mirror: state.render() for mirror, state in self._states.items()}
+
+    async def start(self, deliver: Deliver):
+        """Begin delivering published events to ``deliver(message, event_id, mirror)``"""
+        self._deliver = deliver
+
+    async def stop(self):
+        self._deliver = None
+
+    async def publish(self, message: Dict[str, Any], mirror: Optional[str] = None) -> bool:
+        """Send ``message`` to ``mirror`` (every mirror if None); returns False if it could not be published"""
+        async with self._lock:
+            return await self._publish(message, mirror)
+
+    async def publish_patch(self, layout: str, slots: Dict[str, str], mirror: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Show ``layout``/``slots`` on ``mirror``, sending only what changed
+
+        Returns the published ``display_patch`` (None if nothing changed).
+        Raises ValueError for an unknown layout or slot, and RuntimeError if
+        the patch could not be published.
+        """
+        async with self._lock:
+            # Every mirror may show something different, so a global update carries all lines
+            patch = self.display_for(mirror).patch(layout, slots, full=mirror is None)
+            if patch is None:
+                return None
+            if mirror is not None:
+                patch["mirror"] = mirror
+            if not await self._publish(patch, mirror):
+                raise RuntimeError("Display update could not be saved")
+            return patch
+
+    async def _publish(self, message: Dict[str, Any], mirror: Optional[str]) -> bool:
+        self._stamp(message, mirror)
+        self._receive(message, None, mirror)
+        return True
+
+    def on_signal(self, name: str, handler: SignalHandler):
+        """Call ``handler(payload)`` when another worker sends signal ``name``"""
+        self._signal_handlers[name] = handler
+
+    async def signal(self, name: str, payload: Dict[str, Any]) -> bool:
+        """Send ``payload`` to the ``name`` handler of every other worker; returns False if it could not be sent
+
+        A single process has no other workers, so there is nothing to send.
+        """
+        return True
+
+    def _on_signal(self, name: str, payload: Dict[str, Any]):
+        handler = self._signal_handlers.get(name)
+        if handler is None:
+            logger.warning(f"No handler for mirror bus signal '{name}'")
+            return
+        handler(payload)
+
+    def _stamp(self, message: Dict[str, Any], mirror: Optional[str]):
+        """Give a display event the version it creates"""
+        if coalesce_key(message) == "display":
+            message.setdefault("version", self.display_for(mirror).version + 1)
+
+    def _next_state(self, message: Dict[str, Any], mirror: Optional[str]) -> Optional[DisplayState]:
+        """State after a display event for ``mirror``, or None for other events"""
+        if coalesce_key(message) != "display":
+            return None
+        return self.display_for(mirror).apply(message)
+
+    def _follows_default(self, state: DisplayState) -> bool:
+        return state.render() == self.default_state.render()
+
+    def _apply(self, state: DisplayState, mirror: Optional[str]):
+        if mirror is None:
+            self.default_state = state
+            self._states.clear()
+        elif self._follows_default(state):
+            self._states.pop(mirror, None)
+        else:
+            self._states[mirror] = state
+
+    def _receive(self, message: Dict[str, Any], event_id: Optional[int], mirror: Optional[str]):
+        state = self._next_state(message, mirror)
+        if state is not None:
+            self._apply(state, mirror)
+        if self._deliver is not None:
+            self._deliver(message, event_id, mirror)
+
+
+class PostgresMirrorBus(MemoryMirrorBus):
+    """Mirror state in the ``mirror_state`` table, events over LISTEN/NOTIFY"""
+
+    def __init__(self):
+        super().__init__()
+        self._connection = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.shared = False
+
+    @property
+    def backend(self) -> str:
+        return "postgres" if self.shared else "memory"
+
+    def _dsn(self) -> str:
+        # asyncpg takes a plain postgresql:// URL
+        return database.get_async_database_url().replace("postgresql+asyncpg://", "postgresql://", 1)
+
+    async def start(self, deliver: Deliver):
+        """Listen for events from every worker; falls back to in-process delivery if Postgres is unavailable"""
+        self._stopping = False
+        try:
+            await self._listen()
+            self.shared = True
+        except Exception as e:
+            print(f"Warning: Mirror events limited to this worker, LISTEN/NOTIFY unavailable: {e}")
+        await super().start(deliver)
+
+    async def stop(self):
+        self._stopping = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            await asyncio.gather(self._reconnect_task, return_exceptions=True)
+            self._reconnect_task = None
+        if self._connection is not None:
+            try:
+                await self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+        await super().stop()
+
+    async def _listen(self):
+        """Open the LISTEN connection and load the current displays"""
+        import asyncpg
+
+        connection = await asyncpg.connect(self._dsn())
+        try:
+            rows = await connection.fetch("SELECT mirror_id, text, display FROM mirror_state")
+            await connection.add_listener(MIRROR_CHANNEL, self._on_notify)
+        except Exception:
+            await connection.close()
+            raise
+        connection.add_termination_listener(self._on_terminated)
+        self._connection = connection
+        states = {
+            row["mirror_id"]: (
+                DisplayState.from_json(row["display"], row["text"]) if row["display"]
+                else DisplayState.from_html(row["text"])
+            )
+            for row in rows
+        }
+        self.default_state = states.pop(DEFAULT_MIRROR_KEY, None) or DisplayState()
+        self._states = states
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        try:
+            envelope = json.loads(payload)
+            if envelope.get("origin") == PROCESS_ORIGIN:
+                # Applied and delivered by publish() when it committed
+                return
+            if "signal" in envelope:
+                self._on_signal(envelope["signal"], envelope.get("payload") or {})
+                return
+            self._receive(envelope["message"], envelope["id"], envelope.get("mirror"))
+        except Exception as e:
+            logger.error(f"Invalid mirror event payload: {e}")
+
+    def _on_terminated(self, connection):
+        if self._stopping:
+            return
+        print("⚠️  Mirror event connection lost, reconnecting...")
+        self._connection = None
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        while not self._stopping:
+            await asyncio.sleep(RECONNECT_DELAY)
+            try:
+                await self._listen()
+                print("✅ Mirror event connection restored")
+                # Signals sent while the connection was down are lost; let every handler catch up
+                for name in list(self._signal_handlers):
+                    self._on_signal(name, {"resync": True})
+                return
+            except Exception as e:
+                logger.warning(f"Mirror event reconnect failed: {e}")
+
+    async def _save_state(self, session, state: DisplayState, mirror: Optional[str]):
+        """Persist a display change with the same rules as ``_apply``"""
+        from sqlalchemy import text as sql
+
+        upsert = sql(
+            "INSERT INTO mirror_state (mirror_id, text, display, updated_at) VALUES (:mirror_id, :text, :display, now()) "
+            "ON CONFLICT (mirror_id) DO UPDATE SET text = EXCLUDED.text, display = EXCLUDED.display, "
+            "updated_at = EXCLUDED.updated_at"
+        )
+        row = {"text": state.render(), "display": state.to_json()}
+        if mirror is None:
+            await session.execute(sql("DELETE FROM mirror_state WHERE mirror_id <> :default"), {"default": DEFAULT_MIRROR_KEY})
+            await session.execute(upsert, {"mirror_id": DEFAULT_MIRROR_KEY, **row})
+        elif self._follows_default(state):
+            await session.execute(sql("DELETE FROM mirror_state WHERE mirror_id = :mirror_id"), {"mirror_id": mirror})
+        else:
+            await session.execute(upsert, {"mirror_id": mirror, **row})
+
+    async def _publish(self, message: Dict[str, Any], mirror: Optional[str]) -> bool:
+        from sqlalchemy import text as sql
+
+        if not self.shared:
+            return await super()._publish(message, mirror)
+
+        self._stamp(message, mirror)
+        state = self._next_state(message, mirror)
+        encoded = json.dumps(message)
+        event_id_sql = "(extract(epoch FROM clock_timestamp()) * 1000000)::bigint"
+        try:
+            async with database.AsyncSessionLocal() as session:
+                if state is not None:
+                    await self._save_state(session, state, mirror)
+                if len(encoded.encode("utf-8")) > MAX_NOTIFY_MESSAGE_BYTES:
+                    logger.warning(f"Mirror event of {len(encoded)} bytes is too large to share, delivering to this worker only")
+                    result = await session.execute(sql(f"SELECT {event_id_sql}"))
+                else:
+                    # NOTIFY is delivered on commit, together with the state change
+                    result = await session.execute(
+                        sql(
+                            f"WITH event AS (SELECT {event_id_sql} AS id) "
+                            "SELECT id, pg_notify(:channel, json_build_object("
+                            "'id', id, "
+                            "'origin', CAST(:origin AS text), "
+                            "'mirror', CAST(:mirror AS text), "
+                            "'message', CAST(:message AS json))::text) FROM event"
+                        ),
+                        {"channel": MIRROR_CHANNEL, "origin": PROCESS_ORIGIN, "mirror": mirror, "message": encoded}
+                    )
+                event_id = result.first()[0]
+                await session.commit()
+        except Exception as e:
+            if state is not None:
+                # The state change was rolled back; showing it here would disagree with the table
+                logger.error(f"Mirror display update not published: {e}")
+                return False
+            # Keep this worker's clients up to date even if the event cannot be shared
+            logger.warning(f"Mirror event delivered locally only: {e}")
+            self._receive(message, None, mirror)
+            return True
+
+        if state is not None:
+            self._apply(state, mirror)
+        if self._deliver is not None:
+            self._deliver(message, event_id, mirror)
+        return True
+
+    async def signal(self, name: str, payload: Dict[str, Any]) -> bool:
+        from sqlalchemy import text as sql
+
+        if not self.shared:
+            return True
+        encoded = json.dumps(payload)
+        if len(encoded.encode("utf-8")) > MAX_NOTIFY_MESSAGE_BYTES:
+            logger.error(f"Mirror bus signal '{name}' of {len(encoded)} bytes is too large to send")
+            return False
+        try:
+            async with database.AsyncSessionLocal() as session:
+                await session.execute(
+                    sql(
+                        "SELECT pg_notify(:channel, json_build_object("
+                        "'origin', CAST(:origin AS text), "
+                        "'signal', CAST(:signal AS text), "
+                        "'payload', CAST(:payload AS json))::text)"
+                    ),
+                    {"channel": MIRROR_CHANNEL, "origin": PROCESS_ORIGIN, "signal": name, "payload": encoded}
+                )
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Mirror bus signal '{name}' not sent: {e}")
+            return False
+        return True
+
+
+def create_mirror_bus():
+    """Mirror bus for the MIRROR_BUS setting ("postgres" or "memory")"""
+    if settings.MIRROR_BUS == "postgres":
+        return PostgresMirrorBus()
+    return MemoryMirrorBus()
+
+
+# Global mirror bus instance
+mirror_bus = create_mirror_bus()
@@ -0,0 +1,139 @@
+"""
+Arabic/English transliteration-aware phonetic keys for guest names.
+
+Speech-to-text returns Latin spellings of Arabic names that vary from guest
+list entries ("Mohammad/Muhammad/Mohamed", "Al-Hussein/Alhussain"). Each name
+is reduced to a consonant skeleton so those variants share, or nearly share,
+the same key:
+
+1. Arabic script is transliterated, accents are stripped, text is lowercased
+2. the article ("Al-", "El-", "Ash-", ...) and "Abdul/Abdel/Abd al" are folded;
+   a fused article ("Alhussain", "Assayed") is only dropped before an Arabic
+   letter pattern, so "Alexander" and "Elizabeth" keep their first syllable
+3. digraphs and interchangeable letters are mapped to one class (q/k, ph/f, g/j ...)
+4. doubled letters are collapsed, interior vowels are dropped and a leading
+   vowel is kept as a generic "a"
+
+This module has no dependencies so models.py and the migration scripts can
+import it outside the API process.
+"""
+import re
+import unicodedata
+from typing import List, Tuple
+
+# Arabic letters -> closest Latin letter before the skeleton rules run
+ARABIC_TO_LATIN = {
+    "ا": "a", "أ": "a", "إ": "i", "آ": "a", "ء": "", "ؤ": "u", "ئ": "i", "ى": "a",
+    "ب": "b", "ت": "t", "ث": "th", "ج": "j", "ح": "h", "خ": "kh", "د": "d",
+    "ذ": "dh", "ر": "r", "ز": "z", "س": "s", "ش": "sh", "ص": "s", "ض": "d",
+    "ط": "t", "ظ": "z", "ع": "", "غ": "gh", "ف": "f", "ق": "q", "ك": "k",
+    "ل": "l", "م": "m", "ن": "n", "ه": "h", "ة": "a", "و": "w", "ي": "y",
+}
+
+# Definite article with or without sun-letter assimilation ("Al-", "El ", "Ash-", "Ar-")
+ARTICLE_PATTERN = re.compile(r"^(?:al|el|ul|a[dnrstz]h?)[-\s']+")
+# Article fused to the name, only before a letter Latin names rarely start with
+# ("Alhussain", "Elkhoury", "Alqudah", "Althani") or with the sun letter doubled
+# ("Assayed", "Arrashid"); "Alexander", "Elizabeth", "Albert" are left alone
+FUSED_ARTICLE_PATTERN = re.compile(
+    r"^(?:(?:al|el)(?=(?:kh|gh|sh|th|dh|h|q|z|j)[a-z]{3,})|a(?=([rstz])\1[aeiou][a-z]{2,}))"
+)
+# "Abdul Rahman", "Abdel-Rahman", "Abd al Rahman", "Abdulrahman" -> "abd" + name
+ABD_PATTERN = re.compile(r"\babd\s*[-']?\s*(?:[aeu]l|[aeu]r|[aeu]s)?[-\s']*")
+
+# Interchangeable spellings, applied in order
+LETTER_CLASSES: List[Tuple[str, str]] = [
+    ("ph", "f"),
+    ("kh", "k"),
+    ("gh", "g"),
+    ("dj", "j"),
+    ("dh", "d"),
+    ("th", "t"),
+    ("sh", "x"),
+    ("ch", "x"),
+    ("ck", "k"),
+    ("q", "k"),
+    ("c", "k"),
+    ("g", "j"),
+    ("v", "f"),
+    ("ee", "i"),
+    ("oo", "u"),
+]
+
+VOWELS = set("aeiouy")
+
+
+def _to_latin(value: str) -> str:
+    value = "".join(ARABIC_TO_LATIN.get(char, char) for char in value)
+    value = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in value if not unicodedata.combining(char)).lower()
+
+
+def _word_key(word: str) -> str:
+    word = ARTICLE_PATTERN.sub("", word)
+    word = FUSED_ARTICLE_PATTERN.sub("", word)
+    word = re.sub(r"[^a-z]", "", word)
+    if not word:
+        return ""
+    for source, target in LETTER_CLASSES:
+        word = word.replace(source, target)
+    # "Fatimah" / "Fatima", "Abdullah" / "Abdulla"
+    if len(word) > 2 and word.endswith("h") and word[-2] in VOWELS:
+        word = word[:-1]
+    # Collapse doubled letters before vowels go so "Layla" keeps both l's
+    word = re.sub(r"(.)\1+", r"\1", word)
+
+    first = "a" if word[0] in VOWELS and word[0] != "y" else word[0]
+    rest = "".join(char for char in word[1:] if char not in VOWELS)
+    return first + rest
+
+
+def phonetic_key(name: str) -> str:
+    """Phonetic skeleton for a name, one key per word separated by spaces"""
+    value = _to_latin(name or "")
+    value = ABD_PATTERN.sub("abd", value)
+    words = re.split(r"\s+", value.strip())
+    keys = []
+    i = 0
+    while i < len(words):
+        word = words[i]
+        # A standalone article belongs to the next word ("al hussein")
+        if word in ("al", "el") and i + 1 < len(words):
+            word = f"{word}-{words[i + 1]}"
+            i += 1
+        key = _word_key(word)
+        if key:
+            keys.append(key)
+        i += 1
+    return " ".join(keys)
+
+
+def guest_name_key(first_name: str, last_name: str) -> str:
+    """Stored phonetic key for a guest ("<first key> <last key>")"""
+    return phonetic_key(f"{first_name or ''} {last_name or ''}")
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Edit distance between two keys"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def key_similarity(a: str, b: str) -> float:
+    """1.0 for identical keys, falling towards 0.0 with edit distance"""
+    if not a or not b:
+        return 0.0
+    return 1.0 - levenshtein(a, b) / max(len(a), len(b))
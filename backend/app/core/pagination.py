@@ -0,0 +1,102 @@
+"""
+Keyset (cursor) pagination for the admin list endpoints.
+
+Pages are ordered newest first by ``(created_at, id)`` and the cursor is the
+position of the last row of the previous page, so fetching page N costs the
+same index range scan as page 1 instead of an ever-growing ``OFFSET``.
+Cursors are opaque URL-safe strings.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PaginationError(ValueError):
+    """Raised when a cursor or filter value in a list request cannot be parsed"""
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    """Keep page sizes between 1 and MAX_PAGE_SIZE"""
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor pointing just after the given row"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise PaginationError("Invalid cursor")
+
+
+def parse_datetime(value: Optional[str], name: str) -> Optional[datetime]:
+    """Parse an ISO date/datetime query parameter"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        raise PaginationError(f"Invalid {name}: expected an ISO date or datetime")
+
+
+async def paginate(
+    session: AsyncSession,
+    statement: Any,
+    model: Any,
+    limit: int,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+) -> Tuple[List[Any], Optional[str], Optional[int]]:
+    """
+    Run ``statement`` (already filtered) one page at a time.
+
+    Returns the rows of the page, the cursor for the next page (None on the
+    last page) and the total number of matching rows, or None when
+    ``include_total`` is False so the extra COUNT can be skipped.
+    """
+    total = None
+    if include_total:
+        count_statement = select(func.count()).select_from(
+            statement.with_only_columns(model.id).order_by(None).subquery()
+        )
+        total = (await session.execute(count_statement)).scalar_one()
+
+    page_statement = statement
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        page_statement = page_statement.where(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    page_statement = page_statement.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+    rows = list((await session.execute(page_statement)).scalars().unique().all())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor, total
+
+
+def page_metadata(limit: int, next_cursor: Optional[str], total: Optional[int]) -> Dict[str, Any]:
+    """Common pagination fields added to list responses"""
+    return {
+        "total": total,
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    }
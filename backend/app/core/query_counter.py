@@ -0,0 +1,161 @@
+"""
+SQL statement counting and per-route query budgets.
+
+Every statement executed on the shared engines is counted against the
+request (or ``count_queries()`` block) that issued it. Routes listed in
+``ROUTE_QUERY_BUDGETS`` must stay within a fixed number of statements, which
+catches N+1 regressions such as lazy-loading a relationship inside a loop.
+
+Overruns are logged. With ``QUERY_BUDGET_ENFORCE=true`` (e.g. in a test or
+staging run) the offending request fails with a 500 instead, so the
+regression cannot go unnoticed.
+
+The budget is checked when headers go out and again when the last body
+chunk is sent, because streaming responses (exports, ``?stream=`` lists) run
+their queries while the body is produced. A streamed response that overruns
+after its headers were sent is aborted instead of completed.
+"""
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from backend.app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (method, route path) -> most statements the route may execute
+ROUTE_QUERY_BUDGETS: Dict[Tuple[str, str], int] = {
+    ("GET", "/api/guests"): 2,  # COUNT + one page with relation types joined
+    ("GET", "/api/guests/export"): 1,
+    ("GET", "/api/relation-types"): 1,
+    ("GET", "/api/videos"): 2,  # COUNT + one page
+    ("GET", "/api/videos/{video_id}"): 1,  # recording with its guest joined
+}
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised by QueryCounter.check() when a route runs more statements than allowed"""
+
+
+class QueryCounter:
+    """Statements executed inside one request or ``count_queries()`` block"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements: List[str] = []
+
+    def check(self, budget: int, label: str = "block"):
+        """Raise QueryBudgetExceeded if more than ``budget`` statements ran"""
+        if self.count > budget:
+            raise QueryBudgetExceeded(
+                f"{label} executed {self.count} SQL statements (budget {budget}):\n" + "\n".join(self.statements)
+            )
+
+
+_current_counter: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.count += 1
+        counter.statements.append(statement)
+
+
+def instrument_engine(engine) -> None:
+    """Count statements run on ``engine`` (an Engine or the sync_engine of an AsyncEngine)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def count_queries(budget: Optional[int] = None, label: str = "block") -> Iterator[QueryCounter]:
+    """
+    Count statements executed inside the block.
+
+        with count_queries(budget=1, label="export") as counter:
+            ...
+    """
+    counter = QueryCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+    if budget is not None:
+        counter.check(budget, label)
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware counting statements per request and checking route budgets"""
+
+    def __init__(self, app, enforce: Optional[bool] = None):
+        self.app = app
+        self.enforce = settings.QUERY_BUDGET_ENFORCE if enforce is None else enforce
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = QueryCounter()
+        token = _current_counter.set(counter)
+        failed = False
+        start_count = 0
+
+        def get_budget() -> Tuple[Optional[int], str]:
+            route = scope.get("route")
+            path = getattr(route, "path", scope.get("path", ""))
+            label = f"{scope['method']} {path}"
+            return ROUTE_QUERY_BUDGETS.get((scope["method"], path)), label
+
+        def exceeded_budget() -> Optional[int]:
+            """The route's budget if it has been overrun (logged), else None"""
+            budget, label = get_budget()
+            if budget is None or counter.count <= budget:
+                return None
+            logger.error(f"Query budget exceeded: {label} ran {counter.count} statements (budget {budget})")
+            print(f"❌ Query budget exceeded: {label} ran {counter.count} statements (budget {budget})")
+            return budget
+
+        async def send_wrapper(message):
+            nonlocal failed, start_count
+            if failed:
+                return
+            # Regular responses have run all their queries by the time headers go out
+            if message["type"] == "http.response.start":
+                budget = exceeded_budget()
+                if budget is not None:
+                    if self.enforce:
+                        failed = True
+                        body = json.dumps({
+                            "success": False,
+                            "message": f"Query budget exceeded: {counter.count} statements (budget {budget})",
+                            "statements": counter.statements
+                        }).encode()
+                        await send({
+                            "type": "http.response.start",
+                            "status": 500,
+                            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                        })
+                        await send({"type": "http.response.body", "body": body})
+                        return
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-query-count", str(counter.count).encode())]
+                start_count = counter.count
+            # Streaming responses query while the body is sent; check again before the last chunk
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                budget = exceeded_budget() if counter.count > start_count else None
+                if budget is not None and self.enforce:
+                    failed = True
+                    raise QueryBudgetExceeded(f"{get_budget()[1]} executed {counter.count} SQL statements (budget {budget})")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_counter.reset(token)
@@ -0,0 +1,105 @@
+"""
+Versioned in-memory cache for read-mostly JSON endpoints.
+
+Guest and relation-type data changes rarely while the admin UI polls it, so
+every write to those tables bumps a process-wide ``data_version``. Responses
+are cached as pre-serialized bytes keyed by path and query string and tagged
+with that version:
+
+- a request whose ``If-None-Match`` equals the current ETag gets a 304
+  without touching the database
+- a request for an already cached version gets the stored bytes back
+- any write bumps the version, which invalidates every entry at once
+
+Versions are microsecond timestamps. A worker that writes sends its new
+version to the other workers (see ``guest_changes``), which adopt it, so an
+ETag handed out by one worker is never mistaken for current data by another.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+# Largest number of distinct (path, query) responses kept
+MAX_ENTRIES = 256
+
+
+def _parse_etags(header: str) -> List[str]:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+class ResponseCache:
+    """Process-local response cache invalidated by a monotonically increasing data version"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[int, str, bytes]]" = OrderedDict()
+        self.max_entries = max_entries
+        # Start from the boot time so ETags handed out before a restart never match again
+        self.data_version = int(time.time() * 1_000_000)
+
+    def bump(self, version: Optional[int] = None) -> int:
+        """Record that guest or relation-type data changed; returns the new version
+
+        ``version`` is the version another worker moved to for the same change.
+        """
+        with self._lock:
+            self.data_version = max(self.data_version + 1, version or int(time.time() * 1_000_000))
+            self._entries.clear()
+            return self.data_version
+
+    @staticmethod
+    def _key(request: Request) -> str:
+        query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+        return f"{request.url.path}?{query}"
+
+    def _etag(self, key: str, version: int) -> str:
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        return f'"v{version}-{digest}"'
+
+    def _headers(self, etag: str) -> Dict[str, str]:
+        # Browsers must revalidate, which costs them a 304 while nothing changed
+        return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    def lookup(self, request: Request) -> Optional[Response]:
+        """Return a 304 or the cached response for this request, or None on a miss"""
+        key = self._key(request)
+        with self._lock:
+            version = self.data_version
+            etag = self._etag(key, version)
+            if etag in _parse_etags(request.headers.get("if-none-match", "")):
+                return Response(status_code=304, headers=self._headers(etag))
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            body = entry[2]
+        return Response(content=body, media_type="application/json", headers=self._headers(etag))
+
+    def store(self, request: Request, payload: Any, version: Optional[int] = None) -> Response:
+        """
+        Serialize ``payload`` once, cache it and return it with its ETag.
+
+        ``version`` should be the data version read before the database query,
+        so a write that lands in between is never cached under the new version.
+        """
+        key = self._key(request)
+        body = json.dumps(payload).encode()
+        with self._lock:
+            if version is None:
+                version = self.data_version
+            etag = self._etag(key, version)
+            if version == self.data_version:
+                self._entries[key] = (version, etag, body)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return Response(content=body, media_type="application/json", headers=self._headers(etag))
+
+
+# Global cache instance
+response_cache = ResponseCache()
@@ -0,0 +1,53 @@
+"""
+JSON payloads for guests and video recordings.
+
+Shared by the paged list endpoints and their streaming variants so both
+return exactly the same fields.
+"""
+from typing import Any, Dict
+
+
+def _isoformat(value) -> Any:
+    return value.isoformat() if value else None
+
+
+def guest_to_dict(guest) -> Dict[str, Any]:
+    """Admin list payload for a Guest (relation_type must be loaded)"""
+    return {
+        "id": guest.id,
+        "first_name": guest.first_name,
+        "last_name": guest.last_name,
+        "full_name": f"{guest.first_name} {guest.last_name}",
+        "phone": guest.phone,
+        "seat_number": guest.seat_number,
+        "relation": guest.relation,
+        "relation_type": guest.relation_type.name if guest.relation_type else None,
+        "message": guest.message,
+        "story": guest.story,
+        "about": guest.about,
+        "created_at": _isoformat(guest.created_at),
+        "updated_at": _isoformat(guest.updated_at)
+    }
+
+
+def video_recording_to_dict(recording) -> Dict[str, Any]:
+    """List payload for a VideoRecording"""
+    return {
+        "id": recording.id,
+        "room_id": recording.room_id,
+        "video_url": recording.video_url,
+        "presigned_url": recording.presigned_url,
+        "egress_id": recording.egress_id,
+        "guest_name": recording.guest_name,
+        "guest_id": recording.guest_id,
+        "guest_phone": recording.guest_phone,
+        "guest_relation": recording.guest_relation,
+        "guest_table": recording.guest_table,
+        "recording_started_at": _isoformat(recording.recording_started_at),
+        "recording_ended_at": _isoformat(recording.recording_ended_at),
+        "file_size_bytes": recording.file_size_bytes,
+        "duration_seconds": recording.duration_seconds,
+        "status": recording.processing_status,
+        "created_at": _isoformat(recording.created_at),
+        "updated_at": _isoformat(recording.updated_at)
+    }
@@ -0,0 +1,60 @@
+"""
+S3 helpers for video recordings.
+
+The boto3 client is created once per process (client construction loads the
+service model and is far slower than signing a URL) and shared by the
+recording routes and the bulk presigned-URL refresh job.
+"""
+import os
+import threading
+from typing import Optional
+
+# Presigned links stay valid for 7 days
+PRESIGNED_URL_EXPIRES_IN = 86400 * 7
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_bucket_name() -> str:
+    return os.getenv("AWS_BUCKET_NAME", "4wk-garage-media")
+
+
+def get_region() -> str:
+    return os.getenv("AWS_REGION", "me-central-1")
+
+
+def get_s3_client():
+    """Shared boto3 S3 client (boto3 clients are thread-safe)"""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+
+                _s3_client = boto3.client(
+                    "s3",
+                    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                    region_name=get_region(),
+                )
+    return _s3_client
+
+
+def s3_key_from_url(video_url: str) -> Optional[str]:
+    """Extract the S3 key from a direct S3 URL, or None if it is not one"""
+    if video_url and "amazonaws.com/" in video_url:
+        return video_url.split("amazonaws.com/")[-1]
+    return None
+
+
+def generate_presigned_url(s3_key: str, expires_in: int = PRESIGNED_URL_EXPIRES_IN) -> str:
+    """Presigned GET URL for an object in the recordings bucket"""
+    return get_s3_client().generate_presigned_url(
+        "get_object",
+        Params={
+            "Bucket": get_bucket_name(),
+            "Key": s3_key,
+        },
+        ExpiresIn=expires_in,
+    )
@@ -0,0 +1,77 @@
+"""
+Streaming responses for large list endpoints.
+
+A client opts in with ``Accept: application/x-ndjson`` or ``?stream=ndjson``
+(one JSON object per line), or ``?stream=json`` (a single JSON array written
+incrementally). Rows are read from a server-side cursor in batches of
+``STREAM_BATCH_SIZE`` and written as soon as each batch arrives, so memory
+stays flat and the first byte does not wait for the whole table.
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from backend.app.core import database
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+# Rows fetched from the cursor (and written to the socket) at a time
+STREAM_BATCH_SIZE = 500
+
+
+def get_stream_format(request: Request, stream: Optional[str] = None) -> Optional[str]:
+    """Return "ndjson", "json" or None (regular paged response) for a request"""
+    if stream:
+        value = stream.lower()
+        if value in ("json", "array"):
+            return "json"
+        if value in ("1", "true", "yes", "ndjson"):
+            return "ndjson"
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return "ndjson"
+    return None
+
+
+async def _iterate_rows(statement: Any, serialize: Callable[[Any], Dict[str, Any]], fmt: str) -> AsyncIterator[str]:
+    # The request's session may already be closed while the body is sent, so the stream owns its own
+    if database.AsyncSessionLocal is None:
+        database.init_async_engine()
+    first = True
+    if fmt == "json":
+        yield "["
+    try:
+        async with database.AsyncSessionLocal() as session:
+            result = await session.stream_scalars(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for rows in result.partitions():
+                if fmt == "json":
+                    chunk = ",".join(json.dumps(serialize(row)) for row in rows)
+                    if not first:
+                        chunk = "," + chunk
+                else:
+                    chunk = "".join(json.dumps(serialize(row)) + "\n" for row in rows)
+                first = False
+                yield chunk
+    except Exception as e:
+        # Headers are already sent; the truncated body tells the client something went wrong
+        logger.error(f"Error while streaming rows: {e}")
+        print(f"❌ Error while streaming rows: {e}")
+        if fmt == "ndjson":
+            yield json.dumps({"error": str(e)}) + "\n"
+        return
+    if fmt == "json":
+        yield "]"
+
+
+def stream_rows(statement: Any, serialize: Callable[[Any], Dict[str, Any]], fmt: str) -> StreamingResponse:
+    """StreamingResponse writing every row of ``statement`` as NDJSON or a JSON array"""
+    media_type = NDJSON_MEDIA_TYPE if fmt == "ndjson" else JSON_MEDIA_TYPE
+    return StreamingResponse(
+        _iterate_rows(statement, serialize, fmt),
+        media_type=media_type,
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    )
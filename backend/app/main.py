@@ -9,12 +9,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from typing import Dict, Optional
 import asyncio
 import json
-from typing import List
+from contextlib import asynccontextmanager
 from backend.app.core.config import settings
+from backend.app.core import database
+from backend.app.core.database import init_engine, dispose_engine, init_async_engine, dispose_async_engine
+from backend.app.core.guest_index import guest_index
+from backend.app.core.jobs import job_runner
+from backend.app.core.event_hub import event_hub
+from backend.app.core.mirror_bus import ORIGINAL_TEXT, mirror_bus, resolve_mirror
+from backend.app.core.query_counter import QueryBudgetMiddleware
 from backend.app.core.auth import verify_password, require_auth, check_auth
 from backend.app.api.v1.api import api_router
+from backend.app.api.v1.ws import ws_router
 
 # Try to import LiveKit service, but make it optional
 try:
@@ -25,12 +34,45 @@ except ValueError as e:
     livekit_service = None
     LIVEKIT_AVAILABLE = False
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown"""
+    init_engine()
+    init_async_engine()
+    
+    # Build the in-memory guest name index; search falls back to the database if this fails
+    try:
+        async with database.AsyncSessionLocal() as session:
+            await guest_index.load(session)
+    except Exception as e:
+        print(f"Warning: Guest name index not loaded, searching the database instead: {e}")
+    
+    # Workers for imports, exports and bulk maintenance jobs
+    await job_runner.start()
+    
+    # Shared keep-alive ticker for /api/events
+    await event_hub.start()
+    
+    # Mirror state and events shared by every worker
+    await mirror_bus.start(event_hub.publish)
+    
+    yield
+    await mirror_bus.stop()
+    await event_hub.stop()
+    await job_runner.stop()
+    await dispose_async_engine()
+    dispose_engine()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
+# Count SQL statements per request and flag routes that exceed their budget (N+1 guard)
+app.add_middleware(QueryBudgetMiddleware)
+
 # Add CORS middleware to allow React app to access the API
 app.add_middleware(
     CORSMiddleware,
@@ -40,36 +82,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store the current mirror text and original text
-original_text = '<span class="line welcome fancy">Welcome to</span><span class="line names fancy">Moatasem & Hala Wedding</span><span class="line script">Say Mirror Mirror to begin</span>'
-current_text = original_text
-
-# Store connected clients for SSE
-connected_clients: List[asyncio.Queue] = []
-
 class TextUpdate(BaseModel):
     text: str
+    mirror: Optional[str] = None  # LiveKit room name of the target mirror; every mirror if omitted
+
+class DisplayUpdate(BaseModel):
+    layout: str  # Layout name from display_model.LAYOUTS
+    slots: Dict[str, str] = {}  # Slot values; slots left out show the layout's default text
+    mirror: Optional[str] = None  # LiveKit room name of the target mirror; every mirror if omitted
 
 class AudioPlayEvent(BaseModel):
     type: str = "audio_play"
     message: str = "Playing mirror sound effect"
 
-async def broadcast_message(message: dict):
-    """Broadcast message to all connected SSE clients"""
-    if connected_clients:
-        disconnected_clients = []
-        for client_queue in connected_clients:
-            try:
-                await client_queue.put(message)
-            except Exception:
-                disconnected_clients.append(client_queue)
-        
-        # Remove disconnected clients
-        for client in disconnected_clients:
-            connected_clients.remove(client)
+async def broadcast_message(message: dict, mirror: Optional[str] = None) -> int:
+    """Broadcast message to the clients of ``mirror`` (every mirror if None) on every worker
+    
+    Returns the number of this worker's clients that were reached (0 if the
+    message could not be published).
+    """
+    if mirror is not None:
+        message["mirror"] = mirror
+    if not await mirror_bus.publish(message, mirror):
+        return 0
+    return event_hub.count(mirror)
+
+def invalid_mirror_response(error: ValueError) -> JSONResponse:
+    return JSONResponse({"success": False, "message": str(error)}, status_code=400)
 
 # Include API routes
 app.include_router(api_router, prefix="/api")
+app.include_router(ws_router)
 
 # Auth API routes
 @app.get("/")
@@ -79,59 +122,99 @@ def root():
 
 # Mirror control endpoints
 @app.post("/api/reset")
-async def reset_mirror():
-    """Reset mirror to default text and play audio"""
-    global current_text
-    current_text = original_text
+async def reset_mirror(mirror: Optional[str] = None):
+    """Reset mirror to default text and play audio (``?mirror=`` targets one mirror)"""
+    try:
+        mirror = resolve_mirror(mirror)
+    except ValueError as e:
+        return invalid_mirror_response(e)
     
     reset_message = {
         "type": "reset",
-        "new_text": current_text,
+        "new_text": ORIGINAL_TEXT,
         "play_audio": True,
         "message": "Mirror reset to default"
     }
     
-    await broadcast_message(reset_message)
+    clients_notified = await broadcast_message(reset_message, mirror)
     
     return {
         "success": True,
         "message": "Mirror reset to default",
-        "new_text": current_text,
+        "mirror": mirror,
+        "new_text": ORIGINAL_TEXT,
         "play_audio": True,
-        "audio_url": "/static/audio/mirror.wav"
+        "audio_url": "/static/audio/mirror.wav",
+        "clients_notified": clients_notified
     }
 
 @app.post("/api/update-text")
-async def update_text(text_update: TextUpdate):
-    """Update the mirror text display"""
-    global current_text, connected_clients
-    
-    current_text = text_update.text
+async def update_text(text_update: TextUpdate, mirror: Optional[str] = None):
+    """Update the mirror text display (``mirror`` in the body or query targets one mirror)"""
+    try:
+        mirror = resolve_mirror(text_update.mirror or mirror)
+    except ValueError as e:
+        return invalid_mirror_response(e)
     
     event_data = {
         "type": "text_update", 
-        "text": current_text
+        "text": text_update.text
     }
     
-    disconnected_clients = []
-    for client_queue in connected_clients:
-        try:
-            await client_queue.put(event_data)
-        except:
-            disconnected_clients.append(client_queue)
-    
-    for client in disconnected_clients:
-        connected_clients.remove(client)
+    clients_notified = await broadcast_message(event_data, mirror)
     
     return {
         "message": "Text updated successfully", 
-        "new_text": current_text,
-        "clients_notified": len(connected_clients)
+        "mirror": mirror,
+        "new_text": text_update.text,
+        "clients_notified": clients_notified
+    }
+
+@app.post("/api/display")
+async def update_display(display_update: DisplayUpdate, mirror: Optional[str] = None):
+    """Show a layout on the mirror display, sending only the slots that change"""
+    try:
+        mirror = resolve_mirror(display_update.mirror or mirror)
+    except ValueError as e:
+        return invalid_mirror_response(e)
+    
+    # The patch is built from the current state under the bus lock, so concurrent updates get distinct versions
+    try:
+        patch = await mirror_bus.publish_patch(display_update.layout, display_update.slots, mirror)
+    except ValueError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=400)
+    except RuntimeError as e:
+        return JSONResponse({"success": False, "message": str(e)}, status_code=503)
+    
+    if patch is None:
+        return {
+            "success": True,
+            "message": "Display already up to date",
+            "mirror": mirror,
+            "version": mirror_bus.display_for(mirror).version,
+            "changed": False,
+            "clients_notified": 0
+        }
+    
+    clients_notified = event_hub.count(mirror)
+    
+    return {
+        "success": True,
+        "message": "Display updated",
+        "mirror": mirror,
+        "version": patch["version"],
+        "changed": True,
+        "clients_notified": clients_notified
     }
 
 @app.post("/api/play-audio")
-async def play_audio(request: dict):
-    """Trigger audio playback in the frontend"""
+async def play_audio(request: dict, mirror: Optional[str] = None):
+    """Trigger audio playback in the frontend (``mirror`` in the body or query targets one mirror)"""
+    try:
+        mirror = resolve_mirror(request.get("mirror") or mirror)
+    except ValueError as e:
+        return invalid_mirror_response(e)
+    
     audio_file = request.get("audio_file", "mirror_activation.wav")
     action = request.get("action", "play_sound")
     
@@ -143,13 +226,14 @@ async def play_audio(request: dict):
         "message": "Playing mirror activation sound"
     }
     
-    # Broadcast to all connected clients
-    await broadcast_message(audio_event)
+    # Broadcast to the mirror's clients
+    clients_notified = await broadcast_message(audio_event, mirror)
     
     return {
         "success": True,
         "message": f"Audio play command sent: {audio_file}",
-        "clients_notified": len(connected_clients),
+        "mirror": mirror,
+        "clients_notified": clients_notified,
         "audio_file": audio_file,
         "action": action
     }
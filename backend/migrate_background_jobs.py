@@ -0,0 +1,104 @@
+"""
+Add background jobs table
+
+This migration adds the background_jobs table that persists imports, exports
+and bulk maintenance tasks run by the in-process job runner, so their
+progress and results can be polled through /api/jobs/{id}. Each job records
+its owning worker and a heartbeat, so a starting worker only fails the jobs
+of workers that are gone.
+"""
+
+from sqlalchemy import create_engine, text
+import os
+
+
+def upgrade():
+    """Add background_jobs table"""
+    
+    # Get database URL
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    # Convert async URL to sync URL for migration
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    
+    engine = create_engine(sync_database_url)
+    
+    upgrade_sql = [
+        """
+        CREATE TABLE IF NOT EXISTS background_jobs (
+            id VARCHAR(32) PRIMARY KEY,
+            kind VARCHAR(50) NOT NULL,
+            status VARCHAR(20) DEFAULT 'queued' NOT NULL,
+            progress INTEGER,
+            message TEXT,
+            params TEXT,
+            result TEXT,
+            error TEXT,
+            owner VARCHAR(32),
+            heartbeat_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_background_jobs_kind ON background_jobs(kind);",
+        "CREATE INDEX IF NOT EXISTS ix_background_jobs_status ON background_jobs(status);",
+        # Tables created before job ownership was tracked
+        "ALTER TABLE background_jobs ADD COLUMN IF NOT EXISTS owner VARCHAR(32);",
+        "ALTER TABLE background_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;",
+    ]
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            print("Creating background_jobs table...")
+            for sql in upgrade_sql:
+                connection.execute(text(sql))
+            
+            trans.commit()
+            print("✅ Background jobs table created successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error creating background jobs table: {e}")
+            raise
+
+
+def downgrade():
+    """Drop background_jobs table"""
+    
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    engine = create_engine(sync_database_url)
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            connection.execute(text("DROP TABLE IF EXISTS background_jobs;"))
+            trans.commit()
+            print("✅ Background jobs table dropped successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error dropping background jobs table: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    import sys
+    from dotenv import load_dotenv
+    
+    # Load environment variables
+    load_dotenv()
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,102 @@
+"""
+Add phonetic name keys to the guests table
+
+This migration adds the name_key column (an Arabic/English transliteration
+tolerant skeleton of "first last"), indexes it and backfills it for existing
+guests so /guest/search can match spellings like Mohammad/Muhammad/Mohamed.
+"""
+
+from sqlalchemy import create_engine, text
+import os
+
+from app.core.name_phonetics import guest_name_key
+
+
+def upgrade():
+    """Add name_key column, indexes and backfill existing guests"""
+    
+    # Get database URL
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    # Convert async URL to sync URL for migration
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    
+    engine = create_engine(sync_database_url)
+    
+    upgrade_sql = [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        "CREATE EXTENSION IF NOT EXISTS fuzzystrmatch;",
+        "ALTER TABLE guests ADD COLUMN IF NOT EXISTS name_key VARCHAR(200);",
+        "CREATE INDEX IF NOT EXISTS ix_guests_name_key ON guests (name_key);",
+        "CREATE INDEX IF NOT EXISTS idx_guests_name_key_trgm ON guests USING gin (name_key gin_trgm_ops);",
+    ]
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            print("Adding guest phonetic name keys...")
+            for sql in upgrade_sql:
+                connection.execute(text(sql))
+            
+            # Backfill keys for existing guests
+            guests = connection.execute(text("SELECT id, first_name, last_name FROM guests")).fetchall()
+            if guests:
+                connection.execute(
+                    text("UPDATE guests SET name_key = :name_key WHERE id = :id"),
+                    [{"id": g.id, "name_key": guest_name_key(g.first_name, g.last_name)} for g in guests]
+                )
+            print(f"Backfilled name keys for {len(guests)} guests")
+            
+            trans.commit()
+            print("✅ Guest name keys created successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error creating guest name keys: {e}")
+            raise
+
+
+def downgrade():
+    """Drop name_key column and its indexes"""
+    
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    engine = create_engine(sync_database_url)
+    
+    drop_sql = """
+    DROP INDEX IF EXISTS idx_guests_name_key_trgm;
+    DROP INDEX IF EXISTS ix_guests_name_key;
+    ALTER TABLE guests DROP COLUMN IF EXISTS name_key;
+    """
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            connection.execute(text(drop_sql))
+            trans.commit()
+            print("✅ Guest name keys dropped successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error dropping guest name keys: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    import sys
+    from dotenv import load_dotenv
+    
+    # Load environment variables
+    load_dotenv()
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade()
+    else:
+        upgrade()
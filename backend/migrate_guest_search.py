@@ -0,0 +1,93 @@
+"""
+Add trigram search support to the guests table
+
+This migration enables pg_trgm, adds the generated search_name column
+(lowercased "first last") and indexes it so /guest/search can rank exact,
+prefix and similarity matches in a single indexed query.
+"""
+
+from sqlalchemy import create_engine, text
+import os
+
+
+def upgrade():
+    """Add search_name column and trigram indexes"""
+    
+    # Get database URL
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    # Convert async URL to sync URL for migration
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    
+    engine = create_engine(sync_database_url)
+    
+    upgrade_sql = [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        """
+        ALTER TABLE guests ADD COLUMN IF NOT EXISTS search_name TEXT
+            GENERATED ALWAYS AS (lower(first_name || ' ' || last_name)) STORED;
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_guests_search_name_trgm ON guests USING gin (search_name gin_trgm_ops);",
+        "CREATE INDEX IF NOT EXISTS idx_guests_search_name_prefix ON guests (search_name text_pattern_ops);",
+    ]
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            print("Adding guest search column and trigram indexes...")
+            for sql in upgrade_sql:
+                connection.execute(text(sql))
+            
+            trans.commit()
+            print("✅ Guest search indexes created successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error creating guest search indexes: {e}")
+            raise
+
+
+def downgrade():
+    """Drop search_name column and its indexes"""
+    
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    engine = create_engine(sync_database_url)
+    
+    drop_sql = """
+    DROP INDEX IF EXISTS idx_guests_search_name_prefix;
+    DROP INDEX IF EXISTS idx_guests_search_name_trgm;
+    ALTER TABLE guests DROP COLUMN IF EXISTS search_name;
+    """
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            connection.execute(text(drop_sql))
+            trans.commit()
+            print("✅ Guest search indexes dropped successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error dropping guest search indexes: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    import sys
+    from dotenv import load_dotenv
+    
+    # Load environment variables
+    load_dotenv()
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade()
+    else:
+        upgrade()
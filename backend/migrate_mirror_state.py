@@ -0,0 +1,92 @@
+"""
+Add mirror state table
+
+This migration adds the mirror_state table holding the text shown on each
+mirror, keyed by LiveKit room name (the '' row holds the default text shown
+on every other mirror) and its structured display (layout, slots and
+version). Every API worker loads it on startup and the LISTEN/NOTIFY mirror
+bus keeps it in sync, so the backend can run more than one worker.
+"""
+
+from sqlalchemy import create_engine, text
+import os
+
+
+def upgrade():
+    """Add mirror_state table"""
+    
+    # Get database URL
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    # Convert async URL to sync URL for migration
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    
+    engine = create_engine(sync_database_url)
+    
+    upgrade_sql = [
+        """
+        CREATE TABLE IF NOT EXISTS mirror_state (
+            mirror_id VARCHAR(100) PRIMARY KEY,
+            text TEXT NOT NULL,
+            display TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+        );
+        """,
+        # Tables created before the display column existed
+        "ALTER TABLE mirror_state ADD COLUMN IF NOT EXISTS display TEXT;",
+    ]
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            print("Creating mirror_state table...")
+            for sql in upgrade_sql:
+                connection.execute(text(sql))
+            
+            trans.commit()
+            print("✅ Mirror state table created successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error creating mirror state table: {e}")
+            raise
+
+
+def downgrade():
+    """Drop mirror_state table"""
+    
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    engine = create_engine(sync_database_url)
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            connection.execute(text("DROP TABLE IF EXISTS mirror_state;"))
+            trans.commit()
+            print("✅ Mirror state table dropped successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error dropping mirror state table: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    import sys
+    from dotenv import load_dotenv
+    
+    # Load environment variables
+    load_dotenv()
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,100 @@
+"""
+Add keyset pagination indexes for the admin list endpoints
+
+GET /guests and GET /videos page through rows newest first by
+(created_at, id). This migration backfills missing guest timestamps, makes
+guests.created_at NOT NULL (video_recordings.created_at already is) and adds
+the composite indexes those range scans use.
+"""
+
+from sqlalchemy import create_engine, text
+import os
+
+
+def upgrade():
+    """Backfill guests.created_at, make it NOT NULL and create the pagination indexes"""
+    
+    # Get database URL
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    # Convert async URL to sync URL for migration
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    
+    engine = create_engine(sync_database_url)
+    
+    upgrade_sql = [
+        # Rows without a timestamp would never appear after the first page
+        "UPDATE guests SET created_at = COALESCE(updated_at, NOW()) WHERE created_at IS NULL;",
+        # Inserts that bypass the ORM (raw SQL, psql) still get a timestamp
+        "ALTER TABLE guests ALTER COLUMN created_at SET DEFAULT NOW();",
+        "ALTER TABLE guests ALTER COLUMN created_at SET NOT NULL;",
+        "CREATE INDEX IF NOT EXISTS idx_guests_created_at_id ON guests (created_at, id);",
+        "CREATE INDEX IF NOT EXISTS idx_video_recordings_created_at_id ON video_recordings (created_at, id);",
+        """
+        CREATE INDEX IF NOT EXISTS idx_video_recordings_status_created_at_id
+            ON video_recordings (processing_status, created_at, id);
+        """,
+    ]
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            print("Backfilling guest timestamps and creating pagination indexes...")
+            for sql in upgrade_sql:
+                connection.execute(text(sql))
+            
+            trans.commit()
+            print("✅ Pagination indexes created successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error creating pagination indexes: {e}")
+            raise
+
+
+def downgrade():
+    """Drop the pagination indexes and allow NULL guests.created_at again"""
+    
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set")
+    
+    sync_database_url = database_url.replace("postgresql+asyncpg://", "postgresql://")
+    engine = create_engine(sync_database_url)
+    
+    drop_sql = """
+    DROP INDEX IF EXISTS idx_video_recordings_status_created_at_id;
+    DROP INDEX IF EXISTS idx_video_recordings_created_at_id;
+    DROP INDEX IF EXISTS idx_guests_created_at_id;
+    ALTER TABLE guests ALTER COLUMN created_at DROP NOT NULL;
+    ALTER TABLE guests ALTER COLUMN created_at DROP DEFAULT;
+    """
+    
+    with engine.connect() as connection:
+        trans = connection.begin()
+        
+        try:
+            connection.execute(text(drop_sql))
+            trans.commit()
+            print("✅ Pagination indexes dropped successfully!")
+            
+        except Exception as e:
+            trans.rollback()
+            print(f"❌ Error dropping pagination indexes: {e}")
+            raise
+
+
+if __name__ == "__main__":
+    import sys
+    from dotenv import load_dotenv
+    
+    # Load environment variables
+    load_dotenv()
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade()
+    else:
+        upgrade()
@@ -1,10 +1,29 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Computed, Index, DDL, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
+# Importable both as backend.app.* (API process) and app.* (scripts run from backend/)
+try:
+    from backend.app.core.name_phonetics import guest_name_key
+except ImportError:
+    from app.core.name_phonetics import guest_name_key
+
 Base = declarative_base()
 
+# Trigram indexes on guest names need the pg_trgm extension
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+# Phonetic name keys are scored with fuzzystrmatch's levenshtein()
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS fuzzystrmatch").execute_if(dialect="postgresql")
+)
+
 class RelationType(Base):
     __tablename__ = "relation_types"
     
@@ -29,13 +48,29 @@ class Guest(Base):
     message = Column(Text, nullable=True)  # Personal message from/to the guest
     story = Column(Text, nullable=True)   # Story or memory about the guest
     about = Column(Text, nullable=True)   # Additional information about the guest
-    created_at = Column(DateTime, default=datetime.utcnow)
+    search_name = Column(Text, Computed("lower(first_name || ' ' || last_name)", persisted=True))  # Normalized name for search
+    name_key = Column(String(200), nullable=True, index=True)  # Phonetic key for transliteration-tolerant search
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Keyset pagination needs a value on every row
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     relation_type = relationship("RelationType", back_populates="guests")
     video_recordings = relationship("VideoRecording", back_populates="guest")
     
+    __table_args__ = (
+        # Trigram index for similarity / LIKE lookups on the spoken name
+        Index("idx_guests_search_name_trgm", "search_name",
+              postgresql_using="gin", postgresql_ops={"search_name": "gin_trgm_ops"}),
+        # B-tree index for exact and prefix (LIKE 'abc%') matches
+        Index("idx_guests_search_name_prefix", "search_name",
+              postgresql_ops={"search_name": "text_pattern_ops"}),
+        # Trigram index for near-miss phonetic key lookups
+        Index("idx_guests_name_key_trgm", "name_key",
+              postgresql_using="gin", postgresql_ops={"name_key": "gin_trgm_ops"}),
+        # Keyset pagination (newest first) for the admin guest list
+        Index("idx_guests_created_at_id", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<Guest(id={self.id}, name='{self.first_name} {self.last_name}', relation='{self.relation}')>"
     
@@ -44,6 +79,13 @@ class Guest(Base):
         return f"{self.first_name} {self.last_name}".strip()
 
 
+@event.listens_for(Guest, "before_insert")
+@event.listens_for(Guest, "before_update")
+def _set_guest_name_key(mapper, connection, target):
+    """Keep the phonetic key in sync with the guest's name"""
+    target.name_key = guest_name_key(target.first_name, target.last_name)
+
+
 class VideoRecording(Base):
     __tablename__ = "video_recordings"
     
@@ -79,6 +121,12 @@ class VideoRecording(Base):
     # Relationships
     guest = relationship("Guest", back_populates="video_recordings")
     
+    __table_args__ = (
+        # Keyset pagination (newest first) for the admin recordings list, optionally by status
+        Index("idx_video_recordings_created_at_id", "created_at", "id"),
+        Index("idx_video_recordings_status_created_at_id", "processing_status", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<VideoRecording(id={self.id}, room_id='{self.room_id}', guest='{self.guest_name}', status='{self.processing_status}')>"
     
@@ -113,4 +161,56 @@ class VideoRecording(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "s3_key": self.s3_key
-        }
\ No newline at end of file
+        }
+
+class BackgroundJob(Base):
+    __tablename__ = "background_jobs"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    kind = Column(String(50), nullable=False, index=True)  # guest-import, guest-export, refresh-presigned-urls
+    status = Column(String(20), default="queued", nullable=False, index=True)  # queued, running, completed, failed
+    progress = Column(Integer, nullable=True)  # 0-100 when the total is known
+    message = Column(Text, nullable=True)  # Latest human-readable progress line
+    params = Column(Text, nullable=True)  # JSON job input
+    result = Column(Text, nullable=True)  # JSON job output (counts, download link, ...)
+    error = Column(Text, nullable=True)
+    owner = Column(String(32), nullable=True)  # Process origin id of the worker running the job
+    heartbeat_at = Column(DateTime, nullable=True)  # Last time the owner reported the job alive
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<BackgroundJob(id='{self.id}', kind='{self.kind}', status='{self.status}')>"
+    
+    def to_dict(self):
+        """Convert to dictionary for API responses"""
+        import json
+        
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "params": json.loads(self.params) if self.params else None,
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class MirrorState(Base):
+    __tablename__ = "mirror_state"
+    
+    mirror_id = Column(String(100), primary_key=True)  # LiveKit room name; '' holds the default text
+    text = Column(Text, nullable=False)  # HTML currently shown on the mirror
+    display = Column(Text, nullable=True)  # JSON layout, slots and version of the display
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<MirrorState(mirror_id='{self.mirror_id}', updated_at='{self.updated_at}')>"
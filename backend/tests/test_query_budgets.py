@@ -0,0 +1,131 @@
+"""
+Route query budgets, checked against a SQLite copy of the schema.
+
+Statements are counted with ``count_queries()`` around the whole request,
+body included, so the streamed routes (export, ``?stream=`` lists) are held
+to their budget as well.
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(BACKEND_DIR, ".."))
+sys.path.insert(0, BACKEND_DIR)
+# api.py creates the LiveKit service on import; no LiveKit call is made here
+for name, value in (("LIVEKIT_URL", "ws://localhost:7880"), ("LIVEKIT_API_KEY", "test"), ("LIVEKIT_API_SECRET", "test")):
+    os.environ.setdefault(name, value)
+
+from backend.app.api.v1.api import api_router  # noqa: E402
+from backend.app.core import database  # noqa: E402
+from backend.app.core.auth import SECRET_PASSWORD  # noqa: E402
+from backend.app.core.query_counter import (  # noqa: E402
+    ROUTE_QUERY_BUDGETS,
+    QueryBudgetExceeded,
+    QueryBudgetMiddleware,
+    count_queries,
+    instrument_engine,
+)
+from backend.app.core.response_cache import response_cache  # noqa: E402
+
+ROUTES = [
+    ("/api/guests", "/api/guests", {}),
+    ("/api/guests", "/api/guests", {"stream": "ndjson"}),
+    ("/api/guests/export", "/api/guests/export", {"format": "csv"}),
+    ("/api/guests/export", "/api/guests/export", {"format": "xlsx"}),
+    ("/api/relation-types", "/api/relation-types", {}),
+    ("/api/videos", "/api/videos", {}),
+    ("/api/videos", "/api/videos", {"stream": "json"}),
+    ("/api/videos/{video_id}", "/api/videos/1", {}),
+]
+
+
+@pytest.fixture
+def sqlite_database(tmp_path, monkeypatch):
+    """Seeded SQLite database wired into the shared engines"""
+    import models
+
+    path = tmp_path / "mirror.db"
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        relation_type = models.RelationType(name="Friend")
+        session.add(relation_type)
+        session.flush()
+        for i in range(5):
+            guest = models.Guest(
+                first_name=f"Guest{i}", last_name="Al-Ahmad", phone=f"079000000{i}",
+                relation_type_id=relation_type.id
+            )
+            session.add(guest)
+            session.flush()
+            session.add(models.VideoRecording(room_id=f"room-{i}", guest_id=guest.id, video_url="local"))
+        session.commit()
+
+    # NullPool: every test runs its own event loop, pooled aiosqlite connections cannot be shared
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine, expire_on_commit=False))
+    monkeypatch.setattr(database, "async_engine", async_engine)
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(bind=async_engine, expire_on_commit=False))
+    # Cached responses would skip the queries being counted
+    response_cache.bump()
+    yield
+    engine.dispose()
+
+
+def make_app(enforce: bool = False) -> FastAPI:
+    app = FastAPI()
+    app.include_router(api_router, prefix="/api")
+    if enforce:
+        app.add_middleware(QueryBudgetMiddleware, enforce=True)
+    return app
+
+
+def get(app: FastAPI, path: str, params: dict) -> httpx.Response:
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test", cookies={"mirror_auth": SECRET_PASSWORD}
+        ) as client:
+            return await client.get(path, params=params)
+
+    return asyncio.run(request())
+
+
+@pytest.mark.parametrize("route, path, params", ROUTES)
+def test_route_stays_within_budget(sqlite_database, route, path, params):
+    budget = ROUTE_QUERY_BUDGETS[("GET", route)]
+
+    with count_queries() as counter:
+        response = get(make_app(), path, params)
+
+    assert response.status_code == 200, response.text
+    # Streamed bodies run their query after the headers; it must still be counted
+    assert 0 < counter.count <= budget, "\n".join(counter.statements)
+
+
+@pytest.mark.parametrize("route, path, params", ROUTES)
+def test_middleware_passes_routes_within_budget(sqlite_database, route, path, params):
+    response = get(make_app(enforce=True), path, params)
+
+    assert response.status_code == 200, response.text
+    assert "x-query-count" in response.headers
+
+
+def test_middleware_aborts_stream_over_budget(sqlite_database, monkeypatch):
+    monkeypatch.setitem(ROUTE_QUERY_BUDGETS, ("GET", "/api/guests/export"), 0)
+
+    # Headers went out before the export's query ran, so the response is aborted
+    with pytest.raises(QueryBudgetExceeded):
+        get(make_app(enforce=True), "/api/guests/export", {"format": "csv"})
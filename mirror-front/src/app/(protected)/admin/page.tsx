@@ -192,22 +192,37 @@ export default function AdminPage() {
       setVideosLoading(true);
       updateStatus('Loading video recordings...', 'info');
       
-      const response = await fetch(`${apiUrl}/api/videos`, {
-        method: 'GET',
-        credentials: 'include'
-      });
-      
-      if (response.ok) {
+      // /api/videos is paged; follow next_cursor until every recording is loaded
+      const recordings: VideoRecording[] = [];
+      let total = 0;
+      let cursor: string | null = null;
+      do {
+        const params = new URLSearchParams({ limit: '200' });
+        if (cursor) {
+          params.set('cursor', cursor);
+          params.set('include_total', 'false');
+        }
+        const response = await fetch(`${apiUrl}/api/videos?${params}`, {
+          method: 'GET',
+          credentials: 'include'
+        });
+        
+        if (!response.ok) {
+          throw new Error('Failed to fetch videos');
+        }
         const data = await response.json();
-        if (data.success) {
-          setVideos(data.recordings);
-          updateStatus(`✅ Found ${data.total} video recordings`, 'success');
-        } else {
-          throw new Error(data.error || 'Failed to fetch videos');
+        if (!data.success) {
+          throw new Error(data.message || 'Failed to fetch videos');
         }
-      } else {
-        throw new Error('Failed to fetch videos');
-      }
+        recordings.push(...data.recordings);
+        if (data.total !== null) {
+          total = data.total;
+        }
+        cursor = data.next_cursor;
+      } while (cursor);
+      
+      setVideos(recordings);
+      updateStatus(`✅ Found ${total} video recordings`, 'success');
     } catch (error) {
       updateStatus('❌ Error loading videos', 'error');
       console.error('Error:', error);
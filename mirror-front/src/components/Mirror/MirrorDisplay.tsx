@@ -2,11 +2,19 @@
 
 import React from 'react';
 
+// One line of a structured display layout; slots keep their node across patches
+export interface DisplayLine {
+  slot: string;
+  class: string;
+  text: string;
+}
+
 interface MirrorDisplayProps {
   mirrorText: string;
+  lines?: DisplayLine[] | null;
 }
 
-const MirrorDisplay: React.FC<MirrorDisplayProps> = ({ mirrorText }) => {
+const MirrorDisplay: React.FC<MirrorDisplayProps> = ({ mirrorText, lines }) => {
   return (
     <>
       <style dangerouslySetInnerHTML={{__html: `
@@ -108,8 +116,12 @@ const MirrorDisplay: React.FC<MirrorDisplayProps> = ({ mirrorText }) => {
                      [&_.script]:italic [&_.script]:font-normal [&_.script]:text-3xl [&_.script]:py-20
                      sm:[&_.script]:text-4xl md:[&_.script]:text-5xl lg:[&_.script]:text-6xl xl:[&_.script]:text-7xl"
           style={{ fontFamily: 'Cinzel, serif' }}
-          dangerouslySetInnerHTML={{ __html: mirrorText }}
-        />
+          {...(lines ? {} : { dangerouslySetInnerHTML: { __html: mirrorText } })}
+        >
+          {lines?.map((line) => (
+            <span key={line.slot} className={line.class}>{line.text}</span>
+          ))}
+        </div>
       </div>
     </>
   );
@@ -2,7 +2,7 @@
 
 import React, { useState, useEffect, useRef } from 'react';
 import { useDevicePermissions } from '../../hooks/useDevicePermissions';
-import MirrorDisplay from './MirrorDisplay';
+import MirrorDisplay, { DisplayLine } from './MirrorDisplay';
 import ConnectionStatus from './ConnectionStatus';
 import             const randomRoom = `mirror-${Date.now()}`;
             const randomGuest = `Guest-${Date.now()}`;
@@ -14,11 +14,19 @@ import LiveKitConnection from './LiveKitConnection';
 const apiUrl = process.env.NEXT_PUBLIC_API_URL || '';
 const serverUrl = process.env.NEXT_PUBLIC_LIVEKIT_URL || 'wss://widdai-aphl2lb9.livekit.cloud';
 
+// A kiosk pins its mirror (LiveKit room) with ?mirror=<id>; otherwise each session gets a new room
+const pinnedMirror = (): string =>
+  typeof window !== 'undefined' ? new URLSearchParams(window.location.search).get('mirror') || '' : '';
+
 interface SSEMessage {
   type: string;
   text?: string;
   new_text?: string;
   current_text?: string;
+  version?: number;
+  base?: number;
+  lines?: DisplayLine[] | null;
+  slots?: Record<string, string>;
   message?: string;
   timestamp?: number;
   audio_file?: string;
@@ -44,8 +52,14 @@ const Mirror: React.FC = () => {
   const [mirrorText, setMirrorText] = useState<string>(
     '<span class="line welcome fancy">Welcome to</span><span class="line names fancy">Rakan & Farah Wedding</span><span class="line script">Say Mirror Mirror to begin</span>'
   );
+  // Structured display lines (null while showing raw HTML) and the server version shown
+  const [displayLines, setDisplayLines] = useState<DisplayLine[] | null>(null);
+  const displayVersionRef = useRef<number>(-1);
   const [connected, setConnected] = useState<boolean>(false);
   const eventSourceRef = useRef<EventSource | null>(null);
+  const lastEventIdRef = useRef<string>('');
+  // Mirror (LiveKit room) whose events this display receives
+  const [mirrorId, setMirrorId] = useState<string>(pinnedMirror);
 
   // LiveKit states
   const [token, setToken] = useState<string>('');
@@ -154,16 +168,52 @@ const Mirror: React.FC = () => {
 
   // SSE Connection Effect
   useEffect(() => {
+    const showDisplay = (version: number | undefined, html?: string, lines?: DisplayLine[] | null) => {
+      if (version !== undefined) {
+        displayVersionRef.current = version;
+      }
+      if (html) {
+        setMirrorText(html);
+      }
+      setDisplayLines(lines || null);
+    };
+
+    // Full display state, used when a patch does not follow the version shown
+    const fetchDisplaySnapshot = async () => {
+      const query = mirrorId ? `?mirror=${encodeURIComponent(mirrorId)}` : '';
+      try {
+        const response = await fetch(`${apiUrl}/api/display${query}`);
+        const snapshot = await response.json();
+        if (snapshot.success) {
+          showDisplay(snapshot.version, snapshot.html, snapshot.lines);
+        }
+      } catch (error) {
+        console.log('❌ Error fetching display snapshot:', error);
+      }
+    };
+
     const connectSSE = () => {
       console.log('🔗 Connecting to Mirror SSE stream...');
       
-      const eventSource = new EventSource(`${apiUrl}/api/events`, {
+      // Resume after the last event seen so missed events are replayed
+      const params = new URLSearchParams();
+      if (mirrorId) {
+        params.set('mirror', mirrorId);
+      }
+      if (lastEventIdRef.current) {
+        params.set('last_event_id', lastEventIdRef.current);
+      }
+      const query = params.toString() ? `?${params.toString()}` : '';
+      const eventSource = new EventSource(`${apiUrl}/api/events${query}`, {
         withCredentials: true
       });
       
       eventSourceRef.current = eventSource;
 
       eventSource.onmessage = (event) => {
+        if (event.lastEventId) {
+          lastEventIdRef.current = event.lastEventId;
+        }
         try {
           const data: SSEMessage = JSON.parse(event.data);
           console.log('📡 SSE Message received:', data);
@@ -172,14 +222,30 @@ const Mirror: React.FC = () => {
             case 'text_update':
               console.log('📝 Processing text update...');
               if (data.text) {
-                setMirrorText(data.text);
+                showDisplay(data.version, data.text);
+              }
+              break;
+              
+            case 'display_patch':
+              if (data.lines) {
+                // Layout change: the patch carries every line
+                showDisplay(data.version, undefined, data.lines);
+              } else if (data.base === displayVersionRef.current && data.slots) {
+                const slots = data.slots;
+                displayVersionRef.current = data.version ?? displayVersionRef.current;
+                setDisplayLines((lines) =>
+                  lines ? lines.map((line) => (line.slot in slots ? { ...line, text: slots[line.slot] } : line)) : lines
+                );
+              } else {
+                console.log('🔄 Display patch out of sequence, fetching snapshot...');
+                fetchDisplaySnapshot();
               }
               break;
               
             case 'reset':
               console.log('🔄 Processing reset event...');
               if (data.new_text) {
-                setMirrorText(data.new_text);
+                showDisplay(data.version, data.new_text);
               }
               break;
               
@@ -188,7 +254,7 @@ const Mirror: React.FC = () => {
               setConnected(true);
               if (data.current_text) {
                 console.log('📝 Setting initial text from connection');
-                setMirrorText(data.current_text);
+                showDisplay(data.version, data.current_text, data.lines);
               }
               break;
               
@@ -236,7 +302,7 @@ const Mirror: React.FC = () => {
         eventSourceRef.current.close();
       }
     };
-  }, []);
+  }, [mirrorId]);
 
   // Auto-permission and connect effect
   useEffect(() => {
@@ -258,7 +324,7 @@ const Mirror: React.FC = () => {
           if (!isConnected) {
             console.log('🎭 Auto-connecting to wedding mirror...');
 
-            const randomRoom = `mirror-${Date.now()}`;
+            const randomRoom = pinnedMirror() || `mirror-${Date.now()}`;
             const randomGuest = `Guest-${Date.now()}`;
             setRoomName(randomRoom);
             setUserName(randomGuest);
@@ -267,6 +333,7 @@ const Mirror: React.FC = () => {
               const roomToken = await getToken(randomRoom, randomGuest);
               console.log('🎫 Token received, connecting to room...');
               setToken(roomToken);
+              setMirrorId(randomRoom);
               setIsConnected(true);
               console.log('✨ Wedding mirror connection established!');
             } catch (error) {
@@ -286,13 +353,14 @@ const Mirror: React.FC = () => {
 
   const handleConnect = async () => {
     try {
-      const randomRoom = `mirror-${Date.now()}`;
+      const randomRoom = pinnedMirror() || `mirror-${Date.now()}`;
       const randomGuest = `Guest-${Date.now()}`;
 
       console.log('🎭 Connecting to mirror with random credentials...');
 
       const roomToken = await getToken(randomRoom, randomGuest);
       setToken(roomToken);
+      setMirrorId(randomRoom);
       setIsConnected(true);
       setShowVideoControls(false);
       console.log('✨ Connected to wedding mirror!');
@@ -407,7 +475,7 @@ const Mirror: React.FC = () => {
             </div>
           )}
 
-          <MirrorDisplay mirrorText={mirrorText} />
+          <MirrorDisplay mirrorText={mirrorText} lines={displayLines} />
         </div>
 
         <LiveKitConnection